@@ -0,0 +1,104 @@
+"""
+Concurrency benchmark for a running API server.
+
+Fires GET requests from N concurrent clients for a fixed duration and
+reports requests/sec and latency percentiles per path. Run it against the
+same data set before and after a change (e.g. the sync -> async DB port)
+to compare.
+
+The requests carry no session token, so patient-scoped paths need the server
+running with AUTH_REQUIRED=false.
+
+Usage (from backend/, with the server running):
+    python -m benchmarks.concurrency_bench --base-url http://localhost:8000 \\
+        --concurrency 100 --duration 30 \\
+        --path "/api/patients" --path "/api/checkins?patient_id=1" \\
+        --path "/api/medications?patient_id=1"
+"""
+import json
+import time
+import asyncio
+import argparse
+
+import aiohttp
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def client(session, base_url, paths, deadline, results, offset):
+    i = offset
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            async with session.get(base_url + path) as response:
+                await response.read()
+                status = response.status
+        except aiohttp.ClientError:
+            status = "error"
+        results[path].append((time.perf_counter() - started, status))
+
+
+async def run(base_url, paths, concurrency, duration):
+    results = {path: [] for path in paths}
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        # One warm-up pass so connection setup isn't counted
+        for path in paths:
+            async with session.get(base_url + path) as response:
+                await response.read()
+
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            client(session, base_url, paths, deadline, results, offset)
+            for offset in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    report = {"concurrency": concurrency, "duration": elapsed, "paths": {}}
+    total = 0
+    for path, samples in results.items():
+        latencies = [latency * 1000 for latency, _ in samples]
+        statuses = {}
+        for _, status in samples:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        total += len(samples)
+        report["paths"][path] = {
+            "requests": len(samples),
+            "rps": len(samples) / elapsed,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "statuses": statuses,
+        }
+    report["total_rps"] = total / elapsed
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--path", action="append", dest="paths", help="path to request (repeatable)")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    paths = args.paths or ["/api/patients", "/api/users", "/api/medications"]
+    report = asyncio.run(run(args.base_url.rstrip("/"), paths, args.concurrency, args.duration))
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
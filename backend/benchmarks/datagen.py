@@ -0,0 +1,234 @@
+"""
+Synthetic data set generator for benchmarks.
+
+Creates aides, patients with their aide assignments, medications and their
+schedules, then several years of check-ins, symptom logs and medication
+adherence rows per patient. The small tables go in with multi-row INSERTs;
+the large history tables are streamed through PostgreSQL COPY, so generating
+the rows in Python is the bottleneck rather than the database.
+
+Everything generated is derived from --seed, so the same arguments produce
+the same data set. Rows are tagged per run (aide emails, patient names) and
+`cleanup()` removes them again.
+
+Usage (from backend/, against a throwaway database):
+    DATABASE_URL=postgresql://localhost/caregiver_bench \\
+        python -m benchmarks.datagen --patients 200 --aides 300 --years 2 --keep
+"""
+import os
+import io
+import sys
+import csv
+import json
+import time
+import uuid
+import random
+import argparse
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Throwaway databases; a per-process session key will do
+os.environ.setdefault("APP_ENV", "development")
+
+from sqlalchemy import insert, text  # noqa: E402
+
+from main import (  # noqa: E402
+    Base, engine, get_db_session, migrate_schema,
+    User, Patient, Medication, MedicationSchedule, patient_user_association,
+)
+
+CHECKIN_CATEGORIES = {
+    "Mood": lambda rng: {"mood": rng.randint(1, 5)},
+    "Nutrition": lambda rng: {"meal": rng.choice(["Breakfast", "Lunch", "Dinner", "Snack"]),
+                              "description": "Synthetic meal", "amount": rng.choice(["All", "Half", "Little"])},
+    "Activity": lambda rng: {"type": rng.choice(["Walk", "Exercises", "Outing"]), "duration": rng.randint(5, 60)},
+    "Sleep": lambda rng: {"quality": rng.choice(["Good", "Fair", "Poor"]), "duration": rng.randint(4, 10)},
+    "Measurements": lambda rng: {"type": "Blood pressure", "value": f"{rng.randint(105, 160)}/{rng.randint(65, 100)}",
+                                 "unit": "mmHg"},
+    "Tasks": lambda rng: {"task": rng.choice(["Bathing", "Laundry", "Groceries"]), "status": "done"},
+}
+SYMPTOMS = ["Pain", "Nausea", "Dizziness", "Fatigue", "Confusion", "Shortness of breath", "Headache"]
+DOSE_TIMES = ["08:00", "13:00", "20:00", "22:00"]
+ADHERENCE_STATUSES = ["taken"] * 85 + ["late"] * 5 + ["skipped"] * 5 + ["missed"] * 5
+
+
+def add_arguments(parser):
+    """Data set size options, shared with the benchmarks that seed through this module."""
+    parser.add_argument("--patients", type=int, default=100)
+    parser.add_argument("--aides", type=int, default=150)
+    parser.add_argument("--aides-per-patient", type=int, default=3)
+    parser.add_argument("--years", type=float, default=1.0, help="history length per patient")
+    parser.add_argument("--checkins-per-day", type=int, default=3)
+    parser.add_argument("--symptoms-per-week", type=int, default=3)
+    parser.add_argument("--medications-per-patient", type=int, default=3)
+    parser.add_argument("--doses-per-day", type=int, default=2, choices=range(1, len(DOSE_TIMES) + 1))
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def _copy(db, table: str, columns, rows) -> int:
+    """Streams rows into a table with COPY ... FROM STDIN (CSV) in chunks."""
+    cursor = db.connection().connection.cursor()
+    total = 0
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+
+    def flush():
+        buf.seek(0)
+        cursor.copy_expert(sql, buf)
+        buf.seek(0)
+        buf.truncate()
+
+    for row in rows:
+        writer.writerow(row)
+        total += 1
+        if total % 50000 == 0:
+            flush()
+    flush()
+    return total
+
+
+def generate(db, args, tag: str = None) -> dict:
+    """Seeds the data set and returns the generated ids and row counts."""
+    rng = random.Random(args.seed)
+    tag = tag or uuid.uuid4().hex[:8]
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    days = max(1, int(args.years * 365))
+    start = (now - timedelta(days=days)).replace(hour=0, minute=0, second=0)
+
+    user_ids = db.scalars(insert(User).returning(User.id), [
+        {"email": f"bench+{tag}-{i}@example.com", "name": f"Bench Aide {i}", "role": "aide", "created_at": start}
+        for i in range(args.aides)
+    ]).all()
+    patient_ids = db.scalars(insert(Patient).returning(Patient.id), [
+        {"name": f"Bench Patient {tag}-{i}", "age": rng.randint(60, 98), "created_at": start, "updated_at": start}
+        for i in range(args.patients)
+    ]).all()
+
+    aides_of = {}
+    assignments = []
+    for patient_id in patient_ids:
+        aides = rng.sample(list(user_ids), min(args.aides_per_patient, len(user_ids)))
+        aides_of[patient_id] = aides
+        assignments.extend({"user_id": u, "patient_id": patient_id} for u in aides)
+    if assignments:
+        db.execute(insert(patient_user_association), assignments)
+
+    medication_rows = [
+        {"patient_id": patient_id, "name": f"Benchmarkamide {m}", "dosage": f"{rng.choice([5, 10, 20, 50])}mg",
+         "frequency": "daily", "time": DOSE_TIMES[0], "active": True, "created_at": start}
+        for patient_id in patient_ids for m in range(args.medications_per_patient)
+    ]
+    medication_ids = db.scalars(insert(Medication).returning(Medication.id), medication_rows).all()
+
+    schedule_rows = []
+    for medication_id, medication in zip(medication_ids, medication_rows):
+        for dose in DOSE_TIMES[:args.doses_per_day]:
+            schedule_rows.append({
+                "medication_id": medication_id, "patient_id": medication["patient_id"],
+                "user_id": aides_of[medication["patient_id"]][0] if aides_of[medication["patient_id"]] else None,
+                "time_of_day": dose, "recurrence_rule": "daily", "timezone": "UTC",
+                "active": True, "created_at": start,
+            })
+    schedule_ids = db.scalars(insert(MedicationSchedule).returning(MedicationSchedule.id), schedule_rows).all()
+
+    categories = list(CHECKIN_CATEGORIES)
+
+    def checkins():
+        for patient_id in patient_ids:
+            aides = aides_of[patient_id] or [None]
+            for day in range(days):
+                base = start + timedelta(days=day)
+                for _ in range(args.checkins_per_day):
+                    at = base + timedelta(minutes=rng.randrange(7 * 60, 22 * 60))
+                    category = rng.choice(categories)
+                    yield (rng.choice(aides), patient_id, category,
+                           json.dumps(CHECKIN_CATEGORIES[category](rng)), at.isoformat(), at.isoformat())
+
+    def symptom_logs():
+        for patient_id in patient_ids:
+            aides = aides_of[patient_id] or [None]
+            for week in range(days // 7 + 1):
+                for _ in range(args.symptoms_per_week):
+                    started = start + timedelta(days=week * 7 + rng.randrange(7), minutes=rng.randrange(24 * 60))
+                    if started > now:
+                        continue
+                    ended = started + timedelta(minutes=rng.randrange(5, 240))
+                    yield (rng.choice(aides), patient_id, rng.choice(SYMPTOMS), started.isoformat(),
+                           ended.isoformat(), rng.randint(1, 10), "", started.isoformat())
+
+    def adherence():
+        for schedule_id, schedule in zip(schedule_ids, schedule_rows):
+            hour, minute = map(int, schedule["time_of_day"].split(":"))
+            for day in range(days):
+                scheduled = start + timedelta(days=day, hours=hour, minutes=minute)
+                status = rng.choice(ADHERENCE_STATUSES)
+                taken = scheduled + timedelta(minutes=rng.randrange(0, 90)) if status in ("taken", "late") else None
+                yield (schedule["medication_id"], schedule_id, schedule["user_id"], schedule["patient_id"],
+                       scheduled.isoformat(), taken.isoformat() if taken else None, status, scheduled.isoformat())
+
+    counts = {
+        "aides": len(user_ids),
+        "patients": len(patient_ids),
+        "medications": len(medication_ids),
+        "schedules": len(schedule_ids),
+        "checkins": _copy(db, "checkins",
+                          ["user_id", "patient_id", "category", "data", "timestamp", "created_at"], checkins()),
+        "symptom_logs": _copy(db, "symptom_logs",
+                              ["user_id", "patient_id", "symptom_type", "start_time", "end_time",
+                               "severity", "notes", "created_at"], symptom_logs()),
+        "medication_adherence": _copy(db, "medication_adherence",
+                                      ["medication_id", "schedule_id", "user_id", "patient_id", "scheduled_time",
+                                       "taken_time", "status", "created_at"], adherence()),
+    }
+    db.commit()
+    for table in ("checkins", "symptom_logs", "medication_adherence"):
+        db.execute(text(f"ANALYZE {table}"))
+    db.commit()
+
+    return {
+        "tag": tag,
+        "users": list(user_ids), "patients": list(patient_ids), "medications": list(medication_ids),
+        "schedules": list(schedule_ids), "aide_emails": [f"bench+{tag}-{i}@example.com" for i in range(args.aides)],
+        "counts": counts,
+    }
+
+
+def cleanup(db, ids: dict):
+    """Removes everything generate() created, plus rows the benchmarks added for those users/patients."""
+    params = {"patients": ids["patients"], "users": ids["users"]}
+    db.execute(text("DELETE FROM push_subscriptions WHERE user_id = ANY(:users)"), params)
+    db.execute(text("DELETE FROM medication_adherence WHERE patient_id = ANY(:patients)"), params)
+    db.execute(text("DELETE FROM medication_schedules WHERE patient_id = ANY(:patients)"), params)
+    db.execute(text("DELETE FROM medications WHERE patient_id = ANY(:patients)"), params)
+    db.execute(text("DELETE FROM symptom_logs WHERE patient_id = ANY(:patients)"), params)
+    db.execute(text("DELETE FROM checkins WHERE patient_id = ANY(:patients)"), params)
+    db.execute(text("DELETE FROM patient_user_association WHERE patient_id = ANY(:patients)"), params)
+    db.execute(text("DELETE FROM patients WHERE id = ANY(:patients)"), params)
+    db.execute(text("DELETE FROM users WHERE id = ANY(:users)"), params)
+    db.commit()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument("--keep", action="store_true", help="leave the rows in place (default: remove them again)")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    migrate_schema()
+    started = time.time()
+    with get_db_session() as db:
+        ids = generate(db, args)
+    elapsed = time.time() - started
+    rows = sum(ids["counts"].values())
+    print(json.dumps(ids["counts"], indent=2))
+    print(f"Generated {rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s), tag {ids['tag']}")
+    if not args.keep:
+        with get_db_session() as db:
+            cleanup(db, ids)
+        print("Removed the generated rows again (use --keep to leave them)")
+
+
+if __name__ == "__main__":
+    main_cli()
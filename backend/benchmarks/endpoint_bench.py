@@ -0,0 +1,234 @@
+"""
+Endpoint benchmark suite.
+
+Seeds a synthetic data set (see datagen.py), then measures latency
+percentiles and throughput for the key API endpoints:
+
+    login          POST /api/auth/login
+    patients       GET  /api/patients
+    timeline       GET  /api/checkins?patient_id=...
+    symptom_agg    GET  /api/reports/symptom-agg?patient_id=...&group_by=week
+    adherence      GET  /api/medication-adherence?patient_id=...
+    report         GET  /api/reports/generate (last 30 days)
+    subscribe      POST /api/push/subscribe
+
+Results are written as JSON together with the git commit and the data set
+parameters. Pass --compare with an earlier results file to print per-endpoint
+changes; the exit status is 1 when any endpoint's p95 regressed by more than
+--max-regression.
+
+The server must use the same DATABASE_URL as this script, and run with
+AUTH_REQUIRED=false since the requests carry no session tokens. --serve starts
+one in-process (uvicorn, scheduler disabled, AUTH_REQUIRED=false) so a run
+needs nothing else.
+
+Usage (from backend/, against a throwaway database):
+    DATABASE_URL=postgresql://localhost/caregiver_bench \\
+        python -m benchmarks.endpoint_bench --serve --patients 200 --years 2 \\
+        --json bench-$(git rev-parse --short HEAD).json --compare bench-baseline.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import random
+import asyncio
+import argparse
+import threading
+import subprocess
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import datagen  # noqa: E402
+from benchmarks.concurrency_bench import percentile  # noqa: E402
+from main import Base, engine, get_db_session, migrate_schema  # noqa: E402
+
+
+def endpoints(ids: dict, rng: random.Random) -> dict:
+    """name -> function returning (method, path, json body) for one request."""
+    today = datetime.now(timezone.utc).date()
+    report_from = (today - timedelta(days=30)).isoformat()
+    patient = lambda: rng.choice(ids["patients"])  # noqa: E731
+    counter = iter(range(10 ** 9))
+
+    def subscribe():
+        n = next(counter)
+        return "POST", "/api/push/subscribe", {
+            "user_id": rng.choice(ids["users"]),
+            "subscription_data": {
+                "endpoint": f"https://push.example.invalid/bench/{ids['tag']}/{n}",
+                "keys": {"p256dh": "bench", "auth": "bench"},
+            },
+        }
+
+    return {
+        "login": lambda: ("POST", f"/api/auth/login?email={quote(rng.choice(ids['aide_emails']))}", None),
+        "patients": lambda: ("GET", "/api/patients", None),
+        "timeline": lambda: ("GET", f"/api/checkins?patient_id={patient()}", None),
+        "symptom_agg": lambda: ("GET", f"/api/reports/symptom-agg?patient_id={patient()}&group_by=week", None),
+        "adherence": lambda: ("GET", f"/api/medication-adherence?patient_id={patient()}", None),
+        "report": lambda: ("GET", f"/api/reports/generate?patient_id={patient()}"
+                                  f"&from_date={report_from}&to_date={today.isoformat()}", None),
+        "subscribe": subscribe,
+    }
+
+
+async def measure(session, base_url, make_request, requests, concurrency, warmup) -> dict:
+    for _ in range(warmup):
+        method, path, body = make_request()
+        async with session.request(method, base_url + path, json=body) as response:
+            await response.read()
+
+    latencies, statuses = [], {}
+    queue = [make_request() for _ in range(requests)]
+
+    async def worker():
+        while queue:
+            method, path, body = queue.pop()
+            started = time.perf_counter()
+            try:
+                async with session.request(method, base_url + path, json=body) as response:
+                    await response.read()
+                    status = str(response.status)
+            except aiohttp.ClientError:
+                status = "error"
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "statuses": statuses,
+        "rps": requests / elapsed,
+        "mean_ms": sum(latencies) / len(latencies) if latencies else None,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+async def run_suite(args, ids) -> dict:
+    rng = random.Random(args.seed)
+    suite = endpoints(ids, rng)
+    selected = args.endpoints or list(suite)
+    results = {}
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=args.concurrency)) as session:
+        for name in selected:
+            requests = args.report_requests if name == "report" else args.requests
+            results[name] = await measure(session, args.base_url, suite[name], requests, args.concurrency, args.warmup)
+            r = results[name]
+            print(f"{name:12s} {r['rps']:8.1f} req/s  p50 {r['p50_ms']:7.1f}ms  p95 {r['p95_ms']:7.1f}ms  "
+                  f"p99 {r['p99_ms']:7.1f}ms  errors {r['errors']}")
+    return results
+
+
+def compare(results: dict, baseline_path: str, max_regression: float) -> bool:
+    """Prints p95/rps changes against a previous run; returns True when nothing regressed."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('meta', {}).get('commit')}):")
+    ok = True
+    for name, current in results["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if not previous or not previous.get("p95_ms") or not current.get("p95_ms"):
+            print(f"{name:12s} no baseline")
+            continue
+        p95_change = current["p95_ms"] / previous["p95_ms"] - 1
+        rps_change = current["rps"] / previous["rps"] - 1
+        regressed = p95_change > max_regression
+        ok = ok and not regressed
+        print(f"{name:12s} p95 {previous['p95_ms']:7.1f} -> {current['p95_ms']:7.1f}ms ({p95_change:+.0%})  "
+              f"rps {rps_change:+.0%}{'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def serve_in_process() -> str:
+    """Starts the app with uvicorn on a free local port and returns its base URL."""
+    import uvicorn
+    import main
+
+    main.scheduler.start = lambda *a, **k: None  # no reminder jobs during the run
+    os.environ["AUTH_REQUIRED"] = "false"  # requests carry no session tokens
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    datagen.add_arguments(parser)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--serve", action="store_true", help="run the API in-process instead of using --base-url")
+    parser.add_argument("--endpoint", action="append", dest="endpoints",
+                        help="only run this endpoint (repeatable)")
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    parser.add_argument("--report-requests", type=int, default=20, help="requests for the PDF report endpoint")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="allowed p95 increase before --compare fails (0.2 = 20%%)")
+    parser.add_argument("--keep", action="store_true", help="leave the seeded rows in the database")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    migrate_schema()
+
+    started = time.time()
+    with get_db_session() as db:
+        ids = datagen.generate(db, args)
+    print(f"Seeded {sum(ids['counts'].values())} rows in {time.time() - started:.1f}s: {ids['counts']}")
+
+    try:
+        if args.serve:
+            args.base_url = serve_in_process()
+        args.base_url = args.base_url.rstrip("/")
+        results = {
+            "meta": {
+                "commit": git_commit(),
+                "started_at": datetime.now(timezone.utc).isoformat(),
+                "params": {k: v for k, v in vars(args).items() if k not in ("json", "compare")},
+                "dataset": ids["counts"],
+            },
+            "endpoints": asyncio.run(run_suite(args, ids)),
+        }
+    finally:
+        if not args.keep:
+            with get_db_session() as db:
+                datagen.cleanup(db, ids)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+    if args.compare and not compare(results, args.compare, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,106 @@
+"""
+Local stand-in for a web push service.
+
+Accepts POSTs on any path, sleeps for a configurable latency and answers
+201, or 410 / 429 at configurable rates. Records when each request arrived
+so callers can measure end-to-end delivery lag.
+
+Usage (standalone):
+    python -m benchmarks.push_stub --port 8089 --latency-ms 40 --gone-rate 0.02
+"""
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class PushServiceStub:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0,
+                 gone_rate: float = 0.0, throttle_rate: float = 0.0, seed: int = 0):
+        self.latency = latency_ms / 1000.0
+        self.gone_rate = gone_rate
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.received = []  # (arrival time, path, status)
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                self.rfile.read(length)
+                arrived = time.time()
+                if stub.latency:
+                    time.sleep(stub.latency)
+                status = stub._pick_status()
+                with stub.lock:
+                    stub.received.append((arrived, self.path, status))
+                self.send_response(status)
+                if status == 429:
+                    self.send_header("Retry-After", "1")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def _pick_status(self) -> int:
+        with self.lock:
+            roll = self.random.random()
+        if roll < self.gone_rate:
+            return 410
+        if roll < self.gone_rate + self.throttle_rate:
+            return 429
+        return 201
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset(self):
+        with self.lock:
+            received, self.received = self.received, []
+        return received
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--gone-rate", type=float, default=0.0, help="fraction of requests answered with 410")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    args = parser.parse_args()
+
+    stub = PushServiceStub(args.host, args.port, args.latency_ms, args.gone_rate, args.throttle_rate)
+    print(f"Push service stand-in listening on {stub.base_url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""
+Load test for the medication reminder path.
+
+Seeds synthetic users, patients, medications, schedules and push
+subscriptions spread across many timezones, points every subscription at a
+local push-service stand-in (see push_stub.py), then drives
+`check_and_send_medication_reminders` tick by tick, draining the outbox
+after each one, and the outbox push handler directly. Reports ticks/sec, drain
+time, end-to-end reminder lag (tick start -> push received) and DB queries
+per tick.
+
+Needs a throwaway PostgreSQL database in DATABASE_URL; all seeded rows are
+tagged and removed at the end unless --keep is given.
+
+Usage (from backend/):
+    DATABASE_URL=postgresql://localhost/caregiver_bench \\
+        python -m benchmarks.reminder_load --subscriptions 10000 --ticks 5 --latency-ms 20
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Throwaway databases; a per-process session key will do
+os.environ.setdefault("APP_ENV", "development")
+
+from sqlalchemy import event, insert, text  # noqa: E402
+
+from benchmarks.push_crypto_bench import make_vapid_key, make_subscription  # noqa: E402
+from benchmarks.push_stub import PushServiceStub  # noqa: E402
+
+# The sender reads VAPID settings lazily, so a throwaway key set here is used
+os.environ["VAPID_PRIVATE_KEY"] = make_vapid_key()
+os.environ["VAPID_CLAIM_EMAIL"] = "mailto:loadtest@example.com"
+
+import main  # noqa: E402
+from main import (  # noqa: E402
+    Base, engine, get_db_session, migrate_schema, hash_endpoint, now_utc,
+    User, Patient, Medication, MedicationSchedule,
+    PushSubscription, patient_user_association,
+)
+
+TIMEZONES = [
+    "Pacific/Honolulu", "America/Anchorage", "America/Los_Angeles", "America/Denver",
+    "America/Phoenix", "America/Chicago", "America/New_York", "America/Halifax",
+    "America/Sao_Paulo", "Atlantic/Azores", "Europe/London", "Europe/Berlin",
+    "Europe/Athens", "Africa/Nairobi", "Asia/Dubai", "Asia/Kolkata",
+    "Asia/Kathmandu", "Asia/Bangkok", "Asia/Shanghai", "Asia/Tokyo",
+    "Australia/Adelaide", "Australia/Sydney", "Pacific/Auckland", "UTC",
+]
+
+
+class QueryCounter:
+    """Counts statements executed on the engine while enabled."""
+
+    def __init__(self, bind):
+        self.count = 0
+        self.enabled = False
+        event.listen(bind, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled:
+            self.count += 1
+
+    def start(self):
+        self.count = 0
+        self.enabled = True
+
+    def stop(self) -> int:
+        self.enabled = False
+        return self.count
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def seed(db, args, push_base_url: str, tag: str) -> dict:
+    """Bulk-inserts the synthetic data set and returns the seeded ids."""
+    rng = random.Random(args.seed)
+    n_users = max(1, args.subscriptions // args.subs_per_user)
+    n_patients = max(1, n_users // args.aides_per_patient)
+    created = now_utc()
+
+    user_ids = db.scalars(insert(User).returning(User.id), [
+        {"email": f"loadtest+{tag}-{i}@example.invalid", "name": f"Load Test Aide {i}",
+         "role": "aide", "created_at": created}
+        for i in range(n_users)
+    ]).all()
+    patient_ids = db.scalars(insert(Patient).returning(Patient.id), [
+        {"name": f"Load Test Patient {tag}-{i}", "age": 60 + i % 35, "created_at": created}
+        for i in range(n_patients)
+    ]).all()
+    db.execute(insert(patient_user_association), [
+        {"user_id": user_id, "patient_id": patient_ids[i % n_patients]}
+        for i, user_id in enumerate(user_ids)
+    ])
+    medication_ids = db.scalars(insert(Medication).returning(Medication.id), [
+        {"patient_id": patient_id, "name": f"Loadtestamide {i}", "dosage": "10mg",
+         "frequency": "daily", "time": "08:00", "active": True, "created_at": created}
+        for i, patient_id in enumerate(patient_ids)
+    ]).all()
+    schedule_ids = db.scalars(insert(MedicationSchedule).returning(MedicationSchedule.id), [
+        {"medication_id": medication_ids[i % n_patients], "user_id": user_id,
+         "patient_id": patient_ids[i % n_patients],
+         "time_of_day": f"{rng.randrange(24):02d}:{rng.randrange(60):02d}",
+         "recurrence_rule": "daily", "timezone": TIMEZONES[i % len(TIMEZONES)],
+         "active": True, "created_at": created}
+        for i, user_id in enumerate(user_ids)
+    ]).all()
+
+    # Generating P-256 keys is the slow part; reuse a pool of them
+    key_pool = [make_subscription(i)["keys"] for i in range(min(256, args.subscriptions))]
+    subscription_rows = []
+    for i in range(args.subscriptions):
+        endpoint = f"{push_base_url}/push/{tag}/{i}"
+        subscription_rows.append({
+            "user_id": user_ids[i % n_users],
+            "subscription_data": {"endpoint": endpoint, "keys": key_pool[i % len(key_pool)]},
+            "endpoint_hash": hash_endpoint(endpoint),
+            "created_at": created,
+        })
+    subscription_ids = db.scalars(insert(PushSubscription).returning(PushSubscription.id), subscription_rows).all()
+    db.commit()
+
+    return {
+        "users": list(user_ids), "patients": list(patient_ids), "medications": list(medication_ids),
+        "schedules": list(schedule_ids), "subscriptions": list(subscription_ids),
+    }
+
+
+def make_due_now(db, schedule_ids, user_ids, due_fraction: float):
+    """Moves a fraction of the seeded schedules to the current local minute in their timezone."""
+    due = schedule_ids[:int(len(schedule_ids) * due_fraction)]
+    if due:
+        db.execute(text("""
+            UPDATE medication_schedules
+            SET time_of_day = to_char(now() AT TIME ZONE timezone, 'HH24:MI')
+            WHERE id = ANY(:ids)
+        """), {"ids": due})
+    # Reminders are deduplicated per schedule and minute; release the keys so ticks
+    # within the same minute queue them again
+    db.execute(text("""
+        UPDATE outbox_events SET dedupe_key = NULL
+        WHERE dedupe_key LIKE 'reminder:%' AND (payload->>'user_id')::int = ANY(:ids)
+    """), {"ids": user_ids})
+    db.commit()
+    return len(due)
+
+
+def cleanup(db, ids: dict):
+    db.execute(text("""
+        DELETE FROM outbox_events
+        WHERE (payload->>'user_id')::int = ANY(:users) OR (payload->>'subscription_id')::int = ANY(:subscriptions)
+    """), {"users": ids["users"], "subscriptions": ids["subscriptions"]})
+    db.execute(text("DELETE FROM push_subscriptions WHERE id = ANY(:ids)"), {"ids": ids["subscriptions"]})
+    db.execute(text("DELETE FROM medication_adherence WHERE medication_id = ANY(:ids)"), {"ids": ids["medications"]})
+    db.execute(text("DELETE FROM medication_schedules WHERE id = ANY(:ids)"), {"ids": ids["schedules"]})
+    db.execute(text("DELETE FROM medications WHERE id = ANY(:ids)"), {"ids": ids["medications"]})
+    db.execute(text("DELETE FROM patient_user_association WHERE user_id = ANY(:ids)"), {"ids": ids["users"]})
+    db.execute(text("DELETE FROM patients WHERE id = ANY(:ids)"), {"ids": ids["patients"]})
+    db.execute(text("DELETE FROM users WHERE id = ANY(:ids)"), {"ids": ids["users"]})
+    db.commit()
+
+
+def drain_events(drainers: int):
+    """Runs `drainers` outbox drains side by side until the outbox is empty."""
+    with ThreadPoolExecutor(max_workers=drainers) as pool:
+        while sum(pool.map(lambda _: main.outbox_events.drain(), range(drainers))):
+            pass
+
+
+def run_ticks(args, stub, counter, ids) -> dict:
+    durations, drains, queries, lags, statuses = [], [], [], [], {}
+    for tick in range(args.ticks):
+        with get_db_session() as db:
+            due = make_due_now(db, ids["schedules"], ids["users"], args.due_fraction)
+        stub.reset()
+
+        counter.start()
+        started = time.time()
+        main.check_and_send_medication_reminders()
+        duration = time.time() - started
+        queries.append(counter.stop())
+        durations.append(duration)
+
+        # The tick only queues reminders; drainers send them
+        drain_started = time.time()
+        drain_events(args.drainers)
+        drains.append(time.time() - drain_started)
+
+        received = stub.reset()
+        lags.extend(arrived - started for arrived, _, _ in received)
+        for _, _, status in received:
+            statuses[status] = statuses.get(status, 0) + 1
+        print(f"tick {tick + 1}/{args.ticks}: {due} due schedules, {len(received)} pushes, "
+              f"{duration:.2f}s, {queries[-1]} queries, drained in {drains[-1]:.2f}s")
+
+    return {
+        "ticks": args.ticks,
+        "ticks_per_sec": args.ticks / sum(durations) if sum(durations) else None,
+        "tick_seconds": {"mean": statistics.mean(durations), "max": max(durations)},
+        "queries_per_tick": {"mean": statistics.mean(queries), "max": max(queries)},
+        "drain_seconds": {"mean": statistics.mean(drains), "max": max(drains)},
+        "reminder_lag_seconds": {
+            "p50": percentile(lags, 50), "p95": percentile(lags, 95),
+            "p99": percentile(lags, 99), "max": max(lags) if lags else None,
+        },
+        "push_responses": statuses,
+    }
+
+
+def run_senders(args, stub, counter, ids) -> dict:
+    """Drives the outbox's push.subscription handler and the Celery task body directly."""
+    import tasks
+
+    sample_subscriptions = ids["subscriptions"][:args.sender_sample]
+    stub.reset()
+    counter.start()
+    started = time.time()
+    # What a drainer does per event, minus claiming it: the handler in a savepoint, one commit per batch
+    with get_db_session() as db:
+        for subscription_id in sample_subscriptions:
+            try:
+                with db.begin_nested():
+                    main._send_push(db, {"subscription_id": subscription_id,
+                                         "title": "Medication Reminder", "body": "Load test"})
+            except Exception:
+                pass  # throttled; the outbox would retry it
+        db.commit()
+    outbox_seconds = time.time() - started
+    outbox_queries = counter.stop()
+    outbox_pushes = len(stub.reset())
+
+    counter.start()
+    started = time.time()
+    for subscription_id in sample_subscriptions:
+        tasks.send_push_notification(subscription_id, "Medication Reminder", "Load test")
+    task_seconds = time.time() - started
+    task_queries = counter.stop()
+    task_pushes = len(stub.reset())
+
+    return {
+        "outbox_send_push": {
+            "events": len(sample_subscriptions), "pushes": outbox_pushes, "seconds": outbox_seconds,
+            "pushes_per_sec": outbox_pushes / outbox_seconds if outbox_seconds else None,
+            "queries": outbox_queries,
+        },
+        "celery_send_push_notification": {
+            "calls": len(sample_subscriptions), "pushes": task_pushes, "seconds": task_seconds,
+            "pushes_per_sec": task_pushes / task_seconds if task_seconds else None,
+            "queries": task_queries,
+        },
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscriptions", type=int, default=10000)
+    parser.add_argument("--subs-per-user", type=int, default=1)
+    parser.add_argument("--aides-per-patient", type=int, default=3)
+    parser.add_argument("--due-fraction", type=float, default=1.0, help="share of schedules due on every tick")
+    parser.add_argument("--ticks", type=int, default=3)
+    parser.add_argument("--sender-sample", type=int, default=200, help="subscriptions for the direct sender runs")
+    parser.add_argument("--drainers", type=int, default=4, help="concurrent outbox drains after each tick")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--gone-rate", type=float, default=0.01)
+    parser.add_argument("--throttle-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--keep", action="store_true", help="leave the seeded rows in the database")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    migrate_schema()
+    counter = QueryCounter(engine)
+    tag = uuid.uuid4().hex[:8]
+
+    with PushServiceStub(latency_ms=args.latency_ms, gone_rate=args.gone_rate,
+                         throttle_rate=args.throttle_rate, seed=args.seed) as stub:
+        print(f"Push stand-in at {stub.base_url}; seeding {args.subscriptions} subscriptions...")
+        started = time.time()
+        with get_db_session() as db:
+            ids = seed(db, args, stub.base_url, tag)
+        print(f"Seeded in {time.time() - started:.1f}s across {len(TIMEZONES)} timezones")
+
+        try:
+            results = {
+                "params": vars(args),
+                "reminder_ticks": run_ticks(args, stub, counter, ids),
+                "senders": run_senders(args, stub, counter, ids),
+            }
+        finally:
+            if not args.keep:
+                with get_db_session() as db:
+                    cleanup(db, ids)
+
+    print(json.dumps(results, indent=2, default=str))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,286 @@
+"""
+Bulk import of historical care records through PostgreSQL COPY.
+
+Reads CSV (with a header row) or NDJSON one record at a time, validates and
+converts each record, resolves patient/user/medication references from
+lookup maps loaded once up front, and COPYs the rows in batches. Memory use
+depends on the batch size and the number of patients/users, not on the size
+of the input.
+
+Record fields per kind (references may be ids or natural keys):
+
+    checkins              patient_id | patient, user_id | user_email, category,
+                          data (JSON object), timestamp
+    symptom_logs          patient_id | patient, user_id | user_email, symptom_type,
+                          start_time, end_time, severity, notes
+    medication_adherence  patient_id | patient, user_id | user_email,
+                          medication_id | medication, scheduled_time, taken_time,
+                          status, notes
+
+`patient` is the patient's name, `medication` the medication's name for that
+patient. Timestamps are ISO 8601; ones without an offset are taken as UTC.
+Invalid records are skipped and reported; everything else is loaded in one
+transaction, so a failed import leaves nothing behind.
+
+Command line (from backend/):
+    python bulk_import.py checkins history.csv
+    python bulk_import.py symptom_logs symptoms.ndjson --format ndjson --dry-run
+"""
+import io
+import csv
+import json
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+from sqlalchemy import text
+
+
+log = logging.getLogger(__name__)
+
+BATCH_SIZE = 10000
+MAX_REPORTED_ERRORS = 100
+ADHERENCE_STATUSES = {"pending", "taken", "skipped", "late", "missed"}
+
+# Target table and COPY columns per kind
+TABLES = {
+    "checkins": ("checkins", ["user_id", "patient_id", "category", "data", "timestamp", "created_at"]),
+    "symptom_logs": ("symptom_logs", ["user_id", "patient_id", "symptom_type", "start_time", "end_time",
+                                      "severity", "notes", "created_at"]),
+    "medication_adherence": ("medication_adherence", ["medication_id", "user_id", "patient_id", "scheduled_time",
+                                                      "taken_time", "status", "notes", "created_at"]),
+}
+FORMATS = ("csv", "ndjson")
+
+
+class InvalidRecord(ValueError):
+    """A record that can't be imported; the message says why."""
+
+
+class Lookups:
+    """Patient, user and medication ids keyed by id and by natural key."""
+
+    def __init__(self, conn):
+        self.patient_ids = set()
+        self.patients_by_name = {}
+        for patient_id, name in conn.execute(text("SELECT id, name FROM patients")):
+            self.patient_ids.add(patient_id)
+            key = name.strip().lower()
+            # Duplicate names can't be resolved by name; those records need patient_id
+            self.patients_by_name[key] = None if key in self.patients_by_name else patient_id
+        self.user_ids = set()
+        self.users_by_email = {}
+        for user_id, email in conn.execute(text("SELECT id, email FROM users")):
+            self.user_ids.add(user_id)
+            self.users_by_email[email.strip().lower()] = user_id
+        self.medications = {}  # id -> patient_id
+        self.medications_by_name = {}  # (patient_id, name) -> id
+        for medication_id, patient_id, name in conn.execute(text("SELECT id, patient_id, name FROM medications")):
+            self.medications[medication_id] = patient_id
+            self.medications_by_name[(patient_id, name.strip().lower())] = medication_id
+
+    def patient(self, record) -> int:
+        if record.get("patient_id") not in (None, ""):
+            patient_id = _int(record["patient_id"], "patient_id")
+            if patient_id not in self.patient_ids:
+                raise InvalidRecord(f"unknown patient_id {patient_id}")
+            return patient_id
+        name = (record.get("patient") or "").strip().lower()
+        if not name:
+            raise InvalidRecord("patient_id or patient is required")
+        if name not in self.patients_by_name:
+            raise InvalidRecord(f"unknown patient '{record['patient']}'")
+        if self.patients_by_name[name] is None:
+            raise InvalidRecord(f"patient name '{record['patient']}' is ambiguous, use patient_id")
+        return self.patients_by_name[name]
+
+    def user(self, record) -> Optional[int]:
+        if record.get("user_id") not in (None, ""):
+            user_id = _int(record["user_id"], "user_id")
+            if user_id not in self.user_ids:
+                raise InvalidRecord(f"unknown user_id {user_id}")
+            return user_id
+        email = (record.get("user_email") or "").strip().lower()
+        if not email:
+            return None
+        if email not in self.users_by_email:
+            raise InvalidRecord(f"unknown user_email '{record['user_email']}'")
+        return self.users_by_email[email]
+
+    def medication(self, record, patient_id: int) -> int:
+        if record.get("medication_id") not in (None, ""):
+            medication_id = _int(record["medication_id"], "medication_id")
+            if self.medications.get(medication_id) != patient_id:
+                raise InvalidRecord(f"medication_id {medication_id} does not belong to patient {patient_id}")
+            return medication_id
+        name = (record.get("medication") or "").strip().lower()
+        if not name:
+            raise InvalidRecord("medication_id or medication is required")
+        medication_id = self.medications_by_name.get((patient_id, name))
+        if medication_id is None:
+            raise InvalidRecord(f"patient {patient_id} has no medication '{record['medication']}'")
+        return medication_id
+
+
+def _int(value, field: str) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise InvalidRecord(f"{field} must be an integer")
+
+
+def _timestamp(record, field: str, required: bool = True) -> Optional[datetime]:
+    value = record.get(field)
+    if value in (None, ""):
+        if required:
+            raise InvalidRecord(f"{field} is required")
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        raise InvalidRecord(f"{field} is not an ISO 8601 timestamp")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _required(record, field: str) -> str:
+    value = record.get(field)
+    if value in (None, ""):
+        raise InvalidRecord(f"{field} is required")
+    return str(value)
+
+
+def _convert(kind: str, record: dict, lookups: Lookups, imported_at: datetime) -> tuple:
+    """One input record -> one COPY row, in TABLES column order."""
+    patient_id = lookups.patient(record)
+    user_id = lookups.user(record)
+
+    if kind == "checkins":
+        data = record.get("data")
+        if isinstance(data, str):
+            try:
+                data = json.loads(data) if data else {}
+            except ValueError:
+                raise InvalidRecord("data is not valid JSON")
+        if not isinstance(data, dict):
+            raise InvalidRecord("data must be a JSON object")
+        return (user_id, patient_id, _required(record, "category"), json.dumps(data),
+                _timestamp(record, "timestamp"), imported_at)
+
+    if kind == "symptom_logs":
+        start_time = _timestamp(record, "start_time")
+        end_time = _timestamp(record, "end_time", required=False)
+        if end_time and end_time < start_time:
+            raise InvalidRecord("end_time must be >= start_time")
+        severity = record.get("severity")
+        severity = _int(severity, "severity") if severity not in (None, "") else None
+        return (user_id, patient_id, _required(record, "symptom_type"), start_time, end_time,
+                severity, record.get("notes") or None, imported_at)
+
+    status = _required(record, "status").lower()
+    if status not in ADHERENCE_STATUSES:
+        raise InvalidRecord(f"status must be one of {', '.join(sorted(ADHERENCE_STATUSES))}")
+    return (lookups.medication(record, patient_id), user_id, patient_id, _timestamp(record, "scheduled_time"),
+            _timestamp(record, "taken_time", required=False), status, record.get("notes") or None, imported_at)
+
+
+def read_records(stream, fmt: str) -> Iterator[dict]:
+    """Yields records from a text stream one at a time."""
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        # Passed through so the caller reports it against the right line
+        yield record if isinstance(record, dict) else {"__invalid__": "line is not a JSON object"}
+
+
+def _copy_batch(cursor, table: str, columns, rows):
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+
+def import_records(conn, kind: str, stream, fmt: str = "csv", batch_size: int = BATCH_SIZE) -> dict:
+    """
+    Imports one stream into the kind's table on a SQLAlchemy (psycopg2)
+    connection. The caller commits or rolls back.
+    """
+    if kind not in TABLES:
+        raise ValueError(f"kind must be one of {', '.join(TABLES)}")
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+
+    started = time.time()
+    table, columns = TABLES[kind]
+    lookups = Lookups(conn)
+    cursor = conn.connection.cursor()
+    imported_at = datetime.now(timezone.utc)
+
+    total = imported = skipped = 0
+    errors = []
+    batch = []
+    for total, record in enumerate(read_records(stream, fmt), start=1):
+        try:
+            if "__invalid__" in record:
+                raise InvalidRecord(record["__invalid__"])
+            batch.append(_convert(kind, record, lookups, imported_at))
+        except InvalidRecord as e:
+            skipped += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"record": total, "error": str(e)})
+            continue
+        if len(batch) >= batch_size:
+            _copy_batch(cursor, table, columns, batch)
+            imported += len(batch)
+            batch = []
+    if batch:
+        _copy_batch(cursor, table, columns, batch)
+        imported += len(batch)
+
+    elapsed = time.time() - started
+    log.info(f"IMPORT: {kind}: {imported} imported, {skipped} skipped of {total} in {elapsed:.1f}s")
+    return {
+        "kind": kind,
+        "records": total,
+        "imported": imported,
+        "skipped": skipped,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+    }
+
+
+if __name__ == "__main__":
+    import sys
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("kind", choices=list(TABLES))
+    parser.add_argument("path", help="input file, or - for stdin")
+    parser.add_argument("--format", choices=FORMATS, help="defaults to the file extension (.csv / .ndjson)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="validate and load, then roll back")
+    args = parser.parse_args()
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    from main import engine
+
+    stream = sys.stdin if args.path == "-" else open(args.path, newline="", encoding="utf-8")
+    with stream, engine.connect() as conn:
+        result = import_records(conn, args.kind, stream, fmt, args.batch_size)
+        if args.dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    print(json.dumps(result, indent=2))
+    if args.dry_run:
+        print("Dry run: nothing was saved")
@@ -0,0 +1,154 @@
+"""
+Bulk care-plan editing: a patient's medications and their schedules saved
+as one desired state.
+
+`diff()` compares the desired plan with the rows currently in the database
+and returns the writes that get there:
+
+- new items (no id) are inserted;
+- items whose fields changed are updated;
+- medications and schedules left out of the plan are deactivated, never
+  deleted, so adherence history keeps its references.
+
+Schedules are nested under their medication, so a new medication's schedules
+refer to it by its position in `medication_inserts` until it has an id.
+Every schedule that is written gets its `next_run` recomputed (naive UTC,
+like the column). Active schedules of active medications get their next
+occurrence; the rest get NULL.
+
+The endpoint in main.py locks the patient row, loads the current rows, runs
+`diff()` and applies each list with one set-based statement, all in one
+transaction.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import pytz
+
+import schedules
+
+
+MEDICATION_FIELDS = ("name", "dosage", "frequency", "time", "active")
+SCHEDULE_FIELDS = ("medication_id", "user_id", "time_of_day", "recurrence_rule", "day_of_week",
+                   "timezone", "active", "notes")
+
+
+@dataclass
+class Changes:
+    medication_inserts: List[dict] = field(default_factory=list)
+    medication_updates: List[dict] = field(default_factory=list)  # {"id", changed fields...}
+    medication_deactivations: List[int] = field(default_factory=list)
+    # Inserts carry "medication_ref" (index into medication_inserts) instead of
+    # "medication_id" when their medication is new
+    schedule_inserts: List[dict] = field(default_factory=list)
+    schedule_updates: List[dict] = field(default_factory=list)
+    schedule_deactivations: List[int] = field(default_factory=list)
+
+    def counts(self) -> dict:
+        return {
+            "medications": {"inserted": len(self.medication_inserts), "updated": len(self.medication_updates),
+                            "deactivated": len(self.medication_deactivations)},
+            "schedules": {"inserted": len(self.schedule_inserts), "updated": len(self.schedule_updates),
+                          "deactivated": len(self.schedule_deactivations)},
+        }
+
+
+def normalize_schedule(schedule: dict):
+    """Validates a desired schedule in place; raises ValueError with a message for the client."""
+    try:
+        schedules.parse_time_of_day(schedule["time_of_day"])
+    except (ValueError, AttributeError):
+        raise ValueError(f"Invalid time_of_day {schedule['time_of_day']!r}, expected HH:MM")
+    try:
+        schedules.validate_rule(schedule.get("recurrence_rule"))
+    except ValueError as e:
+        raise ValueError(f"Invalid recurrence_rule: {e}")
+    try:
+        schedules.get_timezone(schedule.get("timezone"))
+    except pytz.UnknownTimeZoneError:
+        raise ValueError(f"Unknown timezone: {schedule.get('timezone')}")
+    if schedule.get("recurrence_rule") != "weekly":
+        schedule["day_of_week"] = None
+
+
+def next_run(schedule: dict, created_at: datetime, medication_active: bool, now: datetime) -> Optional[datetime]:
+    if not schedule.get("active") or not medication_active:
+        return None
+    try:
+        instant = schedules.next_occurrence(SimpleNamespace(created_at=created_at, **schedule), now)
+    except ValueError:
+        return None
+    return instant.replace(tzinfo=None) if instant else None
+
+
+def diff(patient_id: int, desired: List[dict], medications: Dict[int, dict], current_schedules: Dict[int, dict],
+         now: datetime) -> Changes:
+    """
+    desired: [{"id"?, medication fields..., "schedules": [{"id"?, schedule fields...}]}]
+    medications / current_schedules: the patient's current rows by id, as dicts
+    (schedules with "created_at"). Raises ValueError for ids that aren't the
+    patient's, ids listed twice, and invalid schedules.
+    """
+    changes = Changes()
+    seen_medications, seen_schedules = set(), set()
+
+    for medication in desired:
+        medication_id = medication.get("id")
+        values = {key: medication[key] for key in MEDICATION_FIELDS}
+        if medication_id is None:
+            ref = len(changes.medication_inserts)
+            changes.medication_inserts.append({"patient_id": patient_id, **values, "created_at": now})
+        else:
+            if medication_id not in medications:
+                raise ValueError(f"Medication {medication_id} does not belong to patient {patient_id}")
+            if medication_id in seen_medications:
+                raise ValueError(f"Medication {medication_id} is listed twice")
+            seen_medications.add(medication_id)
+            changed = {key: value for key, value in values.items() if medications[medication_id][key] != value}
+            if changed:
+                changes.medication_updates.append({"id": medication_id, **changed})
+
+        for schedule in medication.get("schedules", []):
+            schedule_id = schedule.get("id")
+            values = {key: schedule.get(key) for key in SCHEDULE_FIELDS if key != "medication_id"}
+            normalize_schedule(values)
+            if medication_id is not None:
+                values["medication_id"] = medication_id
+            if schedule_id is None:
+                row = {**values, "patient_id": patient_id, "created_at": now,
+                       "next_run": next_run(values, now, medication["active"], now)}
+                if medication_id is None:
+                    row["medication_ref"] = ref
+                changes.schedule_inserts.append(row)
+                continue
+
+            current = current_schedules.get(schedule_id)
+            if current is None:
+                raise ValueError(f"Schedule {schedule_id} does not belong to patient {patient_id}")
+            if schedule_id in seen_schedules:
+                raise ValueError(f"Schedule {schedule_id} is listed twice")
+            seen_schedules.add(schedule_id)
+            if medication_id is None:
+                raise ValueError(f"Schedule {schedule_id} can't move to a medication that doesn't exist yet")
+            changed = {key: value for key, value in values.items() if current[key] != value}
+            if current["patient_id"] != patient_id:
+                changed["patient_id"] = patient_id
+            # Also catches unchanged schedules whose stored next run has passed
+            expected = next_run(values, current["created_at"], medication["active"], now)
+            if changed or expected != current["next_run"]:
+                changes.schedule_updates.append({"id": schedule_id, **changed, "next_run": expected})
+
+    changes.medication_deactivations = sorted(
+        medication_id for medication_id, row in medications.items()
+        if medication_id not in seen_medications and row["active"]
+    )
+    omitted = set(changes.medication_deactivations)
+    changes.schedule_deactivations = sorted(
+        schedule_id for schedule_id, row in current_schedules.items()
+        if schedule_id not in seen_schedules
+        and (row["active"] or row["next_run"] is not None)
+        and (row["medication_id"] in omitted or row["medication_id"] in seen_medications)
+    )
+    return changes
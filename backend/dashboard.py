@@ -0,0 +1,164 @@
+"""
+The "today" dashboard for a patient: active medications, today's schedule
+occurrences with their adherence status, and today's check-in/symptom
+timeline, in one response.
+
+The endpoint in main.py runs a handful of set-based queries for the day's
+window and hands the rows to `build_today()`. The encoded JSON body is kept
+in `TodayCache` for DASHBOARD_CACHE_TTL seconds per patient and day. Writes
+that change what the dashboard shows drop the patient's entries, so the TTL
+only bounds how late the clock catches up (a pending dose becoming missed).
+"""
+import os
+import json
+from datetime import datetime
+from typing import Optional
+
+import ttl_cache
+
+
+RECORDED_STATUSES = {"taken", "skipped", "late", "missed"}
+
+
+def occurrence_status(adherence_status: Optional[str], scheduled_time: datetime, now: datetime) -> str:
+    """A recorded outcome as is; otherwise pending until the dose time passes, then missed."""
+    if adherence_status in RECORDED_STATUSES:
+        return adherence_status
+    return "missed" if scheduled_time < now else "pending"
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def build_today(day, tz_name: str, medications, occurrences, adherence_rows, as_needed, checkins, symptoms,
+                now: datetime) -> dict:
+    """
+    Assembles the dashboard from query rows.
+
+    occurrences: (schedule, scheduled_time) pairs for the day
+    adherence_rows: the day's adherence records (id, schedule_id, medication_id,
+        scheduled_time, taken_time, status, notes)
+    as_needed: schedules with no fixed times
+    checkins / symptoms: the day's rows, with user_name
+    """
+    by_schedule = {}
+    by_medication = {}
+    for row in adherence_rows:
+        if row.schedule_id is not None:
+            by_schedule[(row.schedule_id, row.scheduled_time)] = row
+        # Doses recorded from the app carry no schedule_id; match them on medication and time
+        by_medication.setdefault((row.medication_id, row.scheduled_time), row)
+
+    medication_names = {m.id: m.name for m in medications}
+    schedule_items = []
+    for schedule, scheduled_time in occurrences:
+        record = (by_schedule.get((schedule.id, scheduled_time))
+                  or by_medication.get((schedule.medication_id, scheduled_time)))
+        schedule_items.append({
+            "schedule_id": schedule.id,
+            "medication_id": schedule.medication_id,
+            "medication_name": medication_names.get(schedule.medication_id),
+            "scheduled_time": scheduled_time.isoformat(),
+            "time_of_day": schedule.time_of_day,
+            "timezone": schedule.timezone,
+            "status": occurrence_status(record.status if record else None, scheduled_time, now),
+            "adherence_id": record.id if record else None,
+            "taken_time": _iso(record.taken_time) if record else None,
+        })
+    schedule_items.sort(key=lambda item: item["scheduled_time"])
+
+    timeline = [
+        {
+            "kind": "checkin",
+            "id": row.id,
+            "category": row.category,
+            "data": row.data,
+            "timestamp": row.timestamp.isoformat(),
+            "user_id": row.user_id,
+            "user_name": row.user_name,
+        }
+        for row in checkins
+    ] + [
+        {
+            "kind": "symptom",
+            "id": row.id,
+            "category": "Symptoms",
+            "data": {
+                "symptom": row.symptom_type,
+                "severity": row.severity,
+                "notes": row.notes,
+                "start_time": row.start_time.isoformat(),
+                "end_time": _iso(row.end_time),
+            },
+            "timestamp": row.start_time.isoformat(),
+            "user_id": row.user_id,
+            "user_name": row.user_name,
+        }
+        for row in symptoms
+    ]
+    timeline.sort(key=lambda item: item["timestamp"], reverse=True)
+
+    counts = {}
+    for item in schedule_items:
+        counts[item["status"]] = counts.get(item["status"], 0) + 1
+
+    return {
+        "date": day.isoformat(),
+        "timezone": tz_name,
+        "generated_at": now.isoformat(),
+        "medications": [
+            {"id": m.id, "name": m.name, "dosage": m.dosage, "frequency": m.frequency, "time": m.time}
+            for m in medications
+        ],
+        "schedule": schedule_items,
+        "as_needed": [
+            {"schedule_id": s.id, "medication_id": s.medication_id,
+             "medication_name": medication_names.get(s.medication_id), "notes": s.notes}
+            for s in as_needed
+        ],
+        "doses": counts,
+        "timeline": timeline,
+    }
+
+
+def encode(payload: dict) -> bytes:
+    return json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+
+
+class TodayCache:
+    """
+    Encoded dashboard bodies keyed by (patient, date, timezone), at most
+    max_patients of them (in practice one day per patient), least recently
+    used evicted first.
+    """
+
+    def __init__(self, max_patients: int, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._bodies = ttl_cache.TTLCache(max_patients, ttl_seconds)
+
+    def get(self, patient_id: int, key: tuple) -> Optional[bytes]:
+        if self.ttl_seconds <= 0:
+            return None
+        return self._bodies.get((patient_id, *key))
+
+    def put(self, patient_id: int, key: tuple, body: bytes):
+        if self.ttl_seconds <= 0:
+            return
+        self._bodies.put((patient_id, *key), body)
+
+    def invalidate(self, patient_id: Optional[int]):
+        self._bodies.pop_where(lambda key: key[0] == patient_id)
+
+    def clear(self):
+        self._bodies.clear()
+
+    def info(self) -> dict:
+        return self._bodies.info("bodies")
+
+
+def cache_from_env() -> TodayCache:
+    return TodayCache(
+        max_patients=int(os.getenv("DASHBOARD_CACHE_PATIENTS", "1024")),
+        ttl_seconds=float(os.getenv("DASHBOARD_CACHE_TTL", "15")),
+    )
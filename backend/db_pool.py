@@ -0,0 +1,150 @@
+"""
+Connection pool configuration and metrics.
+
+Pool sizing is read from the environment so the web process, the scheduler
+and the Celery workers can each be tuned to fit the database's connection
+limit:
+
+    DB_POOL_SIZE          persistent connections per pool (default 5)
+    DB_MAX_OVERFLOW       extra connections opened under load (default 10)
+    DB_POOL_TIMEOUT       seconds to wait for a free connection (default 30)
+    DB_POOL_RECYCLE       reconnect connections older than this, seconds (default 1800)
+    DB_POOL_PRE_PING      test connections on checkout (default true)
+    DB_PGBOUNCER          set when connecting through PgBouncer in transaction
+                          pooling mode; disables server-side prepared statements
+
+Every pool created here records checkout wait times, connections in use,
+overflow connections and checkout timeouts; see `pool_stats()`.
+"""
+import os
+import time
+import uuid
+import threading
+from typing import Dict
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def pool_settings() -> dict:
+    """Reads the pool settings; called when engines are created, after .env is loaded."""
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+        "pgbouncer": _env_bool("DB_PGBOUNCER", False),
+    }
+
+# Upper bounds (seconds) of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+class PoolStats:
+    """Counters for one pool. Updated from the pool's checkout path."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+        self.overflow_events = 0
+        self.timeouts = 0
+
+    def observe_checkout(self, wait: float, overflowed: bool):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+            for i, bound in enumerate(WAIT_BUCKETS):
+                if wait <= bound:
+                    self.wait_buckets[i] += 1
+                    break
+            else:
+                self.wait_buckets[-1] += 1
+            if overflowed:
+                self.overflow_events += 1
+
+    def observe_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        with self._lock:
+            return {
+                "pool_size": pool.size() if pool else None,
+                "checked_out": pool.checkedout() if pool else None,
+                "checked_in": pool.checkedin() if pool else None,
+                "overflow": max(pool.overflow(), 0) if pool else None,
+                "max_overflow": pool._max_overflow if pool else None,
+                "checkouts": self.checkouts,
+                "checkout_wait_seconds_total": round(self.wait_seconds_total, 6),
+                "checkout_wait_seconds_max": round(self.wait_seconds_max, 6),
+                "checkout_wait_buckets": dict(zip([str(b) for b in WAIT_BUCKETS] + ["+Inf"], self.wait_buckets)),
+                "overflow_events": self.overflow_events,
+                "timeouts": self.timeouts,
+            }
+
+
+_stats: Dict[str, PoolStats] = {}
+
+
+class _InstrumentedPoolMixin:
+    stats: PoolStats = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # recreate() (after dispose/invalidation) builds a new instance of this class
+        self.stats.pool = self
+
+    def _do_get(self):
+        started = time.perf_counter()
+        overflow_before = self._overflow
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.observe_timeout()
+            raise
+        # _overflow only goes above zero once the persistent pool is exhausted
+        overflowed = self._overflow > overflow_before and self._overflow > 0
+        self.stats.observe_checkout(time.perf_counter() - started, overflowed)
+        return record
+
+
+def _instrumented(base, name: str):
+    stats = _stats.setdefault(name, PoolStats(name))
+    return type(f"Instrumented{base.__name__}", (_InstrumentedPoolMixin, base), {"stats": stats})
+
+
+def engine_options(name: str, is_async: bool = False) -> dict:
+    """Keyword arguments for create_engine / create_async_engine."""
+    options = pool_settings()
+    pgbouncer = options.pop("pgbouncer")
+    options["poolclass"] = _instrumented(AsyncAdaptedQueuePool if is_async else QueuePool, name)
+    if pgbouncer and is_async:
+        # PgBouncer in transaction mode may hand each transaction a different
+        # server connection, so named prepared statements can't be reused.
+        # psycopg2 never prepares server-side, so only asyncpg needs this.
+        options["connect_args"] = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+    return options
+
+
+def pool_stats() -> Dict[str, dict]:
+    """Snapshot of every instrumented pool, keyed by pool name."""
+    return {name: stats.snapshot() for name, stats in _stats.items()}
@@ -0,0 +1,331 @@
+"""
+Drug-name autocomplete from a local dataset.
+
+Names come from DRUG_NAMES_FILE (data/drug_names.csv: name, kind), plus
+every name already entered in medications, so agency-specific products are
+suggested too. `DrugIndex` holds them in memory as a sorted array of
+(word, entry) pairs: a query's first word is a bisect range over that array,
+and each entry's other words must start with the query's other words.
+
+When a prefix finds too few names, words within one typo (two for longer
+words) of the query's first word are tried as well. Candidate words come from
+a bigram index and are confirmed with an edit distance, so a fuzzy lookup
+only touches a handful of words.
+
+Results rank prefix-of-name over prefix-of-a-later-word over fuzzy, then by
+how many medications already use the name. Answers are memoized per index
+(DRUG_SEARCH_CACHE_SIZE); the index is rebuilt with fresh usage counts every
+DRUG_USAGE_REFRESH_MINUTES.
+
+The bundled list covers common outpatient medications. A full list can be
+built from the openFDA NDC download:
+
+    python drug_search.py import-ndc drug-ndc-0001-of-0001.json > data/drug_names.csv
+"""
+import os
+import re
+import csv
+import sys
+import json
+import logging
+import threading
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import text
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_NAMES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "drug_names.csv")
+MIN_QUERY_LENGTH = 2
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+MIN_FUZZY_LENGTH = 4
+FUZZY_PREFIX_CHARS = 16
+MAX_FUZZY_CANDIDATES = 64
+CONTEXTS = {"brand": "Brand Name", "generic": "Generic Name", "used": "In use"}
+
+USAGE_QUERY = text("SELECT name, count(*) FROM medications WHERE name IS NOT NULL GROUP BY name")
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize(name: str) -> str:
+    return " ".join(_WORD.findall((name or "").lower()))
+
+
+def max_edits(word: str) -> int:
+    return 1 if len(word) <= 5 else 2
+
+
+def prefix_distance(query: str, word: str, limit: int) -> int:
+    """
+    Fewest edits (insert, delete, substitute, swap adjacent) turning `query`
+    into some prefix of `word`; anything above `limit` is reported as limit + 1.
+    Only cells within `limit` of the diagonal are computed.
+    """
+    over = limit + 1
+    word = word[:len(query) + limit]
+    width = len(word) + 1
+    previous = None
+    row = [j if j <= limit else over for j in range(width)]
+    for i in range(1, len(query) + 1):
+        qc = query[i - 1]
+        current = [over] * width
+        if i <= limit:
+            current[0] = i
+        for j in range(max(1, i - limit), min(width - 1, i + limit) + 1):
+            wc = word[j - 1]
+            cost = min(row[j] + 1, current[j - 1] + 1, row[j - 1] + (qc != wc))
+            if previous is not None and j > 1 and qc == word[j - 2] and query[i - 2] == wc:
+                cost = min(cost, previous[j - 2] + 1)
+            current[j] = cost
+        if min(current) > limit:
+            return over
+        previous, row = row, current
+    return min(min(row), over)
+
+
+def _bigrams(word: str) -> list:
+    return [(i, word[i:i + 2]) for i in range(len(word) - 1)]
+
+
+class DrugIndex:
+    """
+    entries: (name, kind) pairs, deduplicated on the normalized name.
+    usage: medication name -> number of medications using it, as entered.
+    """
+
+    def __init__(self, entries, usage: Optional[dict] = None, cache_size: int = 4096):
+        # Spelling variants of one name count together; the commonest spelling is shown
+        counts, spellings = {}, {}
+        for name, count in sorted((usage or {}).items(), key=lambda item: -item[1]):
+            key = normalize(name)
+            if key:
+                counts[key] = counts.get(key, 0) + count
+                spellings.setdefault(key, name)
+
+        self.names, self.contexts, self.usage, self.keys = [], [], [], []
+        seen = set()
+        for name, kind in entries:
+            self._add(name, kind, counts, seen)
+        # Names in use that the dataset lacks (local products, spellings the agency settled on)
+        for key, name in spellings.items():
+            self._add(name, "used", counts, seen)
+
+        # Rank of each entry among equally good matches: most used, then shortest, then A-Z
+        order = sorted(range(len(self.keys)), key=lambda e: (-self.usage[e], len(self.keys[e]), self.keys[e]))
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        self._tier = max(len(order), 1)
+
+        # One (word, entry) pair per distinct word of each name, scored so that a
+        # match on a name's first word beats a match on a later word
+        pairs = sorted(
+            (word, position > 0, int(rank[entry]), entry)
+            for entry, key in enumerate(self.keys)
+            for position, word in enumerate(dict.fromkeys(key.split()))
+        )
+        self.words = [word for word, _, _, _ in pairs]
+        self.pair_entries = np.array([entry for _, _, _, entry in pairs], dtype=np.int64)
+        self.pair_scores = np.array([later * self._tier + r for _, later, r, _ in pairs], dtype=np.int64)
+
+        self.vocabulary = sorted(set(self.words))
+        self.vocabulary_lengths = np.array([len(word) for word in self.vocabulary], dtype=np.int64)
+        grams = {}
+        for word_id, word in enumerate(self.vocabulary):
+            for position, gram in _bigrams(word[:FUZZY_PREFIX_CHARS]):
+                grams.setdefault((gram, position), []).append(word_id)
+        self.grams = {gram: np.array(ids, dtype=np.int64) for gram, ids in grams.items()}
+
+        self._search = lru_cache(maxsize=cache_size)(self._uncached_search)
+
+    def _add(self, name, kind, usage, seen):
+        key = normalize(name)
+        if not key or key in seen:
+            return
+        seen.add(key)
+        self.names.append(name.strip())
+        self.contexts.append(CONTEXTS.get(kind, CONTEXTS["generic"]))
+        self.usage.append(usage.get(key, 0))
+        self.keys.append(key)
+
+    def __len__(self):
+        return len(self.names)
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> list:
+        """-> [{"name", "context", "usage"}] best first; [] for queries under MIN_QUERY_LENGTH."""
+        key = normalize(query)
+        if len(key) < MIN_QUERY_LENGTH:
+            return []
+        return [
+            {"name": self.names[entry], "context": self.contexts[entry], "usage": self.usage[entry]}
+            for entry in self._search(key, max(1, min(limit, MAX_LIMIT)))
+        ]
+
+    def _word_range(self, prefix: str, exact: bool = False) -> tuple:
+        lo = bisect_left(self.words, prefix)
+        hi = bisect_left(self.words, prefix + ("\0" if exact else "\uffff"), lo)
+        return lo, hi
+
+    def _best(self, ranges, allowed, limit: int, tier: int) -> dict:
+        """entry -> score for the best `limit` entries among the pairs in `ranges` (and `allowed`, a mask)."""
+        entries = np.concatenate([self.pair_entries[lo:hi] for lo, hi in ranges])
+        scores = np.concatenate([self.pair_scores[lo:hi] for lo, hi in ranges]) + tier * self._tier
+        if allowed is not None:
+            keep = allowed[entries]
+            entries, scores = entries[keep], scores[keep]
+        if len(scores) > limit * 4:
+            # A name can match through more than one of its words; leave room for those repeats
+            top = np.argpartition(scores, limit * 4)[:limit * 4]
+            entries, scores = entries[top], scores[top]
+        best = {}
+        for position in np.argsort(scores, kind="stable"):
+            entry = int(entries[position])
+            if entry not in best:
+                best[entry] = int(scores[position])
+                if len(best) == limit:
+                    break
+        return best
+
+    def _uncached_search(self, key: str, limit: int) -> tuple:
+        first, *rest = key.split()
+        allowed = None
+        for part in rest:
+            lo, hi = self._word_range(part)
+            matches = np.zeros(len(self.names), dtype=bool)
+            matches[self.pair_entries[lo:hi]] = True
+            allowed = matches if allowed is None else allowed & matches
+
+        best = self._best([self._word_range(first)], allowed, limit, tier=0)
+        if len(best) < limit and len(first) >= MIN_FUZZY_LENGTH:
+            by_distance = {}
+            for word, distance in self._fuzzy_words(first):
+                by_distance.setdefault(distance, []).append(self._word_range(word, exact=True))
+            # One edit away beats two; both rank below any prefix match
+            for distance in sorted(by_distance):
+                for entry, score in self._best(by_distance[distance], allowed, limit, tier=1 + distance).items():
+                    best.setdefault(entry, score)
+
+        return tuple(sorted(best, key=best.get)[:limit])
+
+    def _fuzzy_words(self, word: str) -> list:
+        """(vocabulary word, edits) for words with a prefix within max_edits(word) of `word`."""
+        edits = max_edits(word)
+        query_grams = _bigrams(word)
+        counts = np.zeros(len(self.vocabulary), dtype=np.int64)
+        for position, gram in query_grams:
+            # Each edit shifts the rest of the word by at most one place
+            found = np.zeros(len(self.vocabulary), dtype=bool)
+            for p in range(max(0, position - edits), position + edits + 1):
+                if (gram, p) in self.grams:
+                    found[self.grams[(gram, p)]] = True
+            counts += found
+        # Each edit breaks at most two of the query's bigrams; shorter words can't hold a close prefix
+        needed = max(1, len(query_grams) - 2 * edits)
+        candidates = np.nonzero((counts >= needed) & (self.vocabulary_lengths >= len(word) - edits))[0]
+        if len(candidates) > MAX_FUZZY_CANDIDATES:
+            candidates = candidates[np.argsort(-counts[candidates], kind="stable")[:MAX_FUZZY_CANDIDATES]]
+        matches = []
+        for word_id in candidates:
+            distance = prefix_distance(word, self.vocabulary[word_id], edits)
+            if distance <= edits:
+                matches.append((self.vocabulary[word_id], distance))
+        return matches
+
+    def info(self) -> dict:
+        cache = self._search.cache_info()
+        return {"names": len(self.names), "words": len(self.vocabulary),
+                "cache_hits": cache.hits, "cache_misses": cache.misses, "cache_size": cache.currsize}
+
+
+def load_names(path: Optional[str] = None) -> list:
+    """(name, kind) pairs from a name,kind CSV."""
+    path = path or os.getenv("DRUG_NAMES_FILE") or DEFAULT_NAMES_FILE
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            return [(row["name"], (row.get("kind") or "generic").strip().lower())
+                    for row in csv.DictReader(f) if row.get("name")]
+    except FileNotFoundError:
+        log.warning(f"DRUG_SEARCH: {path} not found; suggesting only names already in use")
+        return []
+
+
+def load_usage(conn) -> dict:
+    """medication name -> how many medications use it."""
+    return {name: count for name, count in conn.execute(USAGE_QUERY)}
+
+
+class DrugSearch:
+    """The current DrugIndex, rebuilt with fresh usage counts by `refresh()`."""
+
+    def __init__(self, names_file: Optional[str] = None, cache_size: int = 4096):
+        self.names_file = names_file
+        self.cache_size = cache_size
+        self._entries = None
+        self._index = None
+        self._lock = threading.Lock()
+
+    def _dataset(self) -> list:
+        if self._entries is None:
+            self._entries = load_names(self.names_file)
+        return self._entries
+
+    @property
+    def index(self) -> DrugIndex:
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = DrugIndex(self._dataset(), cache_size=self.cache_size)
+        return self._index
+
+    def refresh(self, engine):
+        with engine.connect() as conn:
+            usage = load_usage(conn)
+        index = DrugIndex(self._dataset(), usage, cache_size=self.cache_size)
+        with self._lock:
+            self._index = index
+        log.info(f"DRUG_SEARCH: indexed {len(index)} names, {len(usage)} in use")
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> list:
+        return self.index.search(query, limit)
+
+
+def search_from_env() -> DrugSearch:
+    return DrugSearch(
+        names_file=os.getenv("DRUG_NAMES_FILE") or None,
+        cache_size=int(os.getenv("DRUG_SEARCH_CACHE_SIZE", "4096")),
+    )
+
+
+def usage_refresh_minutes() -> float:
+    return float(os.getenv("DRUG_USAGE_REFRESH_MINUTES", "60"))
+
+
+def import_ndc(path: str, out=sys.stdout):
+    """Writes name,kind CSV rows for the brand and generic names in an openFDA NDC JSON download."""
+    with open(path, encoding="utf-8") as f:
+        products = json.load(f).get("results", [])
+    names = {}
+    for product in products:
+        for field, kind in (("generic_name", "generic"), ("brand_name", "brand")):
+            name = (product.get(field) or "").strip()
+            # Brand wins when a name is listed both ways
+            if name and (normalize(name) not in names or kind == "brand"):
+                names[normalize(name)] = (name if kind == "brand" else name.lower(), kind)
+    writer = csv.writer(out)
+    writer.writerow(["name", "kind"])
+    writer.writerows(sorted(names.values(), key=lambda row: row[0].lower()))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "import-ndc":
+        import_ndc(sys.argv[2])
+    elif len(sys.argv) >= 3 and sys.argv[1] == "search":
+        print(json.dumps(DrugIndex(load_names()).search(" ".join(sys.argv[2:])), indent=2))
+    else:
+        print("usage: python drug_search.py import-ndc <drug-ndc.json> | search <query>", file=sys.stderr)
+        sys.exit(2)
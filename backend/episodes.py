@@ -0,0 +1,220 @@
+"""
+Symptom episodes: a patient's symptom logs merged, per symptom type, into
+continuous episodes.
+
+Logs of the same type whose times overlap, or that follow one another within
+EPISODE_MERGE_GAP_MINUTES (default 0: back to back), form one episode. A log
+without an end_time is a point in time: it counts toward its episode's logs
+and joins an episode it falls in, but adds no duration.
+
+Each symptom type's episodes are an `EpisodeSet`: disjoint intervals in
+parallel lists sorted by start (so their ends are sorted too). Adding a log
+bisects to the episodes it touches and replaces them with their union, so
+logs may arrive in any order, backfilled history included. Window questions
+(hours with nausea this week, the longest episode, episodes per week) bisect
+to the window's first episode and walk only the episodes inside it.
+
+Like the insights snapshots (see insights.py), indexes are cached per patient
+(LRU) and each read first merges in the patient's recent logs, one small
+indexed query. Inserts from any process are therefore picked up without
+rescanning history. Ids are handed out before commit, so a log can become
+visible after one with a higher id; each refresh re-reads the last
+EPISODE_REFRESH_OVERLAP ids below the high-water mark and skips the ones
+already merged. Updates and deletes can't be seen that way: writes in this
+process call `invalidate()` (bulk imports and partition archival call
+`clear()`), and indexes are rebuilt after EPISODE_INDEX_TTL seconds to pick
+up changes made elsewhere.
+"""
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+
+import ttl_cache
+
+
+HOUR = 3600
+WEEK = 7 * 86400
+
+LOAD_QUERY = text("""
+    SELECT id, symptom_type, EXTRACT(EPOCH FROM start_time)::bigint, EXTRACT(EPOCH FROM end_time)::bigint, severity
+    FROM symptom_logs WHERE patient_id = :patient_id AND id > :since ORDER BY id
+""")
+
+
+class EpisodeSet:
+    """Disjoint episodes of one symptom type, sorted by start (epoch seconds)."""
+
+    def __init__(self, gap_seconds: int = 0):
+        self.gap = gap_seconds
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        self.logs: List[int] = []
+        self.peak: List[Optional[int]] = []  # highest severity, None when never recorded
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def add(self, start: int, end: Optional[int] = None, severity: Optional[int] = None):
+        end = start if end is None or end < start else end
+        # Episodes ending at or after start - gap and starting at or before end + gap
+        lo = bisect_left(self.ends, start - self.gap)
+        hi = bisect_right(self.starts, end + self.gap)
+        if lo >= hi:
+            self.starts.insert(lo, start)
+            self.ends.insert(lo, end)
+            self.logs.insert(lo, 1)
+            self.peak.insert(lo, severity)
+            return
+        peaks = [p for p in self.peak[lo:hi] if p is not None]
+        if severity is not None:
+            peaks.append(severity)
+        self.starts[lo:hi] = [min(start, self.starts[lo])]
+        self.ends[lo:hi] = [max(end, self.ends[hi - 1])]
+        self.logs[lo:hi] = [sum(self.logs[lo:hi]) + 1]
+        self.peak[lo:hi] = [max(peaks) if peaks else None]
+
+    def overlapping(self, start: int, end: int) -> range:
+        """Indexes of the episodes overlapping [start, end)."""
+        return range(bisect_left(self.ends, start), bisect_left(self.starts, end))
+
+    def episode(self, i: int) -> dict:
+        return {
+            "start": _iso(self.starts[i]),
+            "end": _iso(self.ends[i]),
+            "hours": round((self.ends[i] - self.starts[i]) / HOUR, 2),
+            "logs": self.logs[i],
+            "max_severity": self.peak[i],
+        }
+
+    def summary(self, start: int, end: int) -> dict:
+        """Episodes overlapping [start, end): count, hours inside the window, longest and per-week rate."""
+        window = self.overlapping(start, end)
+        seconds = sum(min(self.ends[i], end) - max(self.starts[i], start) for i in window)
+        longest = max(window, key=lambda i: self.ends[i] - self.starts[i], default=None)
+        return {
+            "episodes": len(window),
+            "logs": sum(self.logs[i] for i in window),
+            "total_hours": round(seconds / HOUR, 2),
+            "mean_hours": round(seconds / HOUR / len(window), 2) if window else None,
+            "longest": self.episode(longest) if longest is not None else None,
+            "episodes_per_week": round(len(window) * WEEK / (end - start), 2),
+        }
+
+
+class PatientEpisodes:
+    """One patient's episode sets by symptom type, appendable by log id."""
+
+    def __init__(self, patient_id: int, gap_seconds: int):
+        self.patient_id = patient_id
+        self.gap_seconds = gap_seconds
+        self.lock = threading.Lock()
+        self.high_water = 0
+        self.recent = set()  # merged ids within the overlap below high_water
+        self.types: Dict[str, EpisodeSet] = {}
+
+    def refresh(self, conn, overlap: int = 0) -> int:
+        """
+        Merges in logs with ids above high_water - overlap that aren't merged
+        yet; returns how many were merged.
+        """
+        rows = conn.execute(
+            LOAD_QUERY, {"patient_id": self.patient_id, "since": max(0, self.high_water - overlap)}
+        ).all()
+        merged = 0
+        for log_id, symptom_type, start, end, severity in rows:
+            if log_id in self.recent:
+                continue
+            self.recent.add(log_id)
+            episodes = self.types.get(symptom_type)
+            if episodes is None:
+                episodes = self.types[symptom_type] = EpisodeSet(self.gap_seconds)
+            episodes.add(start, end, severity)
+            merged += 1
+        if rows:
+            self.high_water = max(self.high_water, rows[-1][0])
+        floor = self.high_water - overlap
+        self.recent = {log_id for log_id in self.recent if log_id > floor}
+        return merged
+
+    def reset(self):
+        self.high_water = 0
+        self.recent = set()
+        self.types = {}
+
+
+class EpisodeIndex:
+    """LRU of per-patient episode sets, refreshed incrementally on every read."""
+
+    def __init__(self, engine, gap_seconds: int = 0, max_patients: int = 256, ttl_seconds: float = 300,
+                 overlap: int = 1000):
+        self.engine = engine
+        self.gap_seconds = gap_seconds
+        self.overlap = overlap
+        self._patients = ttl_cache.TTLCache(max_patients, ttl_seconds)
+
+    def patient(self, patient_id: int) -> PatientEpisodes:
+        patient = self._patients.get_or_create(patient_id, lambda: PatientEpisodes(patient_id, self.gap_seconds))
+        with patient.lock:
+            with self.engine.connect() as conn:
+                patient.refresh(conn, self.overlap)
+        return patient
+
+    def summary(self, patient_id: int, start: datetime, end: datetime, symptom_type: Optional[str] = None,
+                include_episodes: bool = True) -> dict:
+        """Per-type episode statistics for [start, end) (aware datetimes), and the episodes themselves."""
+        patient = self.patient(patient_id)
+        a, b = int(start.timestamp()), int(end.timestamp())
+        with patient.lock:
+            types = {name: episodes for name, episodes in patient.types.items()
+                     if symptom_type is None or name == symptom_type}
+            body = {
+                "patient_id": patient_id,
+                "from": _iso(a),
+                "to": _iso(b),
+                "merge_gap_minutes": self.gap_seconds / 60,
+                "symptoms": {},
+            }
+            for name in sorted(types):
+                stats = types[name].summary(a, b)
+                if stats["episodes"]:
+                    body["symptoms"][name] = stats
+            if include_episodes:
+                body["episodes"] = sorted(
+                    ({"symptom_type": name, **types[name].episode(i)}
+                     for name in body["symptoms"] for i in types[name].overlapping(a, b)),
+                    key=lambda episode: episode["start"]
+                )
+        return body
+
+    def invalidate(self, patient_id: int):
+        """Call after updating or deleting a patient's symptom logs."""
+        patient = self._patients.peek(patient_id)
+        if patient is None:
+            return
+        with patient.lock:
+            patient.reset()
+
+    def clear(self):
+        """Call after changes to many patients' logs (bulk imports, archived partitions)."""
+        self._patients.clear()
+
+    def info(self) -> dict:
+        return self._patients.info("patients")
+
+
+def _iso(ts: int) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+def cache_from_env(engine) -> EpisodeIndex:
+    return EpisodeIndex(
+        engine,
+        gap_seconds=int(float(os.getenv("EPISODE_MERGE_GAP_MINUTES", "0")) * 60),
+        max_patients=int(os.getenv("EPISODE_INDEX_PATIENTS", "256")),
+        ttl_seconds=float(os.getenv("EPISODE_INDEX_TTL", "300")),
+        overlap=int(os.getenv("EPISODE_REFRESH_OVERLAP", "1000")),
+    )
@@ -0,0 +1,382 @@
+"""
+Server-side insights over a patient's history.
+
+A patient's symptom logs, numeric check-in values and adherence outcomes are
+held as NumPy column arrays (a "snapshot"). Insights are computed from the
+snapshot with vectorized operations: rows are binned into UTC days with
+bincount, rolling means and baselines come from cumulative sums, so a
+request costs the same few array passes whether the patient has a month or
+ten years of data.
+
+Snapshots are cached per patient (LRU). Each request first appends rows
+with an id above the snapshot's high-water mark (one small indexed query
+per table), so new writes from any process show up immediately. Ids are
+handed out before commit, so the query re-reads EPISODE_REFRESH_OVERLAP ids
+below the mark and skips the ones already appended. Updates and
+deletes can't be seen that way: writes in this process call `invalidate()`,
+and snapshots are rebuilt after INSIGHTS_SNAPSHOT_TTL seconds to pick up
+changes made elsewhere.
+"""
+import os
+import time
+import logging
+import threading
+from datetime import date, timedelta
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import text
+
+import ttl_cache
+
+
+log = logging.getLogger(__name__)
+
+DAY = 86400
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+# Adherence status codes; taken and late both count as taken
+STATUS_CODES = {"pending": 0, "taken": 1, "late": 2, "skipped": 3, "missed": 4}
+OTHER_STATUS = 5
+MIN_CORRELATION_DAYS = 7
+ANOMALY_BASELINE_DAYS = 28
+ANOMALY_MIN_BASELINE_DAYS = 7
+
+LOAD_QUERIES = {
+    "symptoms": text("""
+        SELECT id, EXTRACT(EPOCH FROM start_time)::bigint, severity, symptom_type
+        FROM symptom_logs WHERE patient_id = :patient_id AND id > :since ORDER BY id
+    """),
+    "checkins": text("""
+        SELECT id, EXTRACT(EPOCH FROM timestamp)::bigint, category, data
+        FROM checkins
+        WHERE patient_id = :patient_id AND id > :since AND timestamp IS NOT NULL AND category != 'Symptoms'
+        ORDER BY id
+    """),
+    "adherence": text("""
+        SELECT id, EXTRACT(EPOCH FROM scheduled_time)::bigint, status
+        FROM medication_adherence WHERE patient_id = :patient_id AND id > :since ORDER BY id
+    """),
+}
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+class PatientSnapshot:
+    """Column arrays for one patient's history, appendable by id."""
+
+    def __init__(self, patient_id: int):
+        self.patient_id = patient_id
+        self.lock = threading.Lock()
+        self.built_at = time.time()
+        self.high_water = {name: 0 for name in LOAD_QUERIES}
+        self.recent = {name: set() for name in LOAD_QUERIES}  # appended ids within the overlap
+        self.symptom_ts = np.empty(0, dtype=np.int64)
+        self.symptom_severity = np.empty(0, dtype=np.float64)  # NaN when not recorded
+        self.symptom_type = np.empty(0, dtype=np.int32)
+        self.symptom_types = {}  # name -> code
+        self.metric_ts = np.empty(0, dtype=np.int64)
+        self.metric_value = np.empty(0, dtype=np.float64)
+        self.metric_code = np.empty(0, dtype=np.int32)
+        self.metric_names = {}  # "Category.field" -> code
+        self.adherence_ts = np.empty(0, dtype=np.int64)
+        self.adherence_status = np.empty(0, dtype=np.int8)
+
+    def reset(self, table: str):
+        self.high_water[table] = 0
+        self.recent[table] = set()
+        if table == "symptoms":
+            self.symptom_ts = self.symptom_ts[:0]
+            self.symptom_severity = self.symptom_severity[:0]
+            self.symptom_type = self.symptom_type[:0]
+        elif table == "checkins":
+            self.metric_ts = self.metric_ts[:0]
+            self.metric_value = self.metric_value[:0]
+            self.metric_code = self.metric_code[:0]
+        else:
+            self.adherence_ts = self.adherence_ts[:0]
+            self.adherence_status = self.adherence_status[:0]
+
+    def refresh(self, conn, overlap: int = 0) -> int:
+        """
+        Appends rows with ids above each high_water - overlap that aren't
+        appended yet; returns how many were appended.
+        """
+        loaded = 0
+        for table, query in LOAD_QUERIES.items():
+            since = max(0, self.high_water[table] - overlap)
+            rows = conn.execute(query, {"patient_id": self.patient_id, "since": since}).all()
+            recent = self.recent[table]
+            new_rows = [row for row in rows if row[0] not in recent]
+            if new_rows:
+                recent.update(row[0] for row in new_rows)
+                loaded += len(new_rows)
+                getattr(self, f"_append_{table}")(new_rows)
+            if rows:
+                self.high_water[table] = max(self.high_water[table], rows[-1][0])
+            floor = self.high_water[table] - overlap
+            self.recent[table] = {row_id for row_id in recent if row_id > floor}
+        return loaded
+
+    def _append_symptoms(self, rows):
+        _, ts, severity, types = zip(*rows)
+        codes = [self.symptom_types.setdefault(t, len(self.symptom_types)) for t in types]
+        self.symptom_ts = np.concatenate([self.symptom_ts, np.array(ts, dtype=np.int64)])
+        self.symptom_severity = np.concatenate([
+            self.symptom_severity, np.array([np.nan if s is None else s for s in severity], dtype=np.float64)
+        ])
+        self.symptom_type = np.concatenate([self.symptom_type, np.array(codes, dtype=np.int32)])
+
+    def _append_checkins(self, rows):
+        # Payloads are free-form JSON; every numeric field becomes a metric
+        ts, values, codes = [], [], []
+        for _, at, category, data in rows:
+            if not isinstance(data, dict):
+                continue
+            for key, raw in data.items():
+                value = _number(raw)
+                if value is None:
+                    continue
+                ts.append(at)
+                values.append(value)
+                codes.append(self.metric_names.setdefault(f"{category}.{key}", len(self.metric_names)))
+        self.metric_ts = np.concatenate([self.metric_ts, np.array(ts, dtype=np.int64)])
+        self.metric_value = np.concatenate([self.metric_value, np.array(values, dtype=np.float64)])
+        self.metric_code = np.concatenate([self.metric_code, np.array(codes, dtype=np.int32)])
+
+    def _append_adherence(self, rows):
+        _, ts, statuses = zip(*rows)
+        self.adherence_ts = np.concatenate([self.adherence_ts, np.array(ts, dtype=np.int64)])
+        self.adherence_status = np.concatenate([
+            self.adherence_status,
+            np.array([STATUS_CODES.get((s or "").lower(), OTHER_STATUS) for s in statuses], dtype=np.int8)
+        ])
+
+    def rows(self) -> dict:
+        return {"symptoms": len(self.symptom_ts), "checkin_values": len(self.metric_ts),
+                "adherence": len(self.adherence_ts)}
+
+
+class InsightsCache:
+    """LRU of patient snapshots, refreshed incrementally on every read."""
+
+    def __init__(self, engine, max_patients: int = 256, ttl_seconds: float = 300, overlap: int = 1000):
+        self.engine = engine
+        self.overlap = overlap
+        self._snapshots = ttl_cache.TTLCache(max_patients, ttl_seconds)
+
+    def snapshot(self, patient_id: int) -> PatientSnapshot:
+        snapshot = self._snapshots.get_or_create(patient_id, lambda: PatientSnapshot(patient_id))
+        with snapshot.lock:
+            with self.engine.connect() as conn:
+                snapshot.refresh(conn, self.overlap)
+        return snapshot
+
+    def insights(self, patient_id: int, start: date, end: date, window: int = 7) -> dict:
+        snapshot = self.snapshot(patient_id)
+        # Holding the lock keeps a concurrent refresh from swapping columns mid-computation
+        with snapshot.lock:
+            return compute(snapshot, start, end, window)
+
+    def invalidate(self, patient_id: int, table: Optional[str] = None):
+        """Call after updating or deleting rows; `table` is symptoms, checkins or adherence."""
+        snapshot = self._snapshots.peek(patient_id)
+        if snapshot is None:
+            return
+        with snapshot.lock:
+            for name in ([table] if table else list(LOAD_QUERIES)):
+                snapshot.reset(name)
+
+    def info(self) -> dict:
+        return self._snapshots.info("patients")
+
+
+def cache_from_env(engine) -> InsightsCache:
+    return InsightsCache(
+        engine,
+        max_patients=int(os.getenv("INSIGHTS_CACHE_PATIENTS", "256")),
+        ttl_seconds=float(os.getenv("INSIGHTS_SNAPSHOT_TTL", "300")),
+        overlap=int(os.getenv("EPISODE_REFRESH_OVERLAP", "1000")),
+    )
+
+
+# --- vectorized computations over daily bins ---
+
+def _daily(ts, values, first_day: int, n_days: int):
+    """Per-day sums and counts of values (NaNs ignored) for days [first_day, first_day + n_days)."""
+    day = ts // DAY - first_day
+    mask = (day >= 0) & (day < n_days) & ~np.isnan(values)
+    sums = np.bincount(day[mask], weights=values[mask], minlength=n_days)
+    counts = np.bincount(day[mask], minlength=n_days).astype(np.float64)
+    return sums, counts
+
+
+def _ratio(sums, counts):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / np.where(counts > 0, counts, 1), np.nan)
+
+
+def _rolling_mean(sums, counts, window: int):
+    """Mean over the trailing `window` days (including today), weighted by observations."""
+    cs = np.concatenate(([0.0], np.cumsum(sums)))
+    cc = np.concatenate(([0.0], np.cumsum(counts)))
+    idx = np.arange(len(sums))
+    lo = np.maximum(0, idx - window + 1)
+    return _ratio(cs[idx + 1] - cs[lo], cc[idx + 1] - cc[lo])
+
+
+def _trailing_baseline(series, window: int):
+    """Mean and std of the previous `window` days' values (NaN days skipped), excluding today."""
+    present = np.isfinite(series)
+    x = np.where(present, series, 0.0)
+    cs = np.concatenate(([0.0], np.cumsum(x)))
+    cs2 = np.concatenate(([0.0], np.cumsum(x * x)))
+    cn = np.concatenate(([0.0], np.cumsum(present)))
+    idx = np.arange(len(series))
+    lo = np.maximum(0, idx - window)
+    n = cn[idx] - cn[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (cs[idx] - cs[lo]) / n
+        var = (cs2[idx] - cs2[lo]) / n - mean * mean
+    return mean, np.sqrt(np.maximum(var, 0)), n
+
+
+def _pearson(a, b) -> Optional[float]:
+    mask = np.isfinite(a) & np.isfinite(b)
+    if mask.sum() < MIN_CORRELATION_DAYS:
+        return None
+    a, b = a[mask], b[mask]
+    if a.std() == 0 or b.std() == 0:
+        return None
+    return round(float(np.corrcoef(a, b)[0, 1]), 3)
+
+
+def _by_weekday(series, first_day: int):
+    """Mean of the series per weekday (NaN days skipped)."""
+    weekday = (first_day + np.arange(len(series)) + 3) % 7  # 1970-01-01 was a Thursday
+    present = np.isfinite(series)
+    sums = np.bincount(weekday[present], weights=series[present], minlength=7)
+    counts = np.bincount(weekday[present], minlength=7)
+    return {WEEKDAYS[i]: _clean(sums[i] / counts[i]) if counts[i] else None for i in range(7)}
+
+
+def _anomalies(name, series, days, direction: int, z_threshold: float):
+    mean, std, n = _trailing_baseline(series, ANOMALY_BASELINE_DAYS)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = (series - mean) / std
+    flagged = np.isfinite(z) & (n >= ANOMALY_MIN_BASELINE_DAYS) & (std > 0) & (direction * z >= z_threshold)
+    return [
+        {"date": days[i].isoformat(), "metric": name, "value": _clean(series[i]),
+         "baseline": _clean(mean[i]), "z": _clean(z[i])}
+        for i in np.flatnonzero(flagged)
+    ]
+
+
+def _clean(value):
+    value = float(value)
+    return None if not np.isfinite(value) else round(value, 3)
+
+
+def _series(values):
+    out = np.round(np.asarray(values, dtype=np.float64), 3).astype(object)
+    out[~np.isfinite(values)] = None
+    return out.tolist()
+
+
+def compute(snapshot: PatientSnapshot, start: date, end: date, window: int = 7,
+            z_threshold: float = 2.5, now: Optional[float] = None) -> dict:
+    """Insights for the days start..end (inclusive, UTC), as of `now` (epoch seconds, default the current time)."""
+    now = time.time() if now is None else now
+    first_day = (start - date(1970, 1, 1)).days
+    n_days = (end - start).days + 1
+    days = [start + timedelta(days=i) for i in range(n_days)]
+
+    # Symptoms: count and mean severity per day
+    _, symptom_count = _daily(snapshot.symptom_ts, np.zeros(len(snapshot.symptom_ts)), first_day, n_days)
+    severity_sums, severity_counts = _daily(snapshot.symptom_ts, snapshot.symptom_severity, first_day, n_days)
+    severity_mean = _ratio(severity_sums, severity_counts)
+
+    # Adherence: taken (incl. late) over due doses. Every scheduled dose is
+    # materialized as pending, so a pending dose whose time has passed was
+    # missed; only future pending doses don't count yet (as in the adherence
+    # summary endpoint and the today dashboard).
+    pending = snapshot.adherence_status == STATUS_CODES["pending"]
+    resolved = ~pending | (snapshot.adherence_ts < now)
+    missed = pending & resolved
+    taken = np.isin(snapshot.adherence_status, [STATUS_CODES["taken"], STATUS_CODES["late"]]).astype(np.float64)
+    adherence_sums, adherence_counts = _daily(snapshot.adherence_ts[resolved], taken[resolved], first_day, n_days)
+    adherence_rate = _ratio(adherence_sums, adherence_counts)
+
+    metrics = {}
+    correlations = {
+        "adherence_vs_severity": _pearson(adherence_rate, severity_mean),
+        "adherence_vs_next_day_severity": _pearson(adherence_rate[:-1], severity_mean[1:]) if n_days > 1 else None,
+        "adherence_vs_symptom_count": _pearson(adherence_rate, np.where(adherence_counts > 0, symptom_count, np.nan)),
+        "metrics_vs_severity": {},
+    }
+    for name, code in snapshot.metric_names.items():
+        mask = snapshot.metric_code == code
+        sums, counts = _daily(snapshot.metric_ts[mask], snapshot.metric_value[mask], first_day, n_days)
+        if not counts.any():
+            continue
+        daily = _ratio(sums, counts)
+        metrics[name] = {"daily": _series(daily), "rolling": _series(_rolling_mean(sums, counts, window))}
+        correlations["metrics_vs_severity"][name] = _pearson(daily, severity_mean)
+
+    symptom_types = {}
+    for name, code in snapshot.symptom_types.items():
+        mask = snapshot.symptom_type == code
+        _, counts = _daily(snapshot.symptom_ts[mask], np.zeros(int(mask.sum())), first_day, n_days)
+        if counts.any():
+            symptom_types[name] = int(counts.sum())
+
+    anomalies = (
+        _anomalies("symptom_count", symptom_count, days, 1, z_threshold)
+        + _anomalies("severity_mean", severity_mean, days, 1, z_threshold)
+        + _anomalies("adherence_rate", adherence_rate, days, -1, z_threshold)
+    )
+    anomalies.sort(key=lambda a: (a["date"], a["metric"]))
+
+    return {
+        "patient_id": snapshot.patient_id,
+        "from_date": start.isoformat(),
+        "to_date": end.isoformat(),
+        "window": window,
+        "days": [d.isoformat() for d in days],
+        "series": {
+            "symptom_count": _series(symptom_count),
+            "symptom_count_rolling": _series(_rolling_mean(symptom_count, np.ones(n_days), window)),
+            "severity_mean": _series(severity_mean),
+            "severity_rolling": _series(_rolling_mean(severity_sums, severity_counts, window)),
+            "adherence_rate": _series(adherence_rate),
+            "adherence_rolling": _series(_rolling_mean(adherence_sums, adherence_counts, window)),
+        },
+        "metrics": metrics,
+        "symptom_types": symptom_types,
+        "totals": {
+            "symptoms": int(symptom_count.sum()),
+            "doses_resolved": int(adherence_counts.sum()),
+            "doses_taken": int(adherence_sums.sum()),
+            "doses_missed": int(_daily(snapshot.adherence_ts[missed], np.zeros(int(missed.sum())),
+                                       first_day, n_days)[1].sum()),
+            "adherence_rate": _clean(adherence_sums.sum() / adherence_counts.sum()) if adherence_counts.sum() else None,
+        },
+        "correlations": correlations,
+        "day_of_week": {
+            "symptom_count": _by_weekday(symptom_count, first_day),
+            "severity_mean": _by_weekday(severity_mean, first_day),
+            "adherence_rate": _by_weekday(adherence_rate, first_day),
+        },
+        "anomalies": anomalies,
+        "snapshot": {**snapshot.rows(), "age_seconds": round(time.time() - snapshot.built_at, 1)},
+    }
@@ -0,0 +1,79 @@
+"""
+Keyset pagination and substring search for the admin user/patient lists.
+
+Pages are ordered by (lower(name), id) and continue from an opaque cursor
+holding the last row's sort key, so every page costs the same however deep
+the admin scrolls and rows added meanwhile don't shift later pages.
+
+Search is a case-insensitive substring match (ILIKE '%q%') on name, and for
+users on email too. pg_trgm GIN indexes make those matches index scans; when
+the extension can't be installed (managed databases without it, no
+privileges) the search still works, as a sequential scan.
+"""
+import json
+import base64
+import logging
+from typing import Optional
+
+from sqlalchemy import text
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+SORT_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_users_lower_name_id ON users (lower(name), id)",
+    "CREATE INDEX IF NOT EXISTS ix_patients_lower_name_id ON patients (lower(name), id)",
+    # The association's primary key (user_id, patient_id) covers per-user counts; this one per-patient
+    "CREATE INDEX IF NOT EXISTS ix_patient_user_association_patient_id ON patient_user_association (patient_id)",
+]
+TRIGRAM_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_users_name_trgm ON users USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_users_email_trgm ON users USING gin (email gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_patients_name_trgm ON patients USING gin (name gin_trgm_ops)",
+]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def ensure_search_indexes(conn):
+    """Sort-key indexes, and the trigram indexes when pg_trgm is available. Idempotent."""
+    for statement in SORT_INDEXES:
+        conn.execute(text(statement))
+    savepoint = conn.begin_nested()
+    try:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except Exception as e:
+        savepoint.rollback()
+        log.warning(f"LISTINGS: pg_trgm unavailable, admin search will not be indexed: {e.__class__.__name__}")
+        return
+    savepoint.commit()
+    for statement in TRIGRAM_INDEXES:
+        conn.execute(text(statement))
+
+
+def encode_cursor(name: str, row_id: int) -> str:
+    payload = json.dumps([name.lower(), row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """-> (lower(name), id) of the last row on the previous page."""
+    try:
+        name, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return str(name), int(row_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor("invalid cursor")
+
+
+def search_pattern(q: Optional[str]) -> Optional[str]:
+    """ILIKE pattern for a substring search, with LIKE wildcards in q taken literally."""
+    q = (q or "").strip()
+    if not q:
+        return None
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
@@ -0,0 +1,205 @@
+"""
+Prometheus metrics, served at GET /metrics.
+
+    caregiver_http_*             per-route request counts and latency
+    caregiver_db_*               SQL statements and SQL time per request,
+                                 plus connection pool stats (see db_pool.py)
+    caregiver_reminder_job_*     duration and start lag of each reminder tick
+    caregiver_push_*             push sends and latency by outcome
+    caregiver_report_*           PDF report render time by phase
+    caregiver_read_cache_*       shared read cache lookups by result, invalidations
+    caregiver_outbox_*           outbox events handled by topic and result, delivery lag
+
+Route labels use the route template (/api/patients/{patient_id}), not the
+raw path, to keep label cardinality bounded.
+
+Metrics are per process. Celery workers keep their own counters and are not
+included in the web process's /metrics.
+"""
+import time
+import contextvars
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Histogram, Gauge, REGISTRY
+from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily
+from sqlalchemy import event
+
+import db_pool
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUESTS = Counter(
+    "caregiver_http_requests_total", "HTTP requests by route and status",
+    ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "caregiver_http_request_duration_seconds", "HTTP request latency by route",
+    ["method", "route"], buckets=LATENCY_BUCKETS
+)
+DB_STATEMENTS_PER_REQUEST = Histogram(
+    "caregiver_db_statements_per_request", "SQL statements executed per request",
+    ["route"], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+)
+DB_SECONDS_PER_REQUEST = Histogram(
+    "caregiver_db_seconds_per_request", "Time spent in SQL statements per request",
+    ["route"], buckets=LATENCY_BUCKETS
+)
+
+REMINDER_JOB_DURATION = Histogram(
+    "caregiver_reminder_job_duration_seconds", "Duration of one medication reminder tick",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+REMINDER_JOB_LAG = Gauge(
+    "caregiver_reminder_job_lag_seconds",
+    "Seconds between the start of the minute and the start of the last reminder tick"
+)
+REMINDER_JOB_LAST_RUN = Gauge(
+    "caregiver_reminder_job_last_run_timestamp_seconds", "When the last reminder tick finished"
+)
+REMINDERS_SENT = Counter("caregiver_reminders_total", "Due schedules a reminder was queued for")
+
+# outcome: success, gone (404/410, subscription expired) or failure
+PUSH_SENDS = Counter("caregiver_push_sends_total", "Web push sends by outcome", ["outcome"])
+PUSH_LATENCY = Histogram(
+    "caregiver_push_send_duration_seconds", "Web push send latency (encrypt + HTTP) by outcome",
+    ["outcome"], buckets=LATENCY_BUCKETS
+)
+
+# phase: query, chart or pdf
+REPORT_PHASE_SECONDS = Histogram(
+    "caregiver_report_render_seconds", "PDF report render time by phase",
+    ["phase"], buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+# result: hit, miss, wait (served after another loader filled it) or bypass (cache off or unreachable)
+READ_CACHE_LOOKUPS = Counter(
+    "caregiver_read_cache_lookups_total", "Shared read cache lookups by resource and result",
+    ["resource", "result"]
+)
+READ_CACHE_INVALIDATIONS = Counter(
+    "caregiver_read_cache_invalidations_total", "Per-patient read cache version bumps"
+)
+
+# result: done, retry (handler failed, scheduled again) or dead (out of attempts, or no handler)
+OUTBOX_EVENTS = Counter(
+    "caregiver_outbox_events_total", "Outbox events handled by topic and result", ["topic", "result"]
+)
+OUTBOX_LAG = Histogram(
+    "caregiver_outbox_lag_seconds", "Time from enqueue to a handled outbox event, by topic",
+    ["topic"], buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 3600.0)
+)
+
+
+# --- per-request SQL accounting ---
+
+# Holds a [statements, seconds] list while a request is being served. The list
+# is mutated in place so statements run in the threadpool or in SQLAlchemy's
+# async greenlets (which copy the request's context) are counted too.
+_request_sql = contextvars.ContextVar("request_sql", default=None)
+
+
+# Also called as fn(statement, parameters, seconds) for every statement, e.g.
+# by the SQL profiler (sql_profiler.py), which shares these listeners
+_statement_observers = []
+
+
+def observe_statements(fn):
+    _statement_observers.append(fn)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _statement_done(conn, statement, parameters):
+    seconds = time.perf_counter() - conn.info["query_started"].pop()
+    totals = _request_sql.get()
+    if totals is not None:
+        totals[0] += 1
+        totals[1] += seconds
+    for observer in _statement_observers:
+        observer(statement, parameters, seconds)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _statement_done(conn, statement, parameters)
+
+
+def _handle_error(context):
+    # after_cursor_execute doesn't run for a statement that raised; pop its start time here
+    conn = context.connection
+    if conn is not None and context.execution_context is not None and conn.info.get("query_started"):
+        _statement_done(conn, context.statement, context.parameters)
+
+
+def instrument_engine(engine):
+    """Counts SQL statements on this engine (pass async_engine.sync_engine for async engines)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def start_request_sql():
+    """Starts SQL accounting for the current request; returns the token for end_request_sql."""
+    totals = [0, 0.0]
+    return totals, _request_sql.set(totals)
+
+
+def end_request_sql(token):
+    _request_sql.reset(token)
+
+
+def route_label(request) -> str:
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def observe_request(request, status_code: int, duration: float, sql_totals):
+    route = route_label(request)
+    HTTP_REQUESTS.labels(request.method, route, str(status_code)).inc()
+    HTTP_LATENCY.labels(request.method, route).observe(duration)
+    DB_STATEMENTS_PER_REQUEST.labels(route).observe(sql_totals[0])
+    DB_SECONDS_PER_REQUEST.labels(route).observe(sql_totals[1])
+
+
+# --- push / report helpers ---
+
+def observe_push(outcome: str, duration: float):
+    PUSH_SENDS.labels(outcome).inc()
+    PUSH_LATENCY.labels(outcome).observe(duration)
+
+
+@contextmanager
+def report_phase(phase: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        REPORT_PHASE_SECONDS.labels(phase).observe(time.perf_counter() - started)
+
+
+# --- connection pool ---
+
+class PoolCollector:
+    """Exposes db_pool.pool_stats() at scrape time."""
+
+    def collect(self):
+        in_use = GaugeMetricFamily("caregiver_db_pool_checked_out", "Connections in use", labels=["pool"])
+        idle = GaugeMetricFamily("caregiver_db_pool_checked_in", "Idle connections in the pool", labels=["pool"])
+        overflow = GaugeMetricFamily("caregiver_db_pool_overflow", "Overflow connections open", labels=["pool"])
+        checkouts = CounterMetricFamily("caregiver_db_pool_checkouts", "Connection checkouts", labels=["pool"])
+        wait = CounterMetricFamily("caregiver_db_pool_checkout_wait_seconds", "Time spent waiting for a connection", labels=["pool"])
+        timeouts = CounterMetricFamily("caregiver_db_pool_timeouts", "Checkouts that timed out", labels=["pool"])
+        for name, stats in db_pool.pool_stats().items():
+            if stats["checked_out"] is not None:
+                in_use.add_metric([name], stats["checked_out"])
+                idle.add_metric([name], stats["checked_in"])
+                overflow.add_metric([name], stats["overflow"])
+            checkouts.add_metric([name], stats["checkouts"])
+            wait.add_metric([name], stats["checkout_wait_seconds_total"])
+            timeouts.add_metric([name], stats["timeouts"])
+        return [in_use, idle, overflow, checkouts, wait, timeouts]
+
+
+REGISTRY.register(PoolCollector())
@@ -0,0 +1,234 @@
+"""
+Transactional outbox for side effects (push notifications).
+
+Code that causes a side effect doesn't perform it inline. It inserts an event
+into outbox_events in the same transaction as its data change, so the event
+exists exactly when the change does and a crash in between can't lose it.
+Drainers claim due events in batches with
+
+    SELECT ... ORDER BY available_at, id LIMIT n FOR UPDATE SKIP LOCKED
+
+and dispatch each to the handler registered for its topic. Concurrent
+drainers (scheduler threads, other processes) skip rows another one holds,
+so throughput scales by running more of them: the scheduler starts up to
+OUTBOX_DRAINERS overlapping drains per process while a backlog lasts.
+
+A handler gets the drainer's session and the event payload, and runs in a
+savepoint, so what it writes (follow-up events, subscriptions marked
+expired) commits together with the event being marked done. A handler that
+raises rolls back its savepoint; the event is tried again after
+OUTBOX_RETRY_BASE_SECONDS, doubling per attempt up to an hour, and is marked
+dead after OUTBOX_MAX_ATTEMPTS. Delivery is at least once: a drainer that
+dies after sending but before committing leaves its batch to be handled
+again.
+
+Events may carry a dedupe_key. Enqueueing a key that already exists does
+nothing, so processes that all run the reminder tick enqueue each reminder
+once. Handled events are kept OUTBOX_RETENTION_HOURS for that, dead ones a
+week, then purged.
+"""
+import os
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, Optional
+
+from sqlalchemy import func, select, update, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+import metrics
+
+
+log = logging.getLogger(__name__)
+
+MAX_RETRY_SECONDS = 3600
+DEAD_RETENTION = timedelta(days=7)
+PURGE_BATCH_SIZE = 1000
+
+
+class Outbox:
+    def __init__(self, session_factory, table, batch_size: int, max_attempts: int,
+                 retry_base_seconds: float, retention_hours: float, poll_seconds: float, drainers: int):
+        self.session_factory = session_factory
+        self.table = table
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retention_hours = retention_hours
+        self.poll_seconds = poll_seconds
+        self.drainers = drainers
+        self.handlers: Dict[str, Callable] = {}
+
+    def handler(self, topic: str):
+        """Registers `fn(db, payload)` for a topic."""
+        def register(fn):
+            self.handlers[topic] = fn
+            return fn
+        return register
+
+    # --- enqueueing: execute these in the transaction making the change ---
+
+    def insert(self, topic: str, payload: dict, dedupe_key: Optional[str] = None):
+        """INSERT for one event, RETURNING its id (no row when dedupe_key already exists)."""
+        stmt = pg_insert(self.table).values(topic=topic, payload=payload, dedupe_key=dedupe_key)
+        if dedupe_key is not None:
+            stmt = stmt.on_conflict_do_nothing(
+                index_elements=[self.table.c.dedupe_key],
+                index_where=self.table.c.dedupe_key.isnot(None)
+            )
+        return stmt.returning(self.table.c.id)
+
+    def insert_many(self, topic: str, payloads: Iterable[dict], dedupe_keys: Optional[Iterable[str]] = None):
+        """
+        One multi-row INSERT for several events of a topic, RETURNING the ids
+        of those added, or None when there are none. With `dedupe_keys`
+        (one per payload), existing keys are skipped.
+        """
+        if dedupe_keys is None:
+            rows = [{"topic": topic, "payload": payload} for payload in payloads]
+        else:
+            rows = [{"topic": topic, "payload": payload, "dedupe_key": key}
+                    for payload, key in zip(payloads, dedupe_keys)]
+        if not rows:
+            return None
+        stmt = pg_insert(self.table).values(rows)
+        if dedupe_keys is not None:
+            stmt = stmt.on_conflict_do_nothing(
+                index_elements=[self.table.c.dedupe_key],
+                index_where=self.table.c.dedupe_key.isnot(None)
+            )
+        return stmt.returning(self.table.c.id)
+
+    # --- draining ---
+
+    def drain(self) -> int:
+        """Handles due events batch by batch until a batch comes back short; returns how many."""
+        handled = 0
+        while True:
+            try:
+                count = self.drain_batch()
+            except Exception as e:
+                log.error(f"OUTBOX: Error draining events: {e}", exc_info=True)
+                return handled
+            handled += count
+            if count < self.batch_size:
+                return handled
+
+    def drain_batch(self) -> int:
+        t = self.table
+        with self.session_factory() as db:
+            rows = db.execute(
+                select(t.c.id, t.c.topic, t.c.payload, t.c.attempts, t.c.created_at)
+                .where(t.c.status == "pending", t.c.available_at <= func.now())
+                .order_by(t.c.available_at, t.c.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not rows:
+                db.rollback()
+                return 0
+
+            done = []
+            for row in rows:
+                handler = self.handlers.get(row.topic)
+                try:
+                    if handler is None:
+                        raise LookupError(f"no handler for topic {row.topic!r}")
+                    with db.begin_nested():
+                        handler(db, row.payload)
+                except Exception as e:
+                    self._failed(db, row, e, permanent=handler is None)
+                    continue
+                done.append(row.id)
+                metrics.OUTBOX_EVENTS.labels(row.topic, "done").inc()
+                metrics.OUTBOX_LAG.labels(row.topic).observe(
+                    (datetime.now(timezone.utc) - row.created_at).total_seconds()
+                )
+
+            if done:
+                db.execute(
+                    update(t).where(t.c.id.in_(done)).values(status="done", processed_at=func.now())
+                )
+            db.commit()
+            return len(rows)
+
+    def _failed(self, db, row, error: Exception, permanent: bool):
+        attempts = row.attempts + 1
+        message = f"{error.__class__.__name__}: {error}"
+        t = self.table
+        if permanent or attempts >= self.max_attempts:
+            db.execute(update(t).where(t.c.id == row.id).values(
+                status="dead", attempts=attempts, last_error=message, processed_at=func.now()
+            ))
+            metrics.OUTBOX_EVENTS.labels(row.topic, "dead").inc()
+            log.error(f"OUTBOX: Event {row.id} ({row.topic}) failed {attempts} time(s), giving up: {message}")
+            return
+        delay = min(self.retry_base_seconds * 2 ** (attempts - 1), MAX_RETRY_SECONDS)
+        db.execute(update(t).where(t.c.id == row.id).values(
+            attempts=attempts, last_error=message,
+            available_at=func.now() + timedelta(seconds=delay)
+        ))
+        metrics.OUTBOX_EVENTS.labels(row.topic, "retry").inc()
+        log.warning(f"OUTBOX: Event {row.id} ({row.topic}) failed, retrying in {delay:g}s: {message}")
+
+    # --- housekeeping ---
+
+    def purge(self) -> int:
+        """Deletes handled events past retention, and dead ones after a week, in small batches."""
+        t = self.table
+        now = datetime.now(timezone.utc)
+        expired = (
+            ((t.c.status == "done") & (t.c.processed_at < now - timedelta(hours=self.retention_hours)))
+            | ((t.c.status == "dead") & (t.c.processed_at < now - DEAD_RETENTION))
+        )
+        total = 0
+        with self.session_factory() as db:
+            try:
+                while True:
+                    batch = select(t.c.id).where(expired).limit(PURGE_BATCH_SIZE).scalar_subquery()
+                    deleted = db.execute(delete(t).where(t.c.id.in_(batch))).rowcount
+                    db.commit()
+                    total += deleted
+                    if deleted < PURGE_BATCH_SIZE:
+                        break
+            except Exception as e:
+                log.error(f"OUTBOX: Error purging events: {e}", exc_info=True)
+                db.rollback()
+        if total:
+            log.info(f"OUTBOX: Purged {total} handled event(s)")
+        return total
+
+    def stats(self) -> dict:
+        """Pending and dead events per topic, with the age of the oldest pending one."""
+        t = self.table
+        with self.session_factory() as db:
+            rows = db.execute(
+                select(t.c.topic, t.c.status, func.count(), func.min(t.c.created_at))
+                .where(t.c.status != "done")
+                .group_by(t.c.topic, t.c.status)
+            ).all()
+        now = datetime.now(timezone.utc)
+        topics = {}
+        for topic, status, count, oldest in rows:
+            entry = topics.setdefault(topic, {"pending": 0, "dead": 0, "oldest_pending_seconds": None})
+            entry[status] = count
+            if status == "pending":
+                entry["oldest_pending_seconds"] = round((now - oldest).total_seconds(), 3)
+        return {
+            "topics": topics,
+            "handlers": sorted(self.handlers),
+            "batch_size": self.batch_size,
+            "drainers": self.drainers,
+        }
+
+
+def outbox_from_env(session_factory, table) -> Outbox:
+    return Outbox(
+        session_factory,
+        table,
+        batch_size=int(os.getenv("OUTBOX_BATCH_SIZE", "50")),
+        max_attempts=int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8")),
+        retry_base_seconds=float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "5")),
+        retention_hours=float(os.getenv("OUTBOX_RETENTION_HOURS", "24")),
+        poll_seconds=float(os.getenv("OUTBOX_POLL_SECONDS", "1")),
+        drainers=int(os.getenv("OUTBOX_DRAINERS", "4")),
+    )
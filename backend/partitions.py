@@ -0,0 +1,359 @@
+"""
+Monthly range partitioning and archival for the high-volume event tables.
+
+    checkins              partitioned on timestamp
+    symptom_logs          partitioned on start_time
+    medication_adherence  partitioned on scheduled_time
+
+Each table has one partition per calendar month (UTC), named
+<table>_pYYYYMM, plus a <table>_default partition that catches rows outside
+every monthly range so inserts never fail. Queries that filter on the
+partition column (reports, symptom lists, adherence summaries, date-bounded
+exports) only scan the months they cover.
+
+`convert_tables()` turns existing plain tables into partitioned ones: it runs
+from migrate_schema() on every boot and does nothing once a table is
+partitioned. The primary key becomes (id, <partition column>), which
+PostgreSQL requires; ids still come from the same sequence, so they stay
+unique and the ORM keeps using id alone.
+
+`maintain()` runs daily from the scheduler. It creates partitions up to
+PARTITION_MONTHS_AHEAD months ahead. When PARTITION_ARCHIVE_AFTER_MONTHS is
+set, it also archives older months: each partition is written to
+PARTITION_ARCHIVE_DIR/<table>/<partition>.csv.gz with COPY, then detached and
+dropped. `python partitions.py restore <file>` loads an archive back into its
+partition.
+
+The archive is the only copy of those records once the partition is dropped,
+so PARTITION_ARCHIVE_DIR must be an absolute path on a mounted volume
+(a Railway volume, say), never the container's own disk, which is lost on
+redeploy. Archiving is refused while it is unset, relative or on the root
+filesystem. An archive is fsynced after the gzip stream is closed, then read
+back in full (checking the gzip CRC and the row count) before the partition
+is dropped.
+"""
+import os
+import re
+import csv
+import gzip
+import logging
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+
+
+log = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = {
+    "checkins": "timestamp",
+    "symptom_logs": "start_time",
+    "medication_adherence": "scheduled_time",
+}
+PARTITION_NAME = re.compile(r"^(?P<table>[a-z_]+)_p(?P<year>\d{4})(?P<month>\d{2})$")
+
+# Turns a plain table into a partitioned one, before its rows, foreign keys
+# and indexes are copied over. Part of main.schema_version(), see schema_ddl()
+CONVERSION_DDL = [
+    "ALTER TABLE {table} RENAME TO {old}",
+    "ALTER TABLE {old} RENAME CONSTRAINT {table}_pkey TO {old}_pkey",
+    "CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE ({column})",
+    "ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL",
+    "ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, {column})",
+    "CREATE TABLE {table}_default PARTITION OF {table} DEFAULT",
+]
+
+# Serializes conversion/maintenance across processes booting at the same time
+ADVISORY_LOCK_ID = 0x6361_7265  # "care"
+
+
+def settings() -> dict:
+    return {
+        "months_ahead": int(os.getenv("PARTITION_MONTHS_AHEAD", "3")),
+        "archive_after_months": int(os.getenv("PARTITION_ARCHIVE_AFTER_MONTHS", "0")),
+        "archive_dir": os.getenv("PARTITION_ARCHIVE_DIR") or None,
+    }
+
+
+def _add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def _bounds(month: date) -> str:
+    return f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{_add_months(month, 1).isoformat()} 00:00:00+00')"
+
+
+def is_partitioned(conn, table: str) -> bool:
+    return conn.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"), {"table": table}
+    ).scalar() or False
+
+
+def monthly_partitions(conn, table: str) -> list:
+    """Months (first day) that have a partition attached to the table, oldest first."""
+    names = conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:table)
+    """), {"table": table}).scalars().all()
+    months = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match and match.group("table") == table:
+            months.append(date(int(match.group("year")), int(match.group("month")), 1))
+    return sorted(months)
+
+
+def create_partition(conn, table: str, month: date):
+    """
+    Adds the month's partition. Rows for that month sitting in the default
+    partition are moved into it first, since PostgreSQL refuses to attach a
+    range the default partition has rows for.
+    """
+    column = PARTITIONED_TABLES[table]
+    name = _partition_name(table, month)
+    start, end = f"{month.isoformat()} 00:00:00+00", f"{_add_months(month, 1).isoformat()} 00:00:00+00"
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {table}_default WHERE {column} >= :start AND {column} < :end RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), {"start": start, "end": end}).rowcount
+    conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} {_bounds(month)}"))
+    log.info(f"PARTITIONS: created {name}" + (f" ({moved} rows moved from {table}_default)" if moved else ""))
+
+
+def _convert_table(conn, table: str, months_ahead: int):
+    column = PARTITIONED_TABLES[table]
+    old = f"{table}_unpartitioned"
+    log.info(f"PARTITIONS: converting {table} to monthly partitions on {column}...")
+
+    indexes = conn.execute(text("""
+        SELECT indexname, indexdef FROM pg_indexes
+        WHERE schemaname = current_schema() AND tablename = :table
+    """), {"table": table}).all()
+    foreign_keys = conn.execute(text("""
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = to_regclass(:table) AND contype = 'f'
+    """), {"table": table}).all()
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": table}).scalar()
+
+    conn.execute(text(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE"))
+    # The partition key must be NOT NULL; created_at is the best stand-in for a missing time
+    conn.execute(text(f"UPDATE {table} SET {column} = COALESCE(created_at, now()) WHERE {column} IS NULL"))
+    for statement in CONVERSION_DDL:
+        conn.execute(text(statement.format(table=table, old=old, column=column)))
+    if sequence:
+        # Keep the sequence when the old table is dropped
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id"))
+
+    first = conn.execute(text(f"SELECT date_trunc('month', min({column}) AT TIME ZONE 'UTC') FROM {old}")).scalar()
+    this_month = datetime.now(timezone.utc).date().replace(day=1)
+    month = first.date() if first else this_month
+    while month <= _add_months(this_month, months_ahead):
+        conn.execute(text(f"CREATE TABLE {_partition_name(table, month)} PARTITION OF {table} {_bounds(month)}"))
+        month = _add_months(month, 1)
+
+    copied = conn.execute(text(f"INSERT INTO {table} SELECT * FROM {old}")).rowcount
+    conn.execute(text(f"DROP TABLE {old}"))
+
+    for name, definition in foreign_keys:
+        conn.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}"))
+    for name, definition in indexes:
+        # Read before the rename, so these already name the new table; the
+        # index names are free again now the old table is gone
+        if not name.endswith("_pkey"):
+            conn.execute(text(definition))
+    log.info(f"PARTITIONS: {table} converted, {copied} rows copied")
+
+
+def schema_ddl() -> list:
+    """The conversion DDL of every partitioned table, for main.schema_version()."""
+    return [statement.format(table=table, old=f"{table}_unpartitioned", column=column)
+            for table, column in PARTITIONED_TABLES.items() for statement in CONVERSION_DDL]
+
+
+def convert_tables(conn, months_ahead: int = None):
+    """Partitions any of the event tables that are still plain tables. Idempotent."""
+    months_ahead = settings()["months_ahead"] if months_ahead is None else months_ahead
+    conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": ADVISORY_LOCK_ID})
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(conn, table):
+            _convert_table(conn, table, months_ahead)
+
+
+def ensure_future_partitions(conn, months_ahead: int):
+    this_month = datetime.now(timezone.utc).date().replace(day=1)
+    for table in PARTITIONED_TABLES:
+        existing = set(monthly_partitions(conn, table))
+        for n in range(months_ahead + 1):
+            month = _add_months(this_month, n)
+            if month not in existing:
+                create_partition(conn, table, month)
+
+
+def split_default_partition(conn, table: str):
+    """
+    Gives months that only have rows in the default partition (history
+    imported for months before the table was partitioned, say) their own
+    partition, so they can be pruned and archived like the rest.
+    """
+    column = PARTITIONED_TABLES[table]
+    months = conn.execute(text(f"""
+        SELECT DISTINCT date_trunc('month', {column} AT TIME ZONE 'UTC') FROM {table}_default
+    """)).scalars().all()
+    for month in sorted(months):
+        create_partition(conn, table, month.date())
+
+
+class ArchiveError(Exception):
+    """No durable archive location, or an archive that doesn't read back intact."""
+
+
+def _mount_point(path: str) -> str:
+    path = os.path.realpath(path)
+    while not os.path.ismount(path):
+        path = os.path.dirname(path)
+    return path
+
+
+def check_archive_dir(archive_dir) -> str:
+    """The archive directory if it is on durable storage; raises ArchiveError otherwise."""
+    if not archive_dir:
+        raise ArchiveError("PARTITION_ARCHIVE_DIR is not set; mount a volume and point it there")
+    if not os.path.isabs(archive_dir):
+        raise ArchiveError(f"PARTITION_ARCHIVE_DIR must be an absolute path on a mounted volume, got {archive_dir!r}")
+    if not os.path.isdir(archive_dir):
+        raise ArchiveError(f"PARTITION_ARCHIVE_DIR {archive_dir} does not exist; is the volume mounted?")
+    if _mount_point(archive_dir) == "/":
+        raise ArchiveError(f"PARTITION_ARCHIVE_DIR {archive_dir} is on the root filesystem, "
+                           "which does not survive a redeploy; use a mounted volume")
+    return archive_dir
+
+
+def _fsync(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _archived_rows(path: str) -> int:
+    """Reads the whole archive back (gzip checks its CRC and length at the end); returns its data rows."""
+    with gzip.open(path, "rt", newline="") as f:
+        return sum(1 for _ in csv.reader(f)) - 1
+
+
+def archive_partition(conn, table: str, month: date, archive_dir: str) -> str:
+    """
+    Writes one partition to <archive_dir>/<table>/<partition>.csv.gz, checks
+    the file reads back with every row, then detaches and drops the partition.
+    """
+    name = _partition_name(table, month)
+    directory = os.path.join(archive_dir, table)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.csv.gz")
+    partial = path + ".partial"
+
+    cursor = conn.connection.cursor()
+    with gzip.open(partial, "wb") as f:
+        cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER true)", f)
+        rows = cursor.rowcount
+    # Closing wrote the gzip trailer; only now is the file complete
+    _fsync(partial)
+    archived = _archived_rows(partial)
+    if archived != rows:
+        raise ArchiveError(f"{partial} has {archived} rows, {name} has {rows}; keeping the partition")
+    os.replace(partial, path)
+    _fsync(directory)
+
+    # Only drop the data once the archive is complete on disk
+    conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+    conn.execute(text(f"DROP TABLE {name}"))
+    log.info(f"PARTITIONS: archived {name} ({rows} rows) to {path}")
+    return path
+
+
+def archive_old_partitions(conn, archive_after_months: int, archive_dir: str) -> list:
+    archive_dir = check_archive_dir(archive_dir)
+    cutoff = _add_months(datetime.now(timezone.utc).date().replace(day=1), -archive_after_months)
+    archived = []
+    for table in PARTITIONED_TABLES:
+        for month in monthly_partitions(conn, table):
+            if month < cutoff:
+                archived.append(archive_partition(conn, table, month, archive_dir))
+    return archived
+
+
+def maintain(engine) -> list:
+    """Scheduler job: create upcoming partitions and archive expired ones; returns the archive paths."""
+    config = settings()
+    archived = []
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": ADVISORY_LOCK_ID})
+            ensure_future_partitions(conn, config["months_ahead"])
+            for table in PARTITIONED_TABLES:
+                split_default_partition(conn, table)
+        if config["archive_after_months"] > 0:
+            # One transaction per run; a failed archive leaves the partition attached
+            with engine.begin() as conn:
+                conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": ADVISORY_LOCK_ID})
+                archived = archive_old_partitions(conn, config["archive_after_months"], config["archive_dir"])
+    except ArchiveError as e:
+        log.error(f"PARTITIONS: Not archiving, partitions kept: {e}")
+    except Exception as e:
+        log.error(f"SCHEDULER: Partition maintenance failed: {e}", exc_info=True)
+    return archived
+
+
+def restore_archive(engine, path: str):
+    """Re-creates an archived month's partition and loads the archive into it."""
+    name = os.path.basename(path).split(".")[0]
+    match = PARTITION_NAME.match(name)
+    if not match or match.group("table") not in PARTITIONED_TABLES:
+        raise ValueError(f"{path} is not a partition archive")
+    table = match.group("table")
+    month = date(int(match.group("year")), int(match.group("month")), 1)
+    with engine.begin() as conn:
+        if month in monthly_partitions(conn, table):
+            raise ValueError(f"{name} already exists")
+        create_partition(conn, table, month)
+        with gzip.open(path, "rb") as f:
+            conn.connection.cursor().copy_expert(f"COPY {name} FROM STDIN WITH (FORMAT csv, HEADER true)", f)
+    log.info(f"PARTITIONS: restored {name} from {path}")
+
+
+if __name__ == "__main__":
+    import sys
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("maintain", help="create upcoming partitions and archive expired ones now")
+    restore = commands.add_parser("restore", help="load an archived partition back")
+    restore.add_argument("path")
+    commands.add_parser("list", help="show the monthly partitions of each table")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from main import engine
+
+    if args.command == "maintain":
+        maintain(engine)
+    elif args.command == "restore":
+        try:
+            restore_archive(engine, args.path)
+        except ValueError as e:
+            sys.exit(str(e))
+    else:
+        with engine.connect() as conn:
+            for table in PARTITIONED_TABLES:
+                months = monthly_partitions(conn, table)
+                span = f"{months[0]:%Y-%m} .. {months[-1]:%Y-%m}" if months else "none"
+                print(f"{table}: {len(months)} monthly partitions ({span})")
@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Optional
+from urllib.parse import urlparse
+
+import requests
+from py_vapid import Vapid
+from pywebpush import WebPusher, WebPushException
+
+import metrics
+
+
+log = logging.getLogger(__name__)
+
+# VAPID tokens may live up to 24h; we sign them for 12h (same as pywebpush)
+# and re-sign once a cached token is within the refresh margin of expiring.
+VAPID_TOKEN_LIFETIME = 12 * 60 * 60
+VAPID_REFRESH_MARGIN = 10 * 60
+
+
+class PushSender:
+    """
+    Sends web push messages with a VAPID key that is parsed once.
+
+    `webpush(...)` re-parses the private key and signs a fresh JWT on every
+    call. Here the signed Authorization header is cached per audience origin
+    (scheme://host of the push service), so a send only pays for the
+    per-subscription payload encryption (ECDH + AES-GCM) and the HTTP request.
+    """
+
+    def __init__(self, private_key: str, claim_email: str, session: Optional[requests.Session] = None):
+        self.vapid = Vapid.from_string(private_key=private_key)
+        self.claim_email = claim_email
+        self.session = session or requests.Session()
+        self._headers_by_audience = {}  # aud -> (headers, exp)
+        self._lock = threading.Lock()
+
+    def vapid_headers(self, endpoint: str) -> dict:
+        """Returns (possibly cached) signed VAPID headers for this endpoint's origin."""
+        url = urlparse(endpoint)
+        aud = f"{url.scheme}://{url.netloc}"
+        now = int(time.time())
+
+        cached = self._headers_by_audience.get(aud)
+        if cached and cached[1] - VAPID_REFRESH_MARGIN > now:
+            return cached[0]
+
+        with self._lock:
+            cached = self._headers_by_audience.get(aud)
+            if cached and cached[1] - VAPID_REFRESH_MARGIN > now:
+                return cached[0]
+            exp = now + VAPID_TOKEN_LIFETIME
+            headers = self.vapid.sign({"sub": self.claim_email, "aud": aud, "exp": exp})
+            self._headers_by_audience[aud] = (headers, exp)
+            return headers
+
+    def prepare(self, subscription_info: dict, data: bytes, ttl: int = 0) -> dict:
+        """
+        Encrypts `data` for one subscription and builds the request,
+        without sending it. Returns {"endpoint", "data", "headers"}.
+        """
+        headers = dict(self.vapid_headers(subscription_info["endpoint"]))
+        pusher = WebPusher(subscription_info, requests_session=self.session)
+        return pusher._prepare_send_data(data, headers, ttl=ttl)
+
+    def send(self, subscription_info: dict, data: bytes, ttl: int = 0, timeout: float = 10):
+        """
+        Encrypts and sends one message. Raises WebPushException on a
+        non-2xx response, just like `webpush(...)`.
+        """
+        started = time.perf_counter()
+        outcome = "failure"
+        try:
+            params = self.prepare(subscription_info, data, ttl=ttl)
+            endpoint = params.pop("endpoint")
+            response = self.session.post(endpoint, timeout=timeout, **params)
+            if response.status_code > 202:
+                if response.status_code in (404, 410):
+                    outcome = "gone"
+                raise WebPushException(
+                    f"Push failed: {response.status_code} {response.reason}\nResponse body:{response.text}",
+                    response=response,
+                )
+            outcome = "success"
+            return response
+        finally:
+            metrics.observe_push(outcome, time.perf_counter() - started)
+
+
+_sender = None
+_sender_lock = threading.Lock()
+
+
+def get_push_sender() -> Optional[PushSender]:
+    """
+    Returns the process-wide PushSender, or None when VAPID keys are not set.
+    The key is loaded on first use and then shared by every send.
+    """
+    global _sender
+    if _sender is not None:
+        return _sender
+
+    private_key = os.getenv("VAPID_PRIVATE_KEY")
+    claim_email = os.getenv("VAPID_CLAIM_EMAIL") or os.getenv("VAPID_EMAIL")
+    if not private_key or not claim_email:
+        return None
+
+    with _sender_lock:
+        if _sender is None:
+            _sender = PushSender(private_key, claim_email)
+            log.info("Loaded VAPID key for push delivery.")
+    return _sender
+
+
+def encode_payload(title: str, body: str, **extra) -> bytes:
+    """Serializes a notification once so it can be encrypted for every subscription."""
+    return json.dumps({"title": title, "body": body, **extra}).encode("utf8")
@@ -0,0 +1,258 @@
+"""
+Shared read cache for hot per-patient reads (patient detail and care team,
+medication lists, schedules), kept in the Redis that Celery already uses
+(REDIS_URL, see celery_utils.py), so every uvicorn and Celery worker sees the
+same entries.
+
+Keys are versioned per patient:
+
+    cg:patient:<id>:v               version counter, no TTL
+    cg:patient:<id>:<v>:<resource>  encoded JSON response, READ_CACHE_TTL
+
+Writers call `invalidate(patient_id)` after committing, which bumps the
+counter; every worker's next read builds a key under the new version, and
+entries under old versions simply expire. A read that raced the write can
+only store its result under the old version, which nobody reads any more.
+
+On a miss one caller per key loads from the database: concurrent misses in a
+process share a single load, and across processes the first caller takes a
+short lock (SET NX PX) while the others poll for the value for up to
+READ_CACHE_LOCK_MS before loading themselves. TTLs are jittered so entries
+written together don't expire together.
+
+If Redis can't be reached the cache is bypassed for READ_CACHE_RETRY_SECONDS
+and reads go to the database. An invalidation lost that way leaves other
+workers serving the old version until its TTL runs out.
+
+READ_CACHE=redis (default), memory (an in-process stand-in with the same
+semantics, for tests and single-process development) or off.
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+import metrics
+
+
+log = logging.getLogger(__name__)
+
+KEY_PREFIX = "cg:patient"
+# Connection failures surface as RedisError subclasses, or as OSError from the socket layer
+CACHE_ERRORS = (RedisError, OSError)
+LOCK_POLL_SECONDS = 0.01
+TTL_JITTER = 0.1
+
+
+class MemoryBackend:
+    """The subset of Redis the cache uses, in process memory, with the same expiry semantics."""
+
+    def __init__(self):
+        self._data = {}  # key -> (value, expires at monotonic or None)
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    async def get(self, key: str):
+        entry = self._live(key)
+        return entry[0] if entry else None
+
+    async def set(self, key: str, value, px: Optional[int] = None, nx: bool = False):
+        if nx and self._live(key) is not None:
+            return None
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        self._data[key] = (value, time.monotonic() + px / 1000 if px else None)
+        return True
+
+    async def incr(self, key: str) -> int:
+        entry = self._live(key)
+        value = int(entry[0]) + 1 if entry else 1
+        self._data[key] = (str(value).encode("ascii"), entry[1] if entry else None)
+        return value
+
+    async def delete(self, *keys) -> int:
+        return sum(1 for key in keys if self._data.pop(key, None) is not None)
+
+    async def ping(self) -> bool:
+        return True
+
+
+class ReadCache:
+    def __init__(self, backend, ttl_seconds: float, lock_ms: int, retry_seconds: float):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.lock_ms = lock_ms
+        self.retry_seconds = retry_seconds
+        self._unavailable_until = 0.0
+        self._inflight = {}  # key -> Future of the load in progress in this process
+        self.counts = {}  # (resource, result) -> lookups, for info()
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None and time.monotonic() >= self._unavailable_until
+
+    def _count(self, resource: str, result: str):
+        self.counts[(resource, result)] = self.counts.get((resource, result), 0) + 1
+        metrics.READ_CACHE_LOOKUPS.labels(resource, result).inc()
+
+    def _unavailable(self, e: Exception):
+        if time.monotonic() >= self._unavailable_until:
+            log.warning(f"READ_CACHE: Redis unavailable, reading from the database for "
+                        f"{self.retry_seconds:g}s: {e.__class__.__name__}: {e}")
+        self._unavailable_until = time.monotonic() + self.retry_seconds
+
+    def _ttl_ms(self) -> int:
+        return int(self.ttl_seconds * 1000 * random.uniform(1 - TTL_JITTER, 1 + TTL_JITTER))
+
+    async def get_or_load(self, patient_id: int, resource: str, variant: str,
+                          load: Callable[[], Awaitable]) -> bytes:
+        """
+        The encoded JSON for `resource` of a patient, from the cache or from
+        `load()` (returning JSON-safe data). `variant` distinguishes query
+        parameters of the same resource. Exceptions from `load()` (404s) are
+        raised to every caller waiting on it and nothing is cached.
+        """
+        if not self.enabled:
+            self._count(resource, "bypass")
+            return encode(await load())
+        try:
+            version = await self.backend.get(f"{KEY_PREFIX}:{patient_id}:v")
+            key = f"{KEY_PREFIX}:{patient_id}:{int(version or 0)}:{resource}:{variant}"
+            body = await self.backend.get(key)
+        except CACHE_ERRORS as e:
+            self._unavailable(e)
+            self._count(resource, "bypass")
+            return encode(await load())
+        if body is not None:
+            self._count(resource, "hit")
+            return body
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self._count(resource, "wait")
+            return await asyncio.shield(pending)
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting; don't let an unawaited failure be logged as unretrieved
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            body = await self._fill(key, resource, load)
+            future.set_result(body)
+            return body
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _fill(self, key: str, resource: str, load) -> bytes:
+        lock = f"{key}:lock"
+        try:
+            locked = await self.backend.set(lock, b"1", px=self.lock_ms, nx=True)
+            if not locked:
+                # Another process is loading this key; wait for its result
+                deadline = time.monotonic() + self.lock_ms / 1000
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(LOCK_POLL_SECONDS)
+                    body = await self.backend.get(key)
+                    if body is not None:
+                        self._count(resource, "wait")
+                        return body
+        except CACHE_ERRORS as e:
+            self._unavailable(e)
+            self._count(resource, "bypass")
+            return encode(await load())
+
+        self._count(resource, "miss")
+        try:
+            body = encode(await load())
+        except BaseException:
+            if locked:
+                await self._release(lock)
+            raise
+        try:
+            await self.backend.set(key, body, px=self._ttl_ms())
+            if locked:
+                await self.backend.delete(lock)
+        except CACHE_ERRORS as e:
+            self._unavailable(e)
+        return body
+
+    async def _release(self, lock: str):
+        try:
+            await self.backend.delete(lock)
+        except CACHE_ERRORS as e:
+            self._unavailable(e)
+
+    async def invalidate(self, *patient_ids: Optional[int]):
+        """Bumps each patient's version; call after the write has committed."""
+        if self.backend is None:
+            return
+        for patient_id in {p for p in patient_ids if p is not None}:
+            try:
+                await self.backend.incr(f"{KEY_PREFIX}:{patient_id}:v")
+                metrics.READ_CACHE_INVALIDATIONS.inc()
+            except CACHE_ERRORS as e:
+                # Still attempted while reads bypass Redis, so entries don't outlive an outage
+                if self.enabled:
+                    log.warning(f"READ_CACHE: could not invalidate patient {patient_id}: {e}")
+                self._unavailable(e)
+
+    async def ping(self) -> Optional[float]:
+        """Round-trip seconds, or None when the cache is off."""
+        if self.backend is None:
+            return None
+        started = time.perf_counter()
+        await self.backend.ping()
+        return time.perf_counter() - started
+
+    def info(self) -> dict:
+        lookups = {}
+        for (resource, result), count in self.counts.items():
+            lookups.setdefault(resource, {})[result] = count
+        for counts in lookups.values():
+            served = sum(counts.get(result, 0) for result in ("hit", "wait", "miss"))
+            counts["hit_rate"] = round((counts.get("hit", 0) + counts.get("wait", 0)) / served, 4) if served else None
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "available": self.enabled,
+            "ttl_seconds": self.ttl_seconds,
+            "lookups": lookups,
+        }
+
+
+def encode(data) -> bytes:
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def cache_from_env() -> ReadCache:
+    mode = os.getenv("READ_CACHE", "redis").lower()
+    if mode == "redis":
+        backend = aioredis.from_url(
+            os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+            socket_timeout=float(os.getenv("READ_CACHE_SOCKET_TIMEOUT", "0.25")),
+            socket_connect_timeout=float(os.getenv("READ_CACHE_SOCKET_TIMEOUT", "0.25")),
+        )
+    elif mode == "memory":
+        backend = MemoryBackend()
+    else:
+        backend = None
+    return ReadCache(
+        backend,
+        ttl_seconds=float(os.getenv("READ_CACHE_TTL", "300")),
+        lock_ms=int(os.getenv("READ_CACHE_LOCK_MS", "500")),
+        retry_seconds=float(os.getenv("READ_CACHE_RETRY_SECONDS", "30")),
+    )
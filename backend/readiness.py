@@ -0,0 +1,175 @@
+"""
+Liveness, readiness and connection warm-up.
+
+    GET /health/live   the process is up and serving; no dependencies touched
+    GET /health/ready  503 until this process has warmed up, then the
+                       database, Redis and scheduler with their latencies
+
+Point the load balancer (or the platform's deploy health check) at
+/health/ready so traffic only reaches warm instances.
+
+Warm-up runs once at startup, in the background. It opens DB_POOL_SIZE
+connections on each request pool at the same time, so the pool is at its
+minimum size before the first request. It then runs the hot read queries
+on every one of those connections, which fills SQLAlchemy's compiled-statement
+cache and has asyncpg prepare the statements on each connection. The first
+requests after a deploy then pay neither connection setup nor query
+compilation. If warm-up fails (database down at boot), the next readiness
+probe starts it again.
+
+Only the primary database is required for readiness. Redis (the read cache
+falls back to the database), a replica (reads fall back to the primary) and
+the scheduler are reported as "degraded" without failing the probe.
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+log = logging.getLogger(__name__)
+
+
+async def warm_async_pool(engine, connections: int, statements: list) -> dict:
+    """
+    Checks out `connections` connections at once (so the pool opens that
+    many) and runs every statement on each, then returns them to the pool.
+    """
+    started = time.perf_counter()
+    conns = await asyncio.gather(*(engine.connect() for _ in range(connections)), return_exceptions=True)
+    opened = [conn for conn in conns if not isinstance(conn, BaseException)]
+    if not opened:
+        raise conns[0]
+    failures = 0
+
+    async def run(conn):
+        nonlocal failures
+        session = AsyncSession(bind=conn)
+        try:
+            for statement in statements:
+                try:
+                    await session.execute(statement)
+                except Exception as e:
+                    failures += 1
+                    log.warning(f"READINESS: warm-up query failed: {e.__class__.__name__}: {e}")
+                    await session.rollback()
+        finally:
+            await session.close()
+            await conn.close()
+
+    await asyncio.gather(*(run(conn) for conn in opened))
+    return {
+        "connections": len(opened),
+        "queries": len(opened) * len(statements) - failures,
+        "failed_queries": failures,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def warm_sync_pool(engine, connections: int) -> dict:
+    """Opens `connections` connections on a sync engine at once; run in a thread."""
+    started = time.perf_counter()
+    conns = []
+    try:
+        for _ in range(connections):
+            conn = engine.connect()
+            conns.append(conn)
+            conn.execute(text("SELECT 1"))
+    finally:
+        for conn in conns:
+            conn.close()
+    return {"connections": len(conns), "seconds": round(time.perf_counter() - started, 3)}
+
+
+async def timed(check: Callable[[], Awaitable], timeout: float) -> dict:
+    """Runs one dependency check: {"status": "ok", "latency_ms": ...} or the error."""
+    started = time.perf_counter()
+    try:
+        detail = await asyncio.wait_for(check(), timeout)
+    except asyncio.TimeoutError:
+        return {"status": "error", "error": f"timed out after {timeout:g}s"}
+    except Exception as e:
+        return {"status": "error", "error": f"{e.__class__.__name__}: {e}"}
+    result = {"status": "ok", "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+    if isinstance(detail, dict):
+        result.update(detail)
+    return result
+
+
+class Readiness:
+    def __init__(self, check_timeout: float, warmup_enabled: bool):
+        self.check_timeout = check_timeout
+        self.warmup_enabled = warmup_enabled
+        self.state = "starting"  # starting, warming, warm or failed
+        self.warmup: Optional[dict] = None
+        self.error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._on_done: Optional[Callable[[], None]] = None
+
+    def start_warmup(self, warm: Callable[[], Awaitable[dict]], on_done: Optional[Callable[[], None]] = None):
+        """
+        Starts warm-up in the background unless it is running or done.
+        `on_done` runs once, after the first attempt whether or not it succeeded.
+        """
+        if on_done is not None:
+            self._on_done = on_done
+        if self.state in ("warming", "warm"):
+            return
+        if not self.warmup_enabled:
+            self.state = "warm"
+            self._finished()
+            return
+        self.state = "warming"
+        self._task = asyncio.get_running_loop().create_task(self._warm(warm))
+
+    def _finished(self):
+        on_done, self._on_done = self._on_done, None
+        if on_done:
+            on_done()
+
+    async def _warm(self, warm):
+        started = time.perf_counter()
+        try:
+            self.warmup = await warm()
+            self.warmup["seconds"] = round(time.perf_counter() - started, 3)
+            self.error = None
+            self.state = "warm"
+            log.info(f"READINESS: warmed up in {self.warmup['seconds']:g}s")
+        except Exception as e:
+            self.error = f"{e.__class__.__name__}: {e}"
+            self.state = "failed"
+            log.error(f"READINESS: warm-up failed, will retry on the next readiness probe: {self.error}")
+        finally:
+            self._finished()
+
+    async def report(self, required: Dict[str, Callable], optional: Dict[str, Callable]) -> tuple:
+        """
+        (HTTP status, body) for /health/ready. `required` checks fail the
+        probe, `optional` ones only degrade it; each is an async callable
+        returning None or a dict of details.
+        """
+        body = {"status": None, "warmup": {"state": self.state, **(self.warmup or {})}}
+        if self.error:
+            body["warmup"]["error"] = self.error
+        names = list(required) + list(optional)
+        results = await asyncio.gather(*(
+            timed((required.get(name) or optional.get(name)), self.check_timeout) for name in names
+        ))
+        body["checks"] = dict(zip(names, results))
+
+        if self.state != "warm" or any(body["checks"][name]["status"] != "ok" for name in required):
+            body["status"] = "not_ready"
+            return 503, body
+        body["status"] = "degraded" if any(body["checks"][name]["status"] != "ok" for name in optional) else "ready"
+        return 200, body
+
+
+def readiness_from_env() -> Readiness:
+    return Readiness(
+        check_timeout=float(os.getenv("READINESS_CHECK_TIMEOUT", "2")),
+        warmup_enabled=os.getenv("READINESS_WARMUP", "true").strip().lower() in ("1", "true", "yes", "on"),
+    )
@@ -0,0 +1,118 @@
+"""
+Read-replica routing.
+
+GET/HEAD requests are served from the read replica (DATABASE_REPLICA_URL)
+unless:
+  - the client wrote something within the last REPLICA_STICKY_SECONDS
+    (read-your-writes). Writes return an X-Last-Write header that the
+    frontend sends back on its following requests, which works across
+    workers and instances (the frontend calls the API cross-site, so a
+    cookie would never come back). Clients that don't echo it are also
+    tracked within this process, by signed-in user or else by address;
+  - the replica is more than REPLICA_MAX_LAG_SECONDS behind, or its lag
+    hasn't been measured recently (e.g. the replica is unreachable).
+In all of those cases the primary is used instead.
+"""
+import os
+import time
+import logging
+import threading
+
+from sqlalchemy import text
+
+
+log = logging.getLogger(__name__)
+
+WRITE_HEADER = "X-Last-Write"
+READ_METHODS = ("GET", "HEAD")
+
+# 0 when the replica has replayed everything it received, otherwise the age
+# of the last replayed transaction. Returns 0 on a primary.
+LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class ReplicaRouter:
+    def __init__(self, sticky_seconds: float, max_lag_seconds: float, lag_check_interval: float):
+        self.sticky_seconds = sticky_seconds
+        self.max_lag_seconds = max_lag_seconds
+        self.lag_check_interval = lag_check_interval
+        self.lag_seconds = None
+        self.lag_checked_at = 0.0
+        self._recent_writers = {}  # client key -> last write time
+        self._lock = threading.Lock()
+
+    # --- read-your-writes ---
+    def record_write(self, client_key: str):
+        now = time.time()
+        with self._lock:
+            self._recent_writers[client_key] = now
+            if len(self._recent_writers) > 10000:
+                cutoff = now - self.sticky_seconds
+                self._recent_writers = {k: t for k, t in self._recent_writers.items() if t > cutoff}
+
+    def wrote_recently(self, request) -> bool:
+        now = time.time()
+        try:
+            if now - float(request.headers.get(WRITE_HEADER, 0)) < self.sticky_seconds:
+                return True
+        except ValueError:
+            pass
+        last_write = self._recent_writers.get(client_key(request))
+        return last_write is not None and now - last_write < self.sticky_seconds
+
+    # --- replica health ---
+    def check_lag(self, replica_engine):
+        """Measures replica lag; called periodically from the scheduler."""
+        try:
+            with replica_engine.connect() as conn:
+                self.lag_seconds = float(conn.execute(LAG_QUERY).scalar() or 0)
+            self.lag_checked_at = time.time()
+        except Exception as e:
+            log.warning(f"Replica lag check failed, reads fall back to primary: {e}")
+            self.lag_seconds = None
+
+    def replica_usable(self) -> bool:
+        # A measurement older than a few intervals is as good as none
+        fresh = time.time() - self.lag_checked_at < 3 * self.lag_check_interval
+        return fresh and self.lag_seconds is not None and self.lag_seconds <= self.max_lag_seconds
+
+    def use_replica(self, request) -> bool:
+        return (
+            request.method in READ_METHODS
+            and self.replica_usable()
+            and not self.wrote_recently(request)
+        )
+
+    def status(self) -> dict:
+        return {
+            "lag_seconds": self.lag_seconds,
+            "lag_checked_at": self.lag_checked_at or None,
+            "max_lag_seconds": self.max_lag_seconds,
+            "sticky_seconds": self.sticky_seconds,
+            "usable": self.replica_usable(),
+        }
+
+
+def client_key(request) -> str:
+    """The signed-in user when the request carries a valid session token, else the client address."""
+    session = getattr(request.state, "session", None)
+    if session is not None:
+        return f"user:{session.user_id}"
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def router_from_env() -> ReplicaRouter:
+    return ReplicaRouter(
+        sticky_seconds=float(os.getenv("REPLICA_STICKY_SECONDS", "5")),
+        max_lag_seconds=float(os.getenv("REPLICA_MAX_LAG_SECONDS", "2")),
+        lag_check_interval=float(os.getenv("REPLICA_LAG_CHECK_SECONDS", "5")),
+    )
@@ -0,0 +1,228 @@
+"""
+Schedule occurrence expansion.
+
+A MedicationSchedule's `recurrence_rule` is either one of the legacy
+keywords ('daily', 'weekly' + `day_of_week`) or an RFC 5545 recurrence,
+e.g. 'FREQ=HOURLY;INTERVAL=8', 'FREQ=DAILY;BYDAY=MO,TU,WE,TH,FR', or
+'RDATE:20261101T080000,20261115T080000'. Rules are evaluated in local wall
+time in the schedule's timezone (DTSTART is `time_of_day` on the day the
+schedule was created) and every occurrence is returned as a UTC instant.
+
+Expanding from DTSTART would step through every occurrence since the
+schedule was created, so rules whose periods have a fixed length (weekly and
+shorter) start from the last period before the window instead: moving DTSTART
+by whole INTERVAL periods doesn't change which instants match. Rules with
+COUNT or BYSETPOS depend on the periods before the window and are expanded
+from DTSTART. Either way an expansion that would walk more than
+MAX_EXPANSION_PERIODS periods raises ValueError rather than stall the caller.
+
+Expansion is memoized per schedule version and UTC day: the cache key is the
+set of fields that define the recurrence, so editing a schedule naturally
+misses the old entries instead of needing explicit invalidation.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import pytz
+from dateutil.rrule import rrulestr, rruleset, YEARLY, MONTHLY, WEEKLY, DAILY, HOURLY, MINUTELY, SECONDLY
+
+
+WEEKDAY_CODES = {
+    "monday": "MO", "tuesday": "TU", "wednesday": "WE", "thursday": "TH",
+    "friday": "FR", "saturday": "SA", "sunday": "SU",
+}
+RFC5545_PREFIXES = ("FREQ=", "RRULE:", "RDATE", "EXDATE", "EXRULE", "DTSTART")
+
+# Period length per frequency; the ones before MONTHLY are only estimates of cost
+FREQ_SECONDS = {
+    YEARLY: 365 * 86400, MONTHLY: 28 * 86400,
+    WEEKLY: 7 * 86400, DAILY: 86400, HOURLY: 3600, MINUTELY: 60, SECONDLY: 1,
+}
+FIXED_PERIODS = {WEEKLY, DAILY, HOURLY, MINUTELY, SECONDLY}
+MAX_EXPANSION_PERIODS = 50000
+
+
+def parse_time_of_day(time_of_day: str) -> time:
+    """Parses a schedule's 'HH:MM' time_of_day."""
+    hour, minute = time_of_day.split(":")[:2]
+    return time(int(hour), int(minute))
+
+
+def get_timezone(tz_name: Optional[str]):
+    return pytz.timezone(tz_name) if tz_name else pytz.utc
+
+
+def localize(local_date: date, local_time: time, tz_name: Optional[str]) -> datetime:
+    """
+    Combines a local wall-clock date and time in `tz_name` (UTC when unset)
+    and returns the instant as an aware UTC datetime.
+    """
+    return _to_utc(datetime.combine(local_date, local_time), get_timezone(tz_name))
+
+
+def _to_utc(local_naive: datetime, tz) -> datetime:
+    # Nonexistent wall times (spring forward) are shifted forward by normalize();
+    # ambiguous ones (fall back) resolve to the standard-time instant.
+    return tz.normalize(tz.localize(local_naive)).astimezone(timezone.utc)
+
+
+def local_today(tz_name: Optional[str], now: Optional[datetime] = None) -> date:
+    """Today's date in `tz_name` (UTC when unset)."""
+    return (now or datetime.now(timezone.utc)).astimezone(get_timezone(tz_name)).date()
+
+
+def rule_text(recurrence_rule: Optional[str], day_of_week: Optional[str]) -> Optional[str]:
+    """
+    Normalizes a schedule's recurrence to RFC 5545 text, or None when the
+    schedule never fires ('custom', unset, or weekly without a day).
+    """
+    if not recurrence_rule:
+        return None
+    rule = recurrence_rule.strip()
+    if rule.lower() == "daily":
+        return "FREQ=DAILY"
+    if rule.lower() == "weekly":
+        code = WEEKDAY_CODES.get((day_of_week or "").lower())
+        return f"FREQ=WEEKLY;BYDAY={code}" if code else None
+    if rule.upper().startswith(RFC5545_PREFIXES):
+        return rule
+    return None
+
+
+def validate_rule(recurrence_rule: Optional[str]):
+    """Raises ValueError when an RFC 5545 recurrence cannot be parsed."""
+    if recurrence_rule and recurrence_rule.strip().upper().startswith(RFC5545_PREFIXES):
+        rrulestr(recurrence_rule.strip(), dtstart=datetime(2000, 1, 1), forceset=True)
+
+
+def schedule_version(schedule) -> Tuple:
+    """Everything that determines when `schedule` fires; used as the cache key."""
+    tz = get_timezone(schedule.timezone)
+    anchor = schedule.created_at.astimezone(tz).date() if schedule.created_at else date(2000, 1, 1)
+    return (
+        rule_text(schedule.recurrence_rule, schedule.day_of_week),
+        schedule.time_of_day,
+        schedule.timezone,
+        anchor,
+    )
+
+
+@lru_cache(maxsize=4096)
+def _parsed(rule: str, time_of_day: str, anchor: date) -> rruleset:
+    """The parsed rule set in local wall time; only read from, so it is shared."""
+    return rrulestr(rule, dtstart=datetime.combine(anchor, parse_time_of_day(time_of_day)), forceset=True)
+
+
+def _fast_forward(rule, local_lo: datetime):
+    """`rule` starting at its last period start at or before local_lo, where that keeps its instants."""
+    if rule._freq not in FIXED_PERIODS or rule._count or rule._bysetpos:
+        return rule
+    step = timedelta(seconds=FREQ_SECONDS[rule._freq] * rule._interval)
+    periods = (local_lo - rule._dtstart) // step
+    if periods <= 0:
+        return rule
+    return rule.replace(dtstart=rule._dtstart + periods * step)
+
+
+def _recurrence(rule: str, time_of_day: str, anchor: date, local_lo: datetime, local_hi: datetime) -> rruleset:
+    """
+    The rule set, fast-forwarded to local_lo, for finding its occurrences up
+    to local_hi. Raises ValueError when that would take too many steps.
+    """
+    parsed = _parsed(rule, time_of_day, anchor)
+    # rruleset has no public accessors for its parts
+    recurrence = rruleset()
+    for part, add in ((parsed._rrule, recurrence.rrule), (parsed._exrule, recurrence.exrule)):
+        for rrule in part:
+            rrule = _fast_forward(rrule, local_lo)
+            periods = (local_hi - rrule._dtstart).total_seconds() / (FREQ_SECONDS[rrule._freq] * rrule._interval)
+            if rrule._count:
+                periods = min(periods, rrule._count)
+            if periods > MAX_EXPANSION_PERIODS:
+                raise ValueError(f"recurrence {rule!r} needs {periods:.0f} steps to expand, "
+                                 f"more than {MAX_EXPANSION_PERIODS}")
+            add(rrule)
+    for rdate in parsed._rdate:
+        recurrence.rdate(rdate)
+    for exdate in parsed._exdate:
+        recurrence.exdate(exdate)
+    return recurrence
+
+
+@lru_cache(maxsize=16384)
+def _expand_utc_day(version: Tuple, utc_day: date) -> Tuple[datetime, ...]:
+    rule, time_of_day, tz_name, anchor = version
+    if not rule:
+        return ()
+    tz = get_timezone(tz_name)
+
+    day_start = datetime.combine(utc_day, time(0), tzinfo=timezone.utc)
+    day_end = day_start + timedelta(days=1)
+    # Widen the local window by a day on each side to cover any UTC offset
+    local_lo = day_start.astimezone(tz).replace(tzinfo=None) - timedelta(days=1)
+    local_hi = day_end.astimezone(tz).replace(tzinfo=None) + timedelta(days=1)
+    recurrence = _recurrence(rule, time_of_day, anchor, local_lo, local_hi)
+
+    occurrences = []
+    for local_naive in recurrence.between(local_lo, local_hi, inc=True):
+        instant = _to_utc(local_naive, tz)
+        if day_start <= instant < day_end:
+            occurrences.append(instant)
+    return tuple(sorted(set(occurrences)))
+
+
+def occurrences_between(schedule, start: datetime, end: datetime) -> List[datetime]:
+    """Returns the UTC instants in [start, end) at which `schedule` is due."""
+    version = schedule_version(schedule)
+    if not version[0]:
+        return []
+    start, end = start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+    occurrences = []
+    day = start.date()
+    while day <= end.date():
+        occurrences.extend(t for t in _expand_utc_day(version, day) if start <= t < end)
+        day += timedelta(days=1)
+    return occurrences
+
+
+def occurrences_on(schedule, local_date: date) -> List[datetime]:
+    """
+    Returns the UTC instants at which `schedule` is due on `local_date`,
+    where the date is interpreted in the schedule's own timezone.
+    """
+    tz = get_timezone(schedule.timezone)
+    start = _to_utc(datetime.combine(local_date, time(0)), tz)
+    end = _to_utc(datetime.combine(local_date + timedelta(days=1), time(0)), tz)
+    return occurrences_between(schedule, start, end)
+
+
+def next_occurrence(schedule, after: datetime) -> Optional[datetime]:
+    """The first UTC instant strictly after `after` at which `schedule` is due, or None."""
+    rule, time_of_day, tz_name, anchor = schedule_version(schedule)
+    if not rule:
+        return None
+    tz = get_timezone(tz_name)
+    after = after.astimezone(timezone.utc)
+    local = after.astimezone(tz).replace(tzinfo=None)
+    # Fast-forwarded to a day early, so a DST shift can't skip the first candidate
+    recurrence = _recurrence(rule, time_of_day, anchor, local - timedelta(days=1), local + timedelta(days=2))
+    # Wall times repeated or skipped around DST changes can map to an instant
+    # that isn't after `after`; keep stepping until one is
+    while True:
+        local = recurrence.after(local)
+        if local is None:
+            return None
+        instant = _to_utc(local, tz)
+        if instant > after:
+            return instant
+
+
+def is_due_at(schedule, minute: datetime) -> bool:
+    """Whether `schedule` has an occurrence within the minute starting at `minute`."""
+    minute = minute.replace(second=0, microsecond=0)
+    return bool(occurrences_between(schedule, minute, minute + timedelta(minutes=1)))
+
+
+def cache_info():
+    return _expand_utc_day.cache_info()
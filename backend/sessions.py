@@ -0,0 +1,249 @@
+"""
+Signed session tokens and the patient access cache.
+
+Login issues a stateless token: a base64url JSON payload (user id, role,
+issue and expiry times) plus an HMAC-SHA256 signature over it, keyed with
+SESSION_SECRET. Verifying one needs no database round trip. Clients send it
+as `Authorization: Bearer <token>`.
+
+Which patients a user may see comes from patient_user_association. Those
+sets are kept in an in-process LRU cache with a TTL, so per-request access
+checks are a set lookup. Assigning or removing an aide (or changing or
+deleting a user) invalidates that user's entry in this process; other
+processes pick the change up when their entry expires (ACCESS_CACHE_TTL).
+The role used for access checks is the one cached with the patient ids, so
+a role change takes effect on the same schedule rather than when the token
+expires.
+
+Medication reminder pushes carry a second kind of token, naming one dose
+occurrence (schedule, scheduled time, recipient). It is signed with the same
+secret under its own version prefix, so it can't pass as a session token or
+the other way round. Holding it is what authorizes acknowledging that dose
+from the notification, without a session (DOSE_TOKEN_HOURS).
+"""
+import os
+import hmac
+import json
+import time
+import base64
+import hashlib
+import logging
+import secrets
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+import ttl_cache
+
+
+log = logging.getLogger(__name__)
+
+TOKEN_VERSION = "v1"
+OCCURRENCE_TOKEN_VERSION = "o1"
+
+
+class InvalidToken(Exception):
+    """Malformed, tampered with or expired."""
+
+
+@dataclass(frozen=True)
+class Claims:
+    user_id: int
+    role: str
+    issued_at: int
+    expires_at: int
+
+
+@dataclass(frozen=True)
+class Occurrence:
+    schedule_id: int
+    scheduled_time: int  # epoch seconds
+    user_id: Optional[int]
+    expires_at: int
+
+
+@dataclass(frozen=True)
+class Access:
+    role: str
+    patient_ids: frozenset
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+@dataclass(frozen=True)
+class TokenCodec:
+    """
+    One kind of token: its version prefix, how `TokenSigner.issue()` arguments
+    become its claims, and how those map to and from the JSON payload.
+    """
+    version: str
+    new: Callable[..., Any]  # (issued at, expires at, *issue() arguments) -> claims
+    to_payload: Callable[[Any], dict]
+    from_payload: Callable[[dict], Any]  # may raise ValueError, KeyError or TypeError
+
+
+SESSION_TOKENS = TokenCodec(
+    TOKEN_VERSION,
+    new=lambda now, expires_at, user_id, role: Claims(user_id=user_id, role=role, issued_at=now,
+                                                      expires_at=expires_at),
+    to_payload=lambda claims: {"uid": claims.user_id, "role": claims.role,
+                               "iat": claims.issued_at, "exp": claims.expires_at},
+    from_payload=lambda data: Claims(user_id=int(data["uid"]), role=str(data["role"]),
+                                     issued_at=int(data["iat"]), expires_at=int(data["exp"])),
+)
+
+OCCURRENCE_TOKENS = TokenCodec(
+    OCCURRENCE_TOKEN_VERSION,
+    # scheduled_time must be timezone-aware
+    new=lambda now, expires_at, schedule_id, scheduled_time, user_id: Occurrence(
+        schedule_id=schedule_id, scheduled_time=int(scheduled_time.timestamp()), user_id=user_id,
+        expires_at=expires_at),
+    to_payload=lambda occurrence: {"sid": occurrence.schedule_id, "at": occurrence.scheduled_time,
+                                   "uid": occurrence.user_id, "exp": occurrence.expires_at},
+    from_payload=lambda data: Occurrence(schedule_id=int(data["sid"]), scheduled_time=int(data["at"]),
+                                         user_id=None if data["uid"] is None else int(data["uid"]),
+                                         expires_at=int(data["exp"])),
+)
+
+
+class TokenSigner:
+    """
+    Signs and verifies one kind of token, `<version>.<payload>.<signature>`.
+    The version is part of the signed message, so a token of one kind never
+    verifies as another even though they share the secret.
+    """
+
+    def __init__(self, secret: bytes, lifetime_seconds: int, codec: TokenCodec = SESSION_TOKENS):
+        self.secret = secret
+        self.lifetime_seconds = lifetime_seconds
+        self.codec = codec
+
+    def _signature(self, payload: str) -> str:
+        mac = hmac.new(self.secret, f"{self.codec.version}.{payload}".encode("ascii"), hashlib.sha256)
+        return _b64encode(mac.digest())
+
+    def sign(self, claims) -> str:
+        payload = _b64encode(json.dumps(self.codec.to_payload(claims), separators=(",", ":")).encode("utf-8"))
+        return f"{self.codec.version}.{payload}.{self._signature(payload)}"
+
+    def verify(self, token: str):
+        """The token's claims, as decoded by the codec."""
+        try:
+            version, payload, signature = token.split(".")
+        except ValueError:
+            raise InvalidToken("malformed token")
+        if version != self.codec.version or not hmac.compare_digest(signature, self._signature(payload)):
+            raise InvalidToken("bad signature")
+        try:
+            claims = self.codec.from_payload(json.loads(_b64decode(payload)))
+        except (ValueError, KeyError, TypeError):
+            raise InvalidToken("malformed token")
+        if claims.expires_at <= time.time():
+            raise InvalidToken("token expired")
+        return claims
+
+    def issue(self, *args) -> tuple:
+        """
+        Returns (token, claims) for new claims built by the codec:
+        issue(user_id, role) for sessions, issue(schedule_id, scheduled_time,
+        user_id) for dose occurrences.
+        """
+        now = int(time.time())
+        claims = self.codec.new(now, now + self.lifetime_seconds, *args)
+        return self.sign(claims), claims
+
+
+class AccessCache:
+    """user id -> Access, least recently used entries evicted past max_users."""
+
+    def __init__(self, max_users: int, ttl_seconds: float):
+        self._entries = ttl_cache.TTLCache(max_users, ttl_seconds)
+
+    def get(self, user_id: int) -> Optional[Access]:
+        return self._entries.get(user_id)
+
+    def put(self, user_id: int, access: Access):
+        self._entries.put(user_id, access)
+
+    def invalidate(self, user_id: int):
+        self._entries.pop(user_id)
+
+    def clear(self):
+        self._entries.clear()
+
+    def info(self) -> dict:
+        return self._entries.info("users")
+
+
+def is_admin(access: Access) -> bool:
+    # The admin console has created both "admin" and "Admin"
+    return (access.role or "").lower() == "admin"
+
+
+def can_access(access: Access, patient_id: int) -> bool:
+    return is_admin(access) or patient_id in access.patient_ids
+
+
+def bearer_token(request) -> Optional[str]:
+    header = request.headers.get("authorization", "")
+    scheme, _, token = header.partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
+
+
+def auth_required() -> bool:
+    """
+    When false, patient-scoped requests without a token are let through (for
+    clients that predate tokens). Admin-only routes always need one.
+    """
+    return os.getenv("AUTH_REQUIRED", "true").lower() in ("1", "true", "yes")
+
+
+_random_secret = None
+PLACEHOLDER_SECRETS = {"change-me"}
+
+
+def development() -> bool:
+    """APP_ENV=development; anything else (including unset) is treated as a deployment."""
+    return os.getenv("APP_ENV", "production").strip().lower() in ("development", "dev", "local")
+
+
+def _secret_from_env() -> bytes:
+    """
+    SESSION_SECRET. Outside development a missing or placeholder secret is a
+    startup error: a per-process random key would invalidate every session
+    on each redeploy and differ between processes.
+    """
+    global _random_secret
+    secret = os.getenv("SESSION_SECRET") or os.getenv("JWT_SECRET")
+    if secret and (secret not in PLACEHOLDER_SECRETS or development()):
+        return secret.encode("utf-8")
+    if not development():
+        raise RuntimeError("SESSION_SECRET must be set to a long random value "
+                           "(or set APP_ENV=development to use a per-process key)")
+    if _random_secret is None:
+        log.warning("SESSIONS: SESSION_SECRET is not set; using a random per-process key, "
+                    "tokens will not survive a restart or work across processes")
+        _random_secret = secrets.token_hex(32).encode("utf-8")
+    return _random_secret
+
+
+def signer_from_env() -> TokenSigner:
+    return TokenSigner(_secret_from_env(), int(float(os.getenv("SESSION_TOKEN_HOURS", "24")) * 3600))
+
+
+def occurrence_signer_from_env() -> TokenSigner:
+    return TokenSigner(_secret_from_env(), int(float(os.getenv("DOSE_TOKEN_HOURS", "24")) * 3600), OCCURRENCE_TOKENS)
+
+
+def cache_from_env() -> AccessCache:
+    return AccessCache(
+        max_users=int(os.getenv("ACCESS_CACHE_USERS", "10000")),
+        ttl_seconds=float(os.getenv("ACCESS_CACHE_TTL", "60")),
+    )
@@ -0,0 +1,133 @@
+"""
+Opt-in per-request SQL profiler for development and staging.
+
+Enable with SQL_PROFILER=true. For every request it counts and times the SQL
+statements run on the instrumented engines, and then:
+  - logs a warning when one statement shape runs SQL_PROFILER_N_PLUS_ONE or
+    more times in a single request (a lazy load inside a loop, usually);
+  - logs statements slower than SQL_PROFILER_SLOW_MS with their parameters;
+  - adds a Server-Timing header (db time and query count, app time, and the
+    number of suspected N+1 shapes) so the numbers show up in the browser's
+    network panel.
+
+Statements are timed by the listeners metrics.py installs for /metrics; the
+profiler registers as an observer on those rather than adding its own.
+
+A statement's shape is its SQL text with whitespace and literals collapsed;
+bound parameters are not part of the text, so `SELECT ... WHERE users.id = %(pk_1)s`
+run once per row shows up as one shape repeated N times.
+"""
+import os
+import re
+import time
+import logging
+import contextvars
+
+import metrics
+
+
+log = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+# Expanding IN lists render one placeholder per value
+_IN_LISTS = re.compile(r"IN \((?:[^()]*?, )+[^()]*?\)")
+
+
+def enabled() -> bool:
+    return os.getenv("SQL_PROFILER", "false").strip().lower() in ("1", "true", "yes", "on")
+
+
+def settings() -> dict:
+    return {
+        "slow_ms": float(os.getenv("SQL_PROFILER_SLOW_MS", "100")),
+        "n_plus_one": int(os.getenv("SQL_PROFILER_N_PLUS_ONE", "5")),
+    }
+
+
+def statement_shape(statement: str) -> str:
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _LITERALS.sub("?", shape)
+    return _IN_LISTS.sub("IN (...)", shape)
+
+
+class RequestProfile:
+    """Statements seen while serving one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = {}  # shape -> [count, seconds]
+        self.slow = []    # (seconds, statement, parameters)
+
+    def record(self, statement, parameters, seconds, slow_seconds):
+        self.count += 1
+        self.seconds += seconds
+        entry = self.shapes.setdefault(statement_shape(statement), [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        if seconds >= slow_seconds:
+            self.slow.append((seconds, statement, parameters))
+
+    def repeated(self, threshold: int):
+        """Shapes run at least `threshold` times, most frequent first."""
+        found = [(count, seconds, shape) for shape, (count, seconds) in self.shapes.items() if count >= threshold]
+        return sorted(found, reverse=True)
+
+
+# Mutated in place, like metrics' per-request totals
+_current = contextvars.ContextVar("sql_profile", default=None)
+
+
+class SQLProfiler:
+    def __init__(self, slow_ms: float, n_plus_one: int):
+        self.slow_seconds = slow_ms / 1000.0
+        self.n_plus_one = n_plus_one
+
+    def observe(self, statement, parameters, seconds):
+        profile = _current.get()
+        if profile is not None:
+            profile.record(statement, parameters, seconds, self.slow_seconds)
+
+    async def middleware(self, request, call_next):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - started
+
+        target = f"{request.method} {request.url.path}"
+        repeated = profile.repeated(self.n_plus_one)
+        for count, seconds, shape in repeated:
+            log.warning(
+                f"SQL PROFILER: suspected N+1 in {target}: {count} x {seconds * 1000:.1f}ms total: {shape[:300]}"
+            )
+        for seconds, statement, parameters in profile.slow:
+            log.warning(
+                f"SQL PROFILER: slow query in {target} ({seconds * 1000:.1f}ms): "
+                f"{_WHITESPACE.sub(' ', statement)[:500]} params={parameters!r:.500}"
+            )
+
+        timings = [
+            f'db;dur={profile.seconds * 1000:.1f};desc="{profile.count} queries"',
+            f"app;dur={(total - profile.seconds) * 1000:.1f}",
+        ]
+        if repeated:
+            timings.append(f'nplusone;desc="{len(repeated)} repeated statements"')
+        response.headers.append("Server-Timing", ", ".join(timings))
+        return response
+
+
+def install(app) -> SQLProfiler:
+    """
+    Observes the statements metrics.py times (on the engines passed to
+    metrics.instrument_engine) and registers the middleware on the app.
+    """
+    profiler = SQLProfiler(**settings())
+    metrics.observe_statements(profiler.observe)
+    app.middleware("http")(profiler.middleware)
+    log.info(f"SQL PROFILER: enabled (slow >= {settings()['slow_ms']}ms, N+1 >= {profiler.n_plus_one} repeats)")
+    return profiler
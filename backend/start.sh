@@ -1,4 +1,4 @@
 #!/bin/bash
 source ~/anaconda3/etc/profile.d/conda.sh
 conda activate caregiver
-uvicorn main:app --reload --port 8000
+APP_ENV=${APP_ENV:-development} uvicorn main:app --reload --port 8000
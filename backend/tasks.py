@@ -1,9 +1,10 @@
 import os
 import json
-from pywebpush import webpush, WebPushException
+from pywebpush import WebPushException
 from sqlalchemy.orm import sessionmaker
 from celery_utils import celery_app
-from main import get_db, PushSubscription  # Import from your main.py
+from main import get_db, now_utc, PushSubscription  # Import from your main.py
+from push_crypto import PushSender, encode_payload
 
 # --- IMPORTANT ---
 # You must add these to your .env file and your Railway environment variables
@@ -13,10 +14,8 @@ VAPID_EMAIL = os.getenv("VAPID_EMAIL", "mailto:your-email@example.com") # A cont
 if not VAPID_PRIVATE_KEY:
     raise ValueError("VAPID_PRIVATE_KEY is not set in environment variables.")
 
-# Setup VAPID claims
-vapid_claims = {
-    "sub": VAPID_EMAIL
-}
+# Parse the VAPID key once per worker; signed headers are cached per push service
+push_sender = PushSender(VAPID_PRIVATE_KEY, VAPID_EMAIL)
 
 @celery_app.task(name="tasks.send_push_notification")
 def send_push_notification(subscription_id: int, title: str, body: str):
@@ -31,28 +30,23 @@ def send_push_notification(subscription_id: int, title: str, body: str):
         # Get the subscription token from the database
         subscription_db = db.query(PushSubscription).get(subscription_id)
         
-        if not subscription_db:
-            print(f"Subscription {subscription_id} not found.")
+        if not subscription_db or subscription_db.expired_at:
+            print(f"Subscription {subscription_id} not found or expired.")
             return
 
         # Prepare the message payload
-        message_data = json.dumps({"title": title, "body": body})
+        message_data = encode_payload(title, body)
         
         # Send the notification
-        webpush(
-            subscription_info=subscription_db.subscription_data,
-            data=message_data,
-            vapid_private_key=VAPID_PRIVATE_KEY,
-            vapid_claims=vapid_claims
-        )
+        push_sender.send(subscription_db.subscription_data, message_data)
         print(f"Successfully sent notification to subscription {subscription_id}")
 
     except WebPushException as ex:
-        # If the subscription is gone or expired (404, 410), delete it
-        if ex.response and ex.response.status_code in [404, 410]:
-            print(f"Subscription {subscription_id} is gone. Deleting.")
+        # If the subscription is gone or expired (404, 410), mark it for the pruning job
+        if ex.response is not None and ex.response.status_code in [404, 410]:
+            print(f"Subscription {subscription_id} is gone. Marking for pruning.")
             if db and subscription_db:
-                db.delete(subscription_db)
+                subscription_db.expired_at = now_utc()
                 db.commit()
         else:
             print(f"Error sending push notification: {ex}")
@@ -0,0 +1,167 @@
+import asyncio
+import json
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+import read_cache
+from read_cache import MemoryBackend, ReadCache
+
+
+def make_cache(backend=None, retry_seconds=30.0):
+    return ReadCache(backend if backend is not None else MemoryBackend(),
+                     ttl_seconds=60, lock_ms=200, retry_seconds=retry_seconds)
+
+
+class Loader:
+    """load() for get_or_load: counts calls, optionally waits for a release or fails."""
+
+    def __init__(self, value=None, error=None, release=None):
+        self.value = value
+        self.error = error
+        self.release = release
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.release is not None:
+            await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class DownBackend(MemoryBackend):
+    """A MemoryBackend that fails like an unreachable Redis while `down` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.down = True
+        self.calls = 0
+
+    async def get(self, key):
+        self.calls += 1
+        if self.down:
+            raise RedisConnectionError("connection refused")
+        return await super().get(key)
+
+    async def incr(self, key):
+        self.calls += 1
+        if self.down:
+            raise RedisConnectionError("connection refused")
+        return await super().incr(key)
+
+
+def test_hit_after_miss():
+    async def run():
+        cache = make_cache()
+        load = Loader({"name": "Ann"})
+        first = await cache.get_or_load(1, "patient", "", load)
+        second = await cache.get_or_load(1, "patient", "", load)
+        return cache, load, first, second
+
+    cache, load, first, second = asyncio.run(run())
+    assert json.loads(first) == {"name": "Ann"} and second == first
+    assert load.calls == 1
+    assert cache.counts == {("patient", "miss"): 1, ("patient", "hit"): 1}
+
+
+def test_version_bump_invalidates_entries():
+    async def run():
+        cache = make_cache()
+        before = await cache.get_or_load(1, "patient", "", Loader({"v": 1}))
+        await cache.invalidate(1)
+        after = await cache.get_or_load(1, "patient", "", Loader({"v": 2}))
+        # Other patients' entries are untouched
+        other = Loader({"v": "other"})
+        await cache.get_or_load(2, "patient", "", other)
+        await cache.invalidate(1, None)
+        await cache.get_or_load(2, "patient", "", other)
+        return cache, before, after, other
+
+    cache, before, after, other = asyncio.run(run())
+    assert json.loads(before) == {"v": 1}
+    assert json.loads(after) == {"v": 2}
+    assert other.calls == 1
+
+
+def test_concurrent_misses_share_one_load():
+    async def run():
+        cache = make_cache()
+        release = asyncio.Event()
+        load = Loader({"ok": True}, release=release)
+        callers = [asyncio.create_task(cache.get_or_load(1, "medications", "active", load)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        return cache, load, await asyncio.gather(*callers)
+
+    cache, load, bodies = asyncio.run(run())
+    assert load.calls == 1
+    assert len(set(bodies)) == 1 and json.loads(bodies[0]) == {"ok": True}
+    assert cache.counts == {("medications", "miss"): 1, ("medications", "wait"): 4}
+
+
+def test_load_error_reaches_every_waiter():
+    async def run():
+        cache = make_cache()
+        release = asyncio.Event()
+        load = Loader(error=LookupError("Patient not found"), release=release)
+        callers = [asyncio.create_task(cache.get_or_load(1, "patient", "", load)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        # Nothing was cached and the lock was released: the next read loads again
+        retry = Loader({"name": "Ann"})
+        body = await cache.get_or_load(1, "patient", "", retry)
+        return load, results, retry, body
+
+    load, results, retry, body = asyncio.run(run())
+    assert load.calls == 1
+    assert all(isinstance(result, LookupError) for result in results)
+    assert retry.calls == 1 and json.loads(body) == {"name": "Ann"}
+
+
+def test_redis_down_bypasses_for_the_retry_window(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(read_cache.time, "monotonic", lambda: clock[0])
+
+    async def read(cache, load):
+        return json.loads(await cache.get_or_load(1, "patient", "", load))
+
+    backend = DownBackend()
+    cache = make_cache(backend, retry_seconds=30)
+    load = Loader({"name": "Ann"})
+
+    assert asyncio.run(read(cache, load)) == {"name": "Ann"}
+    assert not cache.enabled
+    calls = backend.calls
+
+    # Inside the window reads go straight to the database without touching Redis
+    backend.down = False
+    clock[0] += 29
+    assert asyncio.run(read(cache, load)) == {"name": "Ann"}
+    assert backend.calls == calls
+    assert cache.counts == {("patient", "bypass"): 2}
+
+    # After it the cache is used again
+    clock[0] += 2
+    assert cache.enabled
+    asyncio.run(read(cache, load))
+    asyncio.run(read(cache, load))
+    assert backend.calls > calls
+    assert load.calls == 3
+    assert cache.counts[("patient", "hit")] == 1
+
+
+def test_invalidate_while_down_extends_the_window(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(read_cache.time, "monotonic", lambda: clock[0])
+    backend = DownBackend()
+    cache = make_cache(backend, retry_seconds=30)
+
+    asyncio.run(cache.invalidate(1))
+    assert not cache.enabled
+    clock[0] += 20
+    asyncio.run(cache.invalidate(1))
+    clock[0] += 20
+    assert not cache.enabled
@@ -0,0 +1,100 @@
+"""
+A thread-safe in-process LRU with a time to live, shared by the per-process
+caches: dashboard bodies (dashboard.py), per-user access (sessions.py),
+insights snapshots (insights.py) and episode indexes (episodes.py).
+
+Entries past max_entries are evicted least recently used. An entry older
+than ttl_seconds is a miss and is dropped. Values may be mutable objects
+with their own locks (the snapshots and indexes are refreshed in place);
+the cache only guards its own bookkeeping.
+"""
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (value, stored at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _live(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[1] > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        return entry
+
+    def _store(self, key: Hashable, value: Any):
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def get_or_create(self, key: Hashable, create: Callable[[], Any]) -> Any:
+        """The live value for key, or a new one from create() stored in its place."""
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                self.misses += 1
+                value = create()
+                self._store(key, value)
+                return value
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """The live value for key without counting a hit or refreshing its recency."""
+        with self._lock:
+            entry = self._live(key)
+            return entry[0] if entry is not None else None
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._store(key, value)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def pop_where(self, predicate: Callable[[Hashable], bool]):
+        """Drops every entry whose key matches; a scan, so keep it to small caches."""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def info(self, name: str = "entries") -> dict:
+        """Size and counters, with the size reported as `name` (e.g. "patients")."""
+        with self._lock:
+            return {
+                name: len(self._entries),
+                f"max_{name}": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -13,6 +13,10 @@ self.addEventListener('push', (event) => {
     body: data.body,
     icon: '/favicon.ico',
     badge: '/favicon.ico',
+    // Medication reminders add "Taken" / "Skip" actions and a dose token
+    tag: data.tag,
+    actions: data.actions || [],
+    data: data.data || {},
   };
 
   // This tells the browser to show the notification
@@ -21,6 +25,37 @@ self.addEventListener('push', (event) => {
   );
 });
 
+// The API base URL is passed when registering, see pushAPI.serviceWorkerUrl
+const API_URL = new URL(self.location.href).searchParams.get('api');
+
+// "Taken" / "Skip" on a reminder records the dose with one small request;
+// tapping the notification itself opens the app
+self.addEventListener('notificationclick', (event) => {
+  const notification = event.notification;
+  notification.close();
+
+  const doseToken = notification.data && notification.data.dose_token;
+  if ((event.action === 'taken' || event.action === 'skipped') && doseToken && API_URL) {
+    event.waitUntil(
+      fetch(`${API_URL}/doses/ack`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ token: doseToken, status: event.action }),
+      }).catch((error) => console.error('Failed to record dose:', error))
+    );
+    return;
+  }
+
+  event.waitUntil(
+    self.clients.matchAll({ type: 'window', includeUncontrolled: true }).then((windows) => {
+      if (windows.length > 0) {
+        return windows[0].focus();
+      }
+      return self.clients.openWindow('/');
+    })
+  );
+});
+
 // This just makes sure the new service worker activates
 self.addEventListener('activate', (event) => {
   event.waitUntil(self.clients.claim());
@@ -1,13 +1,14 @@
 // src/components/common/DrugSearchInput.jsx
 
 import React, { useState, useEffect, useRef, useCallback } from 'react';
+import { drugAPI } from '../../services/api';
 
-// API Configuration
-const FDA_API_BASE = 'https://api.fda.gov/drug/ndc.json';
-const DEBOUNCE_DELAY = 300; // milliseconds
+// The backend answers from an in-memory index, so a short debounce is enough
+const DEBOUNCE_DELAY = 120; // milliseconds
+const MIN_QUERY_LENGTH = 2;
 
 /**
- * Reusable component for FDA drug name autocomplete search.
+ * Reusable component for drug name autocomplete search.
  * @param {object} props
  * @param {string} props.value - The current medication name value (controlled by parent state).
  * @param {function} props.onSelect - Callback function when a drug is selected: (selectedName) => void.
@@ -26,59 +27,39 @@ const DrugSearchInput = ({ value, onSelect, placeholder = "Search medication nam
     const debounceRef = useRef(null);
     // Ref for the result list container for managing focus/clicks
     const resultsContainerRef = useRef(null);
+    // Only the latest request's results are shown
+    const latestQueryRef = useRef('');
 
-    // --- FDA API Fetch Logic ---
+    // --- Drug search fetch logic ---
     const fetchDrugs = useCallback(async (query) => {
-        if (query.length < 3) {
+        if (query.length < MIN_QUERY_LENGTH) {
             setResults([]);
             return;
         }
 
+        latestQueryRef.current = query;
         setIsLoading(true);
         setError(null);
 
-        const encodedQuery = encodeURIComponent(query);
-        // Using colon for partial matching search
-        const searchPath = `search=brand_name:${encodedQuery}*+OR+generic_name:${encodedQuery}*&limit=10`;
-        
-        const url = `${FDA_API_BASE}?${searchPath}`;
-        // ❌ Removed the erroneous 'useState' call from here
-
         try {
-            const response = await fetch(url);
-            if (!response.ok) {
-                // Check for rate limiting or other specific HTTP errors
-                throw new Error(`FDA API error: ${response.status} ${response.statusText}`);
-            }
-
-            const data = await response.json();
+            const data = await drugAPI.search(query, 10);
+            if (latestQueryRef.current !== query) return;
 
-            if (data.results && data.results.length > 0) {
-                const uniqueNames = new Set();
-                const processedResults = [];
-
-                data.results.forEach(drug => {
-                    const name = drug.brand_name || drug.generic_name;
-                    if (name && !uniqueNames.has(name.toLowerCase())) {
-                        uniqueNames.add(name.toLowerCase());
-                        processedResults.push({
-                            name: name,
-                            context: drug.brand_name ? 'Brand Name' : 'Generic Name'
-                        });
-                    }
-                });
-
-                setResults(processedResults.slice(0, 10));
+            if (data.length > 0) {
+                setResults(data);
             } else {
                 setResults([]);
                 setError("No matching drugs found.");
             }
         } catch (err) {
-            console.error("FDA API fetch failed:", err);
+            if (latestQueryRef.current !== query) return;
+            console.error("Drug search failed:", err);
             setError("Failed to fetch drug data. Please try again later.");
             setResults([]);
         } finally {
-            setIsLoading(false);
+            if (latestQueryRef.current === query) {
+                setIsLoading(false);
+            }
         }
     }, []);
 
@@ -88,7 +69,7 @@ const DrugSearchInput = ({ value, onSelect, placeholder = "Search medication nam
             clearTimeout(debounceRef.current);
         }
 
-        if (searchTerm.length >= 3) {
+        if (searchTerm.length >= MIN_QUERY_LENGTH) {
             setIsLoading(true);
             debounceRef.current = setTimeout(() => {
                 fetchDrugs(searchTerm);
@@ -149,7 +130,7 @@ const DrugSearchInput = ({ value, onSelect, placeholder = "Search medication nam
                                 <circle className="opacity-25" cx="12" cy="12" r="10" stroke="currentColor" strokeWidth="4"></circle>
                                 <path className="opacity-75" fill="currentColor" d="M4 12a8 8 0 018-8V0C5.373 0 0 5.373 0 12h4zm2 5.291A7.962 7.962 0 014 12H0c0 3.042 1.135 5.824 3 7.938l3-2.647z"></path>
                             </svg>
-                            Searching FDA database...
+                            Searching medications...
                         </div>
                     )}
                     {error && !isLoading && (
@@ -167,7 +148,7 @@ const DrugSearchInput = ({ value, onSelect, placeholder = "Search medication nam
                             <span className="text-xs text-gray-500 ml-2 bg-gray-100 px-2 py-0.5 rounded">{result.context}</span>
                         </div>
                     ))}
-                    {!isLoading && !error && searchTerm.length >= 3 && results.length === 0 && (
+                    {!isLoading && !error && searchTerm.length >= MIN_QUERY_LENGTH && results.length === 0 && (
                          <div className="p-3 text-sm text-gray-500">No results found for "{searchTerm}".</div>
                     )}
                 </div>
@@ -1,12 +1,12 @@
 import React, { useState, useEffect, useMemo } from 'react';
-import { medicationScheduleAPI } from '../../services/api';
+import { carePlanAPI } from '../../services/api';
 import AppIcon from './AppIcon';
 import { useCarePlan } from '../../context/CarePlanContext';
 import { useAuth } from '../../context/AuthContext';
 import DrugSearchInput from './DrugSearchInput';
 
 const ManagePlanModal = ({ isOpen, onClose}) => {
-    const { medications, patientInfo, updateMedication, updatePatientInfo, addMedication, deleteMedication } = useCarePlan();    const { user, selectedPatient } = useAuth();
+    const { medications, patientInfo, updatePatientInfo, saveCarePlan } = useCarePlan();    const { user, selectedPatient } = useAuth();
     const [activeTab, setActiveTab] = useState('overview');
     const [showAddMedModal, setShowAddMedModal] = useState(false);
     const [patientData, setPatientData] = useState({});
@@ -43,11 +43,15 @@ const ManagePlanModal = ({ isOpen, onClose}) => {
     }, [isOpen, patientInfo]);
 
 
+    // Active schedules of the plan; deleted ones are kept inactive for adherence history
+    const activeSchedules = (plan) =>
+        plan.medications.flatMap(med => med.schedules).filter(sch => sch.active);
+
     useEffect(() => {
         if (isOpen && selectedPatient) {
             setLoadingSchedules(true);
-            medicationScheduleAPI.getAll({ patient_id: selectedPatient.id })
-                .then(setSchedules)
+            carePlanAPI.get(selectedPatient.id)
+                .then(plan => setSchedules(activeSchedules(plan)))
                 .catch(error => console.error("Failed to load schedules", error))
                 .finally(() => setLoadingSchedules(false));
         } else if (!isOpen) {
@@ -87,9 +91,9 @@ const ManagePlanModal = ({ isOpen, onClose}) => {
         { id: 'patient', name: 'Patient Info', icon: 'info' },
     ];
 
-    const handleAddMedication = () => {
+    const handleAddMedication = async () => {
         if (newMedication.name && newMedication.dosage) {
-            addMedication(newMedication);
+            await savePlan([...medications, { ...newMedication, active: true }], schedules);
             setNewMedication({
                 name: '',
                 dosage: '',
@@ -100,12 +104,18 @@ const ManagePlanModal = ({ isOpen, onClose}) => {
         }
     };
 
-    const handleDeleteMedication = (id, name) => {
+    // Left out of the plan, the medication and its schedules are deactivated;
+    // its adherence history stays
+    const handleDeleteMedication = async (id, name) => {
         if (window.confirm(`Are you sure you want to remove ${name} from the care plan?`)) {
-            deleteMedication(id);
+            await savePlan(medications.filter(med => med.id !== id), schedules);
         }
     };
 
+    const handleToggleMedication = async (id) => {
+        await savePlan(medications.map(med => med.id === id ? { ...med, active: !med.active } : med), schedules);
+    };
+
     
 
     const renderOverview = () => {
@@ -223,9 +233,7 @@ const ManagePlanModal = ({ isOpen, onClose}) => {
                                 <input
                                     type="checkbox"
                                     checked={med.active}
-                                    onChange={() => {
-                                        updateMedication(med.id, { active: !med.active });
-                                    }}
+                                    onChange={() => handleToggleMedication(med.id)}
                                     className="sr-only peer"
                                 />
                                 <div className="w-11 h-6 bg-gray-200 peer-focus:outline-none peer-focus:ring-4 peer-focus:ring-blue-300 rounded-full peer peer-checked:after:translate-x-full peer-checked:after:border-white after:content-[''] after:absolute after:top-[2px] after:left-[2px] after:bg-white after:border-gray-300 after:border after:rounded-full after:h-5 after:w-5 after:transition-all peer-checked:bg-blue-600"></div>
@@ -260,6 +268,28 @@ const ManagePlanModal = ({ isOpen, onClose}) => {
     );
 
 
+    // The whole plan goes to the server in one request: the medications to keep,
+    // each with the schedules it should keep. Whatever is left out is deactivated.
+    const savePlan = async (nextMedications, nextSchedules) => {
+        setLoadingSchedules(true);
+        try {
+            const saved = await saveCarePlan({
+                medications: nextMedications.map(med => ({
+                    id: med.id,
+                    name: med.name,
+                    dosage: med.dosage,
+                    frequency: med.frequency,
+                    time: med.time,
+                    active: med.active,
+                    schedules: med.id ? nextSchedules.filter(sch => sch.medication_id === med.id) : [],
+                })),
+            });
+            setSchedules(activeSchedules(saved));
+        } finally {
+            setLoadingSchedules(false);
+        }
+    };
+
     const handleAddSchedule = async () => {
         if (!newSchedule.medication_id || !newSchedule.time_of_day) return;
         
@@ -267,14 +297,13 @@ const ManagePlanModal = ({ isOpen, onClose}) => {
         const scheduleWithIds = {
             ...newSchedule,
             user_id: user?.id,
-            patient_id: selectedPatient?.id,
             timezone: userTimezone
         };
         if (scheduleWithIds.recurrence_rule !== 'weekly') {
             delete scheduleWithIds.day_of_week;
         }
 
-        await medicationScheduleAPI.create(scheduleWithIds);
+        await savePlan(medications, [...schedules, scheduleWithIds]);
         setShowAddSchedule(false);
         setNewSchedule({
             medication_id: '',
@@ -283,15 +312,10 @@ const ManagePlanModal = ({ isOpen, onClose}) => {
             day_of_week: 'monday', // Reset this
             notes: ''
         });
-
-        setLoadingSchedules(true);
-        medicationScheduleAPI.getAll().then(setSchedules).finally(() => setLoadingSchedules(false));
     };
 
     const handleDeleteSchedule = async (id) => {
-        await medicationScheduleAPI.delete(id);
-        setLoadingSchedules(true);
-        medicationScheduleAPI.getAll().then(setSchedules).finally(() => setLoadingSchedules(false));
+        await savePlan(medications, schedules.filter(sch => sch.id !== id));
     };
 
     const renderSchedule = () => (
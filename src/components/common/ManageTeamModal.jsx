@@ -1,36 +1,55 @@
 import React, { useState, useMemo, useEffect } from 'react';
-import { patientAPI } from '../../services/api';
+import { adminAPI, patientAPI } from '../../services/api';
 
-// This is a new, focused modal component
-const ManageTeamModal = ({ isOpen, onClose, allUsers, patient, onTeamUpdate }) => {
+// This is a new, focused modal component.
+// `patient` may be a slim list row; the care team is loaded here, and
+// candidate aides come from a server-side search rather than every user.
+const ManageTeamModal = ({ isOpen, onClose, patient, onTeamUpdate }) => {
     const [aideToAssign, setAideToAssign] = useState('');
+    const [currentAides, setCurrentAides] = useState([]);
+    const [userSearch, setUserSearch] = useState('');
+    const [candidates, setCandidates] = useState([]);
 
     const currentAideIds = useMemo(() => {
-        return new Set((patient?.aides || []).map(a => a.id));
-    }, [patient?.aides]);
+        return new Set(currentAides.map(a => a.id));
+    }, [currentAides]);
 
     const availableAides = useMemo(() => {
-        return (allUsers || []).filter(u => !currentAideIds.has(u.id));
-    }, [allUsers, currentAideIds]);
+        return candidates.filter(u => !currentAideIds.has(u.id));
+    }, [candidates, currentAideIds]);
 
-    const currentAides = useMemo(() => {
-        return patient?.aides || [];
-    }, [patient?.aides]);
-    
-    // Reset dropdown when modal opens/closes or patient changes
+    // Reset dropdown and load the care team when modal opens or patient changes
     useEffect(() => {
-        if (isOpen) {
+        if (isOpen && patient) {
             setAideToAssign('');
+            patientAPI.getById(patient.id)
+                .then(full => setCurrentAides(full.aides || []))
+                .catch(error => console.error("Failed to load care team:", error));
         }
-    }, [isOpen]);
+    }, [isOpen, patient?.id]);
+
+    useEffect(() => {
+        if (!isOpen) return;
+        const timer = setTimeout(() => {
+            adminAPI.users({ q: userSearch, limit: 50 })
+                .then(page => setCandidates(page.items))
+                .catch(error => console.error("Failed to search users:", error));
+        }, 250);
+        return () => clearTimeout(timer);
+    }, [isOpen, userSearch]);
 
     if (!isOpen || !patient) return null;
 
+    // assign/remove return the patient with its updated care team
+    const applyUpdate = (updatedPatient) => {
+        setCurrentAides(updatedPatient.aides || []);
+        onTeamUpdate(updatedPatient); // Tell AdminView to refresh its counts
+    };
+
     const handleAssignAide = async () => {
         if (!aideToAssign) return;
         try {
-            await patientAPI.assignAide(patient.id, aideToAssign);
-            onTeamUpdate(); // Tell AdminView to refresh data
+            applyUpdate(await patientAPI.assignAide(patient.id, aideToAssign));
             setAideToAssign(''); 
         } catch (error) {
             console.error("Failed to assign aide:", error);
@@ -40,8 +59,7 @@ const ManageTeamModal = ({ isOpen, onClose, allUsers, patient, onTeamUpdate }) =
 
     const handleRemoveAide = async (userId) => {
         try {
-            await patientAPI.removeAide(patient.id, userId);
-            onTeamUpdate(); // Tell AdminView to refresh data
+            applyUpdate(await patientAPI.removeAide(patient.id, userId));
         } catch (error) {
             console.error("Failed to remove aide:", error);
             alert("Failed to remove aide.");
@@ -74,6 +92,13 @@ const ManageTeamModal = ({ isOpen, onClose, allUsers, patient, onTeamUpdate }) =
                     {/* 1. Add new aide section */}
                     <div className="bg-white border border-gray-200 rounded-lg p-4">
                         <h3 className="font-semibold text-gray-900 mb-3">Assign New Aide</h3>
+                        <input
+                            type="search"
+                            value={userSearch}
+                            onChange={e => setUserSearch(e.target.value)}
+                            placeholder="Search by name or email"
+                            className="w-full px-3 py-2 mb-2 border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-violet-500"
+                        />
                         <div className="flex space-x-2">
                             <select
                                 value={aideToAssign}
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { patientAPI, userAPI } from '../../services/api'; // You'll need to add userAPI to your api.js
+import { adminAPI, patientAPI, userAPI } from '../../services/api';
 import { useAuth } from '../../context/AuthContext';
 import { useCarePlan } from '../../context/CarePlanContext';
 import AppIcon from '../common/AppIcon';
@@ -11,6 +11,12 @@ const AdminView = () => {
     const [patients, setPatients] = useState([]);
     const [users, setUsers] = useState([]);
     const [isLoading, setIsLoading] = useState(true);
+
+    // Listings are paged on the server: search text, cursor for the next page, total on the first page
+    const [patientSearch, setPatientSearch] = useState('');
+    const [userSearch, setUserSearch] = useState('');
+    const [patientPage, setPatientPage] = useState({ nextCursor: null, total: 0 });
+    const [userPage, setUserPage] = useState({ nextCursor: null, total: 0 });
     
     // State for managing the "Edit Patient" modal
     const [isPlanModalOpen, setIsPlanModalOpen] = useState(false);
@@ -37,28 +43,43 @@ const AdminView = () => {
     const [isEditUserModalOpen, setIsEditUserModalOpen] = useState(false);
     const [currentUserToEdit, setCurrentUserToEdit] = useState(null);
     
-    // Fetch all data on component load
-    const fetchData = async () => {
-        setIsLoading(true);
+    // First page (cursor = null) replaces the list, later pages append to it
+    const fetchPatients = async (cursor = null) => {
+        try {
+            const page = await adminAPI.patients({ q: patientSearch, cursor });
+            setPatients(prev => (cursor ? [...prev, ...page.items] : page.items));
+            setPatientPage(prev => ({ nextCursor: page.next_cursor, total: cursor ? prev.total : page.total }));
+        } catch (error) {
+            console.error("Failed to fetch patients:", error);
+        }
+    };
+
+    const fetchUsers = async (cursor = null) => {
         try {
-            const [patientsData, usersData] = await Promise.all([
-                patientAPI.getAll(),
-                userAPI.getAll() 
-            ]);
-            setPatients(patientsData);
-            setUsers(usersData);
-            return { patientsData, usersData }; // <-- ADD THIS RETURN
+            const page = await adminAPI.users({ q: userSearch, cursor });
+            setUsers(prev => (cursor ? [...prev, ...page.items] : page.items));
+            setUserPage(prev => ({ nextCursor: page.next_cursor, total: cursor ? prev.total : page.total }));
         } catch (error) {
-            console.error("Failed to fetch admin data:", error);
-            return { patientsData: [], usersData: [] }; // <-- ADD THIS RETURN
-        } finally {
-            setIsLoading(false);
+            console.error("Failed to fetch users:", error);
         }
     };
 
+    // Reloads the first page of both lists
+    const fetchData = async () => {
+        await Promise.all([fetchPatients(), fetchUsers()]);
+        setIsLoading(false);
+    };
+
+    // Initial load, then again as the search text settles
+    useEffect(() => {
+        const timer = setTimeout(fetchPatients, 250);
+        return () => clearTimeout(timer);
+    }, [patientSearch]);
+
     useEffect(() => {
-        fetchData();
-    }, []);
+        const timer = setTimeout(() => fetchUsers().finally(() => setIsLoading(false)), 250);
+        return () => clearTimeout(timer);
+    }, [userSearch]);
 
     const handleOpenAddPatientModal = () => {
         // Reset the form every time it's opened
@@ -96,9 +117,15 @@ const AdminView = () => {
 
 
     // Function to open the patient editor
-    const handleEditPatientPlan = (patient) => {
-        selectPatient(patient); // Set the global patient
-        setIsPlanModalOpen(true);    // Open the modal
+    const handleEditPatientPlan = async (patient) => {
+        try {
+            // List rows are slim; the plan editor needs the full patient with its care team
+            selectPatient(await patientAPI.getById(patient.id)); // Set the global patient
+            setIsPlanModalOpen(true);    // Open the modal
+        } catch (error) {
+            console.error("Failed to load patient:", error);
+            alert("Failed to load patient.");
+        }
     };
 
     // Function to close the patient editor
@@ -117,22 +144,12 @@ const AdminView = () => {
         setCurrentPatientForTeam(null);
     };
 
-    const handleTeamUpdate = async () => {
-        // Wait for the new data
-        const { patientsData } = await fetchData(); 
-        
-        if (currentPatientForTeam) {
-            // Find the updated patient in the new list
-            const updatedPatient = patientsData.find(p => p.id === currentPatientForTeam.id);
-            
-            if (updatedPatient) {
-                // Set the state to the fresh patient object
-                setCurrentPatientForTeam(updatedPatient);
-            } else {
-                // Failsafe: if patient not found, close modal
-                handleCloseTeamModal();
-            }
-        }
+    const handleTeamUpdate = async (updatedPatient) => {
+        // The modal reloads its own patient; refresh the team sizes shown in the lists
+        setPatients(prev => prev.map(p => (
+            p.id === updatedPatient.id ? { ...p, aide_count: updatedPatient.aides.length } : p
+        )));
+        fetchUsers();
     };
 
     // Functions for adding a new user
@@ -214,12 +231,19 @@ const AdminView = () => {
                         Add Patient
                     </button>
                 </div>
+                <input
+                    type="search"
+                    value={patientSearch}
+                    onChange={(e) => setPatientSearch(e.target.value)}
+                    placeholder="Search patients by name"
+                    className="w-full px-3 py-2 mb-4 border border-gray-300 rounded-lg"
+                />
                 <div className="space-y-3">
                     {patients.map(patient => (
                         <div key={patient.id} className="flex items-center justify-between p-3 bg-gray-50 rounded-lg">
                             <div>
                                 <p className="font-medium">{patient.name}</p>
-                                <p className="text-sm text-gray-500">ID: {patient.id} • {patient.age} years old</p>
+                                <p className="text-sm text-gray-500">ID: {patient.id} • {patient.age} years old • {patient.aide_count} on care team</p>
                             </div>
                             
                             {/* --- MODIFIED BUTTONS --- */}
@@ -240,6 +264,14 @@ const AdminView = () => {
                         </div>
                     ))}
                 </div>
+                {patientPage.nextCursor && (
+                    <button
+                        onClick={() => fetchPatients(patientPage.nextCursor)}
+                        className="w-full mt-3 text-sm text-blue-600 py-2 hover:underline"
+                    >
+                        Load more ({patients.length} of {patientPage.total})
+                    </button>
+                )}
             </div>
 
             {/* Manage Users Section */}
@@ -253,12 +285,19 @@ const AdminView = () => {
                         Add User
                     </button>
                 </div>
+                <input
+                    type="search"
+                    value={userSearch}
+                    onChange={(e) => setUserSearch(e.target.value)}
+                    placeholder="Search users by name or email"
+                    className="w-full px-3 py-2 mb-4 border border-gray-300 rounded-lg"
+                />
                 <div className="space-y-3">
                     {users.map(user => (
                         <div key={user.id} className="flex items-center justify-between p-3 bg-gray-50 rounded-lg">
                             <div className="flex-1 min-w-0">
                                 <p className="font-medium truncate">{user.name}</p>
-                                <p className="text-sm text-gray-500 truncate">{user.email}</p>
+                                <p className="text-sm text-gray-500 truncate">{user.email} • {user.patient_count} patients</p>
                             </div>
                             <div className="flex items-center flex-shrink-0 ml-4">
                                 <span className="text-xs font-semibold bg-blue-100 text-blue-700 px-2 py-1 rounded-full mr-3">{user.role}</span>
@@ -278,6 +317,14 @@ const AdminView = () => {
                         </div>
                     ))}
                 </div>
+                {userPage.nextCursor && (
+                    <button
+                        onClick={() => fetchUsers(userPage.nextCursor)}
+                        className="w-full mt-3 text-sm text-blue-600 py-2 hover:underline"
+                    >
+                        Load more ({users.length} of {userPage.total})
+                    </button>
+                )}
             </div>
 
             {/* --- RENDER BOTH MODALS --- */}
@@ -295,7 +342,6 @@ const AdminView = () => {
                 <ManageTeamModal
                     isOpen={isTeamModalOpen}
                     onClose={handleCloseTeamModal}
-                    allUsers={users}
                     patient={currentPatientForTeam}
                     onTeamUpdate={handleTeamUpdate}
                 />
@@ -54,7 +54,7 @@ const MoreView = () => {
         console.log('Registering service worker...');
         let registration;
         try {
-            registration = await navigator.serviceWorker.register('/service-worker.js');
+            registration = await navigator.serviceWorker.register(pushAPI.serviceWorkerUrl());
         } catch (error) {
             console.error('Service Worker registration failed:', error);
             return;
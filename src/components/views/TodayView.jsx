@@ -1,101 +1,68 @@
 import React, { useMemo, useEffect, useState } from 'react';
-import { medicationScheduleAPI, medicationAdherenceAPI } from '../../services/api';
+import { dashboardAPI, medicationAdherenceAPI } from '../../services/api';
 import { useAuth } from '../../context/AuthContext';
 import SymptomHistoryChart from './SymptomHistoryChart';
 import AppIcon from '../common/AppIcon';
-import { useCheckIn } from '../../context/CheckInContext';
-import { useCarePlan } from '../../context/CarePlanContext';
-import { format } from 'date-fns';
 // import { mockReminders } from '../../data/mockData';
 import { iconColors, categoryIconColors } from '../../utils/iconColors';
 
 const TodayView = () => {
-    const { getCheckInsByDate, adherences, isAdherenceLoading, refreshAdherenceData } = useCheckIn();
-    const { getActiveMedications } = useCarePlan();
     const { user, selectedPatient } = useAuth();
 
-    // Medication schedules state (still local, as CheckInContext only manages adherence records)
-    const [todaySchedules, setTodaySchedules] = useState([]);
-    const [loadingSchedules, setLoadingSchedules] = useState(true);
+    // Medications, today's doses and today's timeline come from one request
+    const [today, setToday] = useState(null);
+    const [loadingToday, setLoadingToday] = useState(true);
 
-    const fetchSchedules = async () => {
+    const fetchToday = async () => {
         if (!selectedPatient) return;
 
-        const today = new Date();
-        // 'YYYY-MM-DD' format (e.g., "2025-10-28")
-        const todayStr = today.toISOString().split('T')[0];
-        // 'eeee' gives the full day name (e.g., "Tuesday"), then we lower-case it
-        const todaysDayString = format(today, 'eeee').toLowerCase(); // e.g., "tuesday"
-
-        setLoadingSchedules(true);
+        setLoadingToday(true);
         try {
-            const schedules = await medicationScheduleAPI.getAll({ patient_id: selectedPatient.id });
-
-            // --- THIS FILTER LOGIC IS NOW CORRECTED ---
-            const filteredSchedules = schedules.filter(sch => {
-                return (
-                    // It's a daily med
-                    sch.recurrence_rule === 'daily' ||
-                    
-                    // It's an "as needed" med
-                    sch.recurrence_rule === 'as_needed' ||
-                    
-                    // It's weekly AND the day matches today
-                    (sch.recurrence_rule === 'weekly' && sch.day_of_week === todaysDayString) ||
-                    
-                    // Keep your original logic for one-off runs
-                    (sch.next_run && sch.next_run.startsWith(todayStr)) 
-                );
-            });
-
-            setTodaySchedules(filteredSchedules);
+            setToday(await dashboardAPI.today(selectedPatient.id));
         } catch (error) {
-            console.error('TodayView: Failed to fetch schedules:', error);
+            console.error('TodayView: Failed to fetch today dashboard:', error);
         } finally {
-            setLoadingSchedules(false);
+            setLoadingToday(false);
         }
     };
 
     useEffect(() => {
-        fetchSchedules();
-    }, [selectedPatient]); // Re-fetch schedules when selectedPatient changes
+        fetchToday();
+    }, [selectedPatient]); // Re-fetch when selectedPatient changes
 
-    const handleAdherence = async (schedule, status) => {
+    const handleAdherence = async (dose, status) => {
         if (!user || !selectedPatient) {
             return;
         }
-        const today = new Date();
-        const scheduledTime = new Date();
-        const [h, m] = schedule.time_of_day.split(':');
-        scheduledTime.setHours(Number(h), Number(m), 0, 0);
         try {
             await medicationAdherenceAPI.create({
-                medication_id: schedule.medication_id,
+                medication_id: dose.medication_id,
+                schedule_id: dose.schedule_id,
                 user_id: user.id,
                 patient_id: selectedPatient.id,
-                scheduled_time: scheduledTime.toISOString(),
+                scheduled_time: dose.scheduled_time,
                 status,
                 notes: ''
             });
-            refreshAdherenceData(); // Refresh adherence data from CheckInContext
+            fetchToday();
         } catch (error) {
             console.error('TodayView: Failed to create adherence record:', error);
         }
     };
     const date = new Date(); // Removed state since we're not allowing date changes
 
-    const todayCheckIns = getCheckInsByDate(date);
-    const activeMedications = getActiveMedications();
-    // Deduplicate medications by id (or name+dosage fallback) in case backend returns duplicates
-    const uniqueActiveMedications = (() => {
-        const map = new Map();
-        activeMedications.forEach(med => {
-            const key = med.id ?? `${med.name}-${med.dosage}`;
-            if (!map.has(key)) map.set(key, med);
-        });
-        const meds = Array.from(map.values());
-        return meds;
-    })();
+    const uniqueActiveMedications = today?.medications || [];
+    // Timed doses first, then as-needed medications (no fixed time)
+    const todaySchedules = [
+        ...(today?.schedule || []).map(dose => ({ ...dose, id: `${dose.schedule_id}-${dose.scheduled_time}` })),
+        ...(today?.as_needed || []).map(sch => ({ ...sch, id: `prn-${sch.schedule_id}`, time_of_day: 'PRN' })),
+    ];
+    const todayCheckIns = (today?.timeline || []).map(item => ({
+        ...item,
+        id: `${item.kind}-${item.id}`,
+        time: new Date(item.timestamp).toLocaleTimeString('en-US', { hour: 'numeric', minute: '2-digit', hour12: true }),
+        user: item.user_name ? { name: item.user_name } : null,
+    }));
 
     // Check-in functionality has been moved to the dedicated CheckIn screen
 
@@ -119,7 +86,7 @@ const TodayView = () => {
     }, [date]);
 
     // Generate reminders for each scheduled medication for today
-    const medReminders = todaySchedules.map(sch => {
+    const medReminders = (today?.schedule || []).map(sch => {
         const med = uniqueActiveMedications.find(m => m.id === sch.medication_id);
         // sch.time_of_day expected like '08:00' or '8:00'
         const parts = (sch.time_of_day || '').split(':');
@@ -136,7 +103,7 @@ const TodayView = () => {
         }
 
         return {
-            id: `postmed-${sch.id}`,
+            id: `postmed-${sch.schedule_id}-${sch.scheduled_time}`,
             time: postTimeLabel,
             title: `Post-med check for ${med?.name || 'Medication'}`,
             icon: 'check-in',
@@ -177,18 +144,13 @@ const TodayView = () => {
                     <AppIcon name="medication" className="w-5 h-5" />
                     <h3 className="text-sm font-semibold">Today's Medication Schedules</h3>
                 </div>
-                {isAdherenceLoading || loadingSchedules ? (
+                {loadingToday ? (
                     <div>Loading schedules...</div>
                 ) : todaySchedules.length === 0 ? (
                     <div className="text-gray-500">No medication schedules for today.</div>
                 ) : (
                     todaySchedules.map(sch => {
                         const med = uniqueActiveMedications.find(m => m.id === sch.medication_id);
-                        // Compare local time strings for adherence matching
-                        const adherence = adherences.find(a => 
-                            a.medication_id === sch.medication_id && 
-                            new Date(a.scheduled_time).toLocaleTimeString('en-US', { hour: '2-digit', minute: '2-digit', hour12: false }) === sch.time_of_day
-                        );
                         return (
                             <div key={sch.id} className="bg-white p-4 rounded-xl shadow-sm mb-3 flex items-center justify-between">
                                 <div className="flex items-center">
@@ -201,7 +163,9 @@ const TodayView = () => {
                                         <p className="text-xs text-gray-500">{med?.dosage || ''}</p>
                                     </div>
                                 </div>
-                                
+                                {sch.status && (
+                                    <span className="text-xs font-medium text-gray-500 capitalize">{sch.status}</span>
+                                )}
                             </div>
                         );
                     })
@@ -1,5 +1,5 @@
 import React, { createContext, useContext, useState, useEffect } from 'react';
-import { authAPI, patientAPI } from '../services/api';
+import { authAPI, patientAPI, sessionToken, onSessionExpired } from '../services/api';
 
 const AuthContext = createContext();
 
@@ -46,11 +46,37 @@ export const AuthProvider = ({ children }) => {
                 setIsPatientSelectionRequired(false);
             }
             // else (0 patients), isPatientSelectionRequired remains false, app will show "no patients"
+
+            // Renew the token and refresh the patient list; a stored user without
+            // a token (or with one the server rejects) has to sign in again
+            if (sessionToken.get()) {
+                authAPI.me().then(storeSession).catch(error => console.error('Session refresh failed:', error));
+            } else {
+                logout();
+            }
         }
         setIsLoading(false);
     }, []);
 
+    // Any request answered 401 "Invalid session" signs the user out
+    useEffect(() => {
+        onSessionExpired(logout);
+        return () => onSessionExpired(() => {});
+    }, []);
+
     
+    // Stores a session response from /auth/login or /auth/me: the token for
+    // later requests, and the user with their patients as 'assigned_patients'
+    const storeSession = (userData) => {
+        const { token, expires_at, ...profile } = userData;
+        sessionToken.set(token);
+        const userWithPatients = { ...profile, assigned_patients: profile.patients || [] };
+        setUser(userWithPatients);
+        localStorage.setItem('caregiverUser', JSON.stringify(userWithPatients));
+        setPatients(userWithPatients.assigned_patients);
+        return userWithPatients;
+    };
+
     // --- UPDATED ---
     const login = async (email) => {
         try {
@@ -62,12 +88,8 @@ export const AuthProvider = ({ children }) => {
 
             localStorage.removeItem('selectedPatient');
             setSelectedPatient(null);
-            const assignedPatients = userData.patients || []; 
-            const userWithPatients = { ...userData, assigned_patients: assignedPatients };
-            
-            setUser(userWithPatients);
-            localStorage.setItem('caregiverUser', JSON.stringify(userWithPatients));
-            setPatients(assignedPatients);
+            const userWithPatients = storeSession(userData);
+            const assignedPatients = userWithPatients.assigned_patients;
 
             // Step 3: Run the selection logic (no change)
             if (assignedPatients.length === 1) {
@@ -93,6 +115,7 @@ export const AuthProvider = ({ children }) => {
         setIsPatientSelectionRequired(false); // Reset flag
         localStorage.removeItem('caregiverUser');
         localStorage.removeItem('selectedPatient');
+        sessionToken.clear();
     };
 
     const selectPatient = (patient) => {
@@ -115,12 +138,9 @@ export const AuthProvider = ({ children }) => {
     const createPatient = async (patientData) => {
         try {
             await patientAPI.create(patientData);
-            const userData = await authAPI.login(user.email); 
-            setUser(userData);
-            localStorage.setItem('caregiverUser', JSON.stringify(userData));
+            const userData = storeSession(await authAPI.me());
 
-            const patientList = userData.assigned_patients || [];
-            setPatients(patientList);
+            const patientList = userData.assigned_patients;
             const newPatient = patientList.find(p => p.name === patientData.name);
             
             if (newPatient) {
@@ -142,12 +162,9 @@ export const AuthProvider = ({ children }) => {
     const updatePatient = async (patientId, updates) => {
         try {
             await patientAPI.update(patientId, updates);
-            const userData = await authAPI.login(user.email); 
-            setUser(userData);
-            localStorage.setItem('caregiverUser', JSON.stringify(userData));
+            const userData = storeSession(await authAPI.me());
 
-            const patientList = userData.assigned_patients || [];
-            setPatients(patientList);
+            const patientList = userData.assigned_patients;
             const updatedPatient = patientList.find(p => p.id === patientId);
             if (updatedPatient) {
                 selectPatient(updatedPatient);
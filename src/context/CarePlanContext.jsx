@@ -1,5 +1,5 @@
 import React, { createContext, useContext, useState, useEffect } from 'react';
-import { medicationAPI } from '../services/api';
+import { medicationAPI, carePlanAPI } from '../services/api';
 import { useAuth } from './AuthContext';
 
 const CarePlanContext = createContext();
@@ -39,45 +39,18 @@ export const CarePlanProvider = ({ children }) => {
         }
     };
 
-    const addMedication = async (medication) => {
+    // Saves every medication and schedule at once (see carePlanAPI.save) and
+    // returns the saved plan; medications left out of `plan` are deactivated.
+    const saveCarePlan = async (plan) => {
         if (!selectedPatient) {
             throw new Error('No patient selected');
         }
         try {
-            const newMed = await medicationAPI.create({
-                patient_id: selectedPatient.id,
-                ...medication,
-                active: true
-            });
-            setMedications(prev => [...prev, newMed]);
-            return newMed;
+            const saved = await carePlanAPI.save(selectedPatient.id, plan);
+            setMedications(saved.medications.map(({ schedules, ...med }) => med));
+            return saved;
         } catch (error) {
-            console.error('Failed to add medication:', error);
-            throw error;
-        }
-    };
-
-    const updateMedication = async (id, updates) => {
-        try {
-            const updatedMed = await medicationAPI.update(id, {
-                patient_id: selectedPatient.id,
-                ...updates
-            });
-            setMedications(prev => prev.map(med => 
-                med.id === id ? updatedMed : med
-            ));
-        } catch (error) {
-            console.error('Failed to update medication:', error);
-            throw error;
-        }
-    };
-
-    const deleteMedication = async (id) => {
-        try {
-            await medicationAPI.delete(id);
-            setMedications(prev => prev.filter(med => med.id !== id));
-        } catch (error) {
-            console.error('Failed to delete medication:', error);
+            console.error('Failed to save care plan:', error);
             throw error;
         }
     };
@@ -102,9 +75,7 @@ export const CarePlanProvider = ({ children }) => {
         medications,
         patientInfo: selectedPatient,
         isLoading,
-        addMedication,
-        updateMedication,
-        deleteMedication,
+        saveCarePlan,
         getActiveMedications,
         updatePatientInfo
     };
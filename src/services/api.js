@@ -2,7 +2,9 @@
 export const reportAPI = {
     generate: async ({ patient_id, from_date, to_date }) => {
         const url = `${BASE_URL}${API_PREFIX}/reports/generate?patient_id=${patient_id}&from_date=${from_date}&to_date=${to_date}`;
-        const response = await fetch(url);
+        const headers = { ...authHeaders(), ...consistencyHeaders() };
+        const response = await fetch(url, { headers });
+        checkSession(response, headers);
         if (!response.ok) throw new Error('Failed to generate report');
         const blob = await response.blob();
         return blob;
@@ -14,12 +16,46 @@ export const reportAPI = {
 const BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
 const API_PREFIX = '/api';
 
+// Signed session token from /auth/login, sent on every request
+const TOKEN_KEY = 'caregiverToken';
+export const sessionToken = {
+    get: () => localStorage.getItem(TOKEN_KEY),
+    set: (token) => localStorage.setItem(TOKEN_KEY, token),
+    clear: () => localStorage.removeItem(TOKEN_KEY),
+};
+const authHeaders = () => {
+    const token = sessionToken.get();
+    return token ? { Authorization: `Bearer ${token}` } : {};
+};
+
+// A 401 to a request that carried a token means the session is over (expired,
+// or signed with a key the server no longer has): drop the token and let the
+// AuthProvider log out instead of failing every later request
+let sessionExpired = () => {};
+export const onSessionExpired = (handler) => {
+    sessionExpired = handler;
+};
+const checkSession = (response, headers) => {
+    if (response.status === 401 && headers.Authorization) {
+        sessionToken.clear();
+        sessionExpired();
+    }
+};
+
+// Writes return X-Last-Write; sending it back keeps this client's next reads
+// on the primary database, so they see the write (see backend/replicas.py)
+const WRITE_HEADER = 'X-Last-Write';
+let lastWrite = null;
+const consistencyHeaders = () => (lastWrite ? { [WRITE_HEADER]: lastWrite } : {});
+
 // Generic fetch wrapper with error handling
 const fetchAPI = async (endpoint, options = {}) => {
     const url = `${BASE_URL}${API_PREFIX}${endpoint}`;
     const config = {
         headers: {
             'Content-Type': 'application/json',
+            ...authHeaders(),
+            ...consistencyHeaders(),
             ...options.headers,
         },
         ...options,
@@ -27,6 +63,8 @@ const fetchAPI = async (endpoint, options = {}) => {
 
     try {
         const response = await fetch(url, config);
+        lastWrite = response.headers.get(WRITE_HEADER) || lastWrite;
+        checkSession(response, config.headers);
         
         if (!response.ok) {
             const error = await response.json();
@@ -96,6 +134,11 @@ export const authAPI = {
         });
     },
 
+    // Current user, assigned patients and a renewed token (no re-login)
+    me: async () => {
+        return fetchAPI('/auth/me');
+    },
+
     // Verify user exists in database
     verifyUser: async (email) => {
         return fetchAPI(`/auth/verify?email=${email}`);
@@ -159,6 +202,19 @@ export const userAPI = {
   // You can add update/delete later
 };
 
+// Admin console listings: { q, role, cursor, limit } -> { items, next_cursor, total }
+export const adminAPI = {
+    users: (params = {}) => fetchAPI(`/admin/users?${pageParams(params)}`),
+    patients: (params = {}) => fetchAPI(`/admin/patients?${pageParams(params)}`),
+};
+const pageParams = (params) => {
+    const urlParams = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+        if (value !== undefined && value !== null && value !== '') urlParams.append(key, value);
+    });
+    return urlParams.toString();
+};
+
 // Medication API endpoints
 export const medicationAPI = {
     getAll: async (patientId, activeOnly = false) => {
@@ -201,6 +257,11 @@ export const medicationScheduleAPI = {
         const urlParams = new URLSearchParams(params).toString();
         return fetchAPI(`/medication-schedules?${urlParams}`);
     },
+    // Server-side expansion of a patient's schedules: { patient_id, from_date, to_date }
+    getOccurrences: async (params = {}) => {
+        const urlParams = new URLSearchParams(params).toString();
+        return fetchAPI(`/medication-schedules/occurrences?${urlParams}`);
+    },
     update: async (id, updates) => {
         return fetchAPI(`/medication-schedules/${id}`, {
             method: 'PUT',
@@ -246,8 +307,60 @@ export const symptomAPI = {
     }
 };
 
+// Insights API endpoints
+export const insightsAPI = {
+    // Server-computed trends: { patient_id, from_date, to_date, window }
+    get: async (params = {}) => {
+        const urlParams = new URLSearchParams(params).toString();
+        return fetchAPI(`/insights?${urlParams}`);
+    },
+};
+
+// Drug name autocomplete
+export const drugAPI = {
+    // [{ name, context, usage }] from the backend's local drug-name index
+    search: async (query, limit = 10) => {
+        const urlParams = new URLSearchParams({ q: query, limit }).toString();
+        return fetchAPI(`/drugs/search?${urlParams}`);
+    },
+};
+
+// Today dashboard API endpoint
+export const dashboardAPI = {
+    // Medications, today's doses with status and today's timeline in one request.
+    // Days follow the browser's timezone unless { date, tz } say otherwise.
+    today: async (patientId, params = {}) => {
+        const urlParams = new URLSearchParams({
+            tz: Intl.DateTimeFormat().resolvedOptions().timeZone || 'UTC',
+            ...params,
+        }).toString();
+        return fetchAPI(`/patients/${patientId}/today?${urlParams}`);
+    },
+};
+
+// Care plan API endpoints
+export const carePlanAPI = {
+    // A patient's medications, each with its schedules
+    get: async (patientId) => {
+        return fetchAPI(`/patients/${patientId}/care-plan`);
+    },
+
+    // Saves the whole plan in one transaction. Items without an id are added;
+    // medications and schedules left out are deactivated.
+    save: async (patientId, plan) => {
+        return fetchAPI(`/patients/${patientId}/care-plan`, {
+            method: 'PUT',
+            body: JSON.stringify(plan),
+        });
+    },
+};
+
 // Push Notification API endpoints
 export const pushAPI = {
+    // The service worker posts reminder actions ("Taken" / "Skip") straight to
+    // the API, so it is told where the API lives when registered
+    serviceWorkerUrl: () => `/service-worker.js?api=${encodeURIComponent(BASE_URL + API_PREFIX)}`,
+
     /**
      * Saves a new push subscription to the backend
      * @param {number} userId - The ID of the user
@@ -315,13 +428,18 @@ const handleSave = async (data) => {
 
 export default {
     authAPI,
+    adminAPI,
     checkInAPI,
     patientAPI,
     medicationAPI,
     medicationScheduleAPI,
     medicationAdherenceAPI,
+    carePlanAPI,
+    drugAPI,
     remindersAPI,
     symptomAPI,
+    insightsAPI,
+    dashboardAPI,
     reportAPI,
     pushAPI,
 };